@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark rule admin change view render time with a number of available email templates
+
+Usage (from the repository root):
+
+    $ python benchmarks/admin_templates.py [--templates N] [--repeat N]
+
+It creates a temporary app with `N` email templates (every other one with a HTML counterpart) and renders the change
+view of a rule with a templated email action, with the templates catalogue rebuilt on every render (as before it was
+cached) and with the cached catalogue, printing the median render time of each.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import django  # noqa
+from django.conf import settings  # noqa
+from django.conf.urls import url  # noqa
+
+from runtests import SETTINGS  # noqa
+
+
+APP_NAME = 'benchmark_templates'
+
+urlpatterns = list()
+
+
+def create_app(count):
+    """
+    Creates a temporary app with passed number of email templates and returns its parent directory
+    """
+    root = tempfile.mkdtemp()
+    templates_dir = os.path.join(root, APP_NAME, 'templates', 'conditioner', 'actions', 'emails')
+    os.makedirs(templates_dir)
+    open(os.path.join(root, APP_NAME, '__init__.py'), 'w').close()
+
+    for i in range(count):
+        with open(os.path.join(templates_dir, 'email_{}.txt'.format(i)), 'w') as f:
+            f.write('Email {}'.format(i))
+        if i % 2:
+            with open(os.path.join(templates_dir, 'email_{}.html'.format(i)), 'w') as f:
+                f.write('<p>Email {}</p>'.format(i))
+
+    return root
+
+
+def measure(view, request, pk, repeat, before=None):
+    """
+    Returns median time (in milliseconds) of rendering the change view
+    """
+    durations = list()
+    for _ in range(repeat):
+        if before is not None:
+            before()
+        started = time.perf_counter()
+        view(request, str(pk)).render()
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--templates', type=int, default=500, help="Number of email templates (default: 500).")
+    parser.add_argument('--repeat', type=int, default=20, help="Number of measured renders (default: 20).")
+    args = parser.parse_args()
+
+    root = create_app(args.templates)
+    sys.path.insert(0, root)
+
+    try:
+        settings.configure(**dict(
+            SETTINGS, DEBUG=False, ROOT_URLCONF=__name__,
+            INSTALLED_APPS=SETTINGS['INSTALLED_APPS'] + ['django.contrib.sessions', APP_NAME],
+        ))
+        django.setup()
+
+        from django.contrib import admin
+        from django.contrib.auth.models import User
+        from django.core.management import call_command
+        from django.test import RequestFactory
+
+        from conditioner.models import Rule
+        from conditioner.tests.actions.factories import SendTemplatedEmailActionFactory
+        from conditioner.utils import template_catalogue
+
+        urlpatterns.append(url(r'^admin/', admin.site.urls))
+
+        call_command('migrate', verbosity=0)
+        action = SendTemplatedEmailActionFactory(template='conditioner/actions/emails/email_0.txt')
+
+        request = RequestFactory().get('/')
+        request.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        view = admin.site._registry[Rule].change_view
+
+        print("Uncached templates catalogue: {:.1f} ms".format(
+            measure(view, request, action.rule.pk, args.repeat, before=template_catalogue.clear)
+        ))
+        print("Cached templates catalogue: {:.1f} ms".format(measure(view, request, action.rule.pk, args.repeat)))
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark queryset load time of a model with and without field change conditions
+
+Usage (from the repository root):
+
+    $ python benchmarks/field_change.py [--rows N] [--repeat N]
+
+It loads `N` `auth.Group` instances without any rules, with a field change rule for another model and with a field
+change rule for `auth.Group`, printing the median load time of each.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import django  # noqa
+from django.conf import settings  # noqa
+
+from runtests import SETTINGS  # noqa
+
+
+def measure(queryset, repeat):
+    """
+    Returns median time (in milliseconds) of loading all queryset instances
+    """
+    durations = list()
+    for _ in range(repeat):
+        started = time.perf_counter()
+        list(queryset.all())
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations) * 1000
+
+
+def add_rule(model):
+    """
+    Creates a field change rule for passed model 'name' field
+    """
+    from django.contrib.contenttypes.models import ContentType
+
+    from conditioner.actions import LoggerAction
+    from conditioner.conditions import FieldChangeCondition
+    from conditioner.models import Rule
+
+    rule = Rule.objects.create(target_content_type=ContentType.objects.get_for_model(model))
+    LoggerAction.objects.create(rule=rule, level=LoggerAction.INFO, message='Name changed')
+    FieldChangeCondition.objects.create(rule=rule, field_name='name')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000, help="Number of loaded instances (default: 10000).")
+    parser.add_argument('--repeat', type=int, default=20, help="Number of measured loads (default: 20).")
+    args = parser.parse_args()
+
+    settings.configure(**dict(SETTINGS, DEBUG=False))
+    django.setup()
+
+    from django.contrib.auth.models import Group, Permission
+    from django.core.management import call_command
+
+    from conditioner.dispatch import dispatcher
+
+    call_command('migrate', verbosity=0)
+    Group.objects.bulk_create(Group(name='Group {}'.format(i)) for i in range(args.rows))
+    queryset = Group.objects.all()
+
+    dispatcher.load()
+    print("No rules: {:.1f} ms".format(measure(queryset, args.repeat)))
+
+    add_rule(Permission)
+    dispatcher.load()
+    print("Field change rule for another model: {:.1f} ms".format(measure(queryset, args.repeat)))
+
+    add_rule(Group)
+    dispatcher.load()
+    print("Field change rule for loaded model: {:.1f} ms".format(measure(queryset, args.repeat)))
+
+
+if __name__ == '__main__':
+    main()
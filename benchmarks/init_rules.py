@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark queryset load time of a model with initialization signal rules
+
+Usage (from the repository root):
+
+    $ python benchmarks/init_rules.py [--rows N] [--repeat N]
+
+It loads `N` `auth.Group` instances (with a bulk signals queryset) without any rules, with a `post_init` rule, with
+a `post_init` rule whose condition isn't met and with a coalesced `post_init` rule, printing the median load time of
+each.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import django  # noqa
+from django.conf import settings  # noqa
+
+from runtests import SETTINGS  # noqa
+
+
+class CountingAction(object):
+    """
+    Action that only counts how many times (and for how many instances) it was run
+    """
+    def __init__(self):
+        self.runs = 0
+        self.instances = 0
+
+    def run_action(self, *args, **kwargs):
+        self.runs += 1
+        self.instances += 1
+
+    def run_batch_action(self, instances, *args, **kwargs):
+        self.runs += 1
+        self.instances += len(instances)
+
+
+def measure(queryset, repeat):
+    """
+    Returns median time (in milliseconds) of loading all queryset instances
+    """
+    durations = list()
+    for _ in range(repeat):
+        started = time.perf_counter()
+        list(queryset.all())
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000, help="Number of loaded instances (default: 10000).")
+    parser.add_argument('--repeat', type=int, default=20, help="Number of measured loads (default: 20).")
+    args = parser.parse_args()
+
+    settings.configure(**dict(SETTINGS, DEBUG=False))
+    django.setup()
+
+    from django.contrib.auth.models import Group
+    from django.core.management import call_command
+
+    from conditioner.dispatch import dispatcher
+    from conditioner.signals import BulkSignalsQuerySet
+
+    call_command('migrate', verbosity=0)
+    Group.objects.bulk_create(Group(name='Group {}'.format(i)) for i in range(args.rows))
+    queryset = BulkSignalsQuerySet(model=Group)
+    dispatcher.load()
+
+    cases = (
+        ("No rules", None),
+        ("post_init rule", dict()),
+        ("post_init rule that isn't met", dict(check=lambda **kwargs: False)),
+        ("Coalesced post_init rule", dict(coalesce=True)),
+    )
+    for label, options in cases:
+        dispatcher.clear()
+        action = CountingAction()
+        if options is not None:
+            dispatcher.register('post_init', Group, uuid.uuid4(), action, **options)
+
+        duration = measure(queryset, args.repeat)
+        print("{}: {:.1f} ms ({} action runs per load)".format(label, duration, action.runs // args.repeat))
+
+
+if __name__ == '__main__':
+    main()
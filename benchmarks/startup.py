@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Benchmark 'django-conditioner' application startup time (`django.setup()`) with a number of signal rules
+
+Usage (from the repository root):
+
+    $ python benchmarks/startup.py [--rules N] [--repeat N]
+
+It creates a temporary SQLite database with `N` signal rules and then runs `django.setup()` in fresh processes, with
+the rules loaded eagerly in `ready()` (as before they were loaded lazily) and lazily, followed by loading a model
+instance, which sends the first model signal (and loads the rules in lazy mode). It prints the median times and the
+number of queries run by each.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import django  # noqa
+from django.conf import settings  # noqa
+
+from runtests import SETTINGS  # noqa
+
+
+EAGER = 'eager'
+LAZY = 'lazy'
+
+
+def configure(database):
+    """
+    Configures Django with tests settings and passed SQLite database file
+    """
+    settings.configure(**dict(SETTINGS, DATABASES={
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': database,
+        }
+    }))
+
+
+def prepare(database, rules):
+    """
+    Migrates passed database and creates signal rules
+    """
+    configure(database)
+    django.setup()
+
+    from django.contrib.contenttypes.models import ContentType
+    from django.core.management import call_command
+
+    from conditioner.actions import LoggerAction
+    from conditioner.conditions import ModelSignalCondition
+    from conditioner.models import Rule
+
+    call_command('migrate', verbosity=0)
+
+    content_types = list(ContentType.objects.all())
+    for i in range(rules):
+        rule = Rule.objects.create(target_content_type=content_types[i % len(content_types)])
+        LoggerAction.objects.create(rule=rule, level=LoggerAction.INFO, message='Rule {}'.format(i))
+        ModelSignalCondition.objects.create(rule=rule, signal=ModelSignalCondition.POST_SAVE)
+
+
+def load_eagerly():
+    """
+    Makes the application load signal rules in `ready()`, as it did before they were loaded lazily
+    """
+    from conditioner.apps import ConditionerAppConfig
+
+    ready = ConditionerAppConfig.ready
+
+    def eager_ready(self):
+        ready(self)
+
+        from conditioner.dispatch import dispatcher
+        dispatcher.load()
+
+    ConditionerAppConfig.ready = eager_ready
+
+
+def measure(database, mode):
+    """
+    Prints `django.setup()` time (in seconds) and the number of queries it ran, followed by the same for loading the
+    first model instance after it (which sends the first model signal)
+    """
+    configure(database)
+    if mode == EAGER:
+        load_eagerly()
+
+    started = time.perf_counter()
+    django.setup()
+    setup_duration = time.perf_counter() - started
+
+    from django.contrib.contenttypes.models import ContentType
+    from django.db import connection, reset_queries
+
+    setup_queries = len(connection.queries)
+    reset_queries()
+
+    # Loaded instance sends the first model signal (`post_init`)
+    started = time.perf_counter()
+    ContentType.objects.first()
+    signal_duration = time.perf_counter() - started
+
+    print(setup_duration, setup_queries, signal_duration, len(connection.queries))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rules', type=int, default=1000, help="Number of signal rules (default: 1000).")
+    parser.add_argument('--repeat', type=int, default=10, help="Number of measured startups (default: 10).")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        database = os.path.join(directory, 'db.sqlite3')
+        subprocess.check_call([sys.executable, __file__, 'prepare', database, str(args.rules)])
+
+        print("Startup with {} signal rules (median of {}):".format(args.rules, args.repeat))
+        for mode in (EAGER, LAZY):
+            setup_durations = list()
+            signal_durations = list()
+            for _ in range(args.repeat):
+                output = subprocess.check_output([sys.executable, __file__, 'measure', database, mode])
+                setup_duration, setup_queries, signal_duration, signal_queries = output.split()
+                setup_durations.append(float(setup_duration))
+                signal_durations.append(float(signal_duration))
+
+            print("- {}: django.setup() {:.1f} ms ({} queries), first signal {:.1f} ms ({} queries)".format(
+                mode, statistics.median(setup_durations) * 1000, int(setup_queries),
+                statistics.median(signal_durations) * 1000, int(signal_queries),
+            ))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'prepare':
+        prepare(sys.argv[2], int(sys.argv[3]))
+    elif len(sys.argv) > 1 and sys.argv[1] == 'measure':
+        measure(sys.argv[2], sys.argv[3])
+    else:
+        main()
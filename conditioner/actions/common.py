@@ -1,22 +1,191 @@
 """
 Conditioner module common actions models
 """
+import logging
+import os
+import threading
+
+import django
 from django.conf import settings
-from django.core.mail import EmailMultiAlternatives
+from django.core.mail import EmailMultiAlternatives, get_connection
 from django.db import models
-from django.template import TemplateDoesNotExist
-from django.template.loader import render_to_string
+from django.db.models.query import prefetch_related_objects
+from django.template import TemplateDoesNotExist, engines
+from django.template.loader import get_template
 
 from conditioner.base import BaseAction
+from conditioner.models import OutboxEmail
 from conditioner.utils import get_available_templates
 
 
+logger = logging.getLogger(__name__)
+
+
+class EmailBatch(object):
+    """
+    Collects emails of templated email actions run while the batch is active and sends them with a single email
+    backend connection, in chunks of `chunk_size` messages (the connection is opened once per chunk)
+
+    Batches are thread local and can be nested (emails are sent by the innermost one). A message that couldn't be sent
+    doesn't prevent the others from being sent, it's logged and added to `failed` list with the exception instead. If
+    the connection can't be opened, all messages of the chunk are added to it.
+    """
+    local = threading.local()
+
+    def __init__(self, chunk_size=100, connection=None):
+        self.chunk_size = chunk_size
+        self.connection = connection
+        self.messages = list()
+        self.sent = 0
+        # (message, exception) tuples
+        self.failed = list()
+
+    @classmethod
+    def get_current(cls):
+        """
+        Returns the innermost batch in the current thread or `None` if there's none
+        """
+        stack = getattr(cls.local, 'stack', ())
+        return stack[-1] if stack else None
+
+    def add(self, message):
+        """
+        Adds message to the batch and sends the chunk if it's full
+        """
+        self.messages.append(message)
+        if len(self.messages) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Sends collected messages
+        """
+        messages, self.messages = self.messages, list()
+        if not messages:
+            return
+
+        if self.connection is None:
+            self.connection = get_connection()
+
+        try:
+            self.connection.open()
+        except Exception as e:
+            logger.exception("Email backend connection couldn't be opened, {} email(s) weren't sent".format(
+                len(messages),
+            ))
+            self.failed += [(message, e) for message in messages]
+            return
+
+        # `send_messages()` stops at the first failure without telling which messages were sent, so every message is
+        # passed separately (through the same, already opened, connection)
+        try:
+            for message in messages:
+                try:
+                    self.sent += self.connection.send_messages([message]) or 0
+                except Exception as e:
+                    logger.exception("Email '{}' to {} couldn't be sent".format(message.subject, message.to))
+                    self.failed.append((message, e))
+        finally:
+            self.connection.close()
+
+    def __enter__(self):
+        if not hasattr(self.local, 'stack'):
+            self.local.stack = list()
+        self.local.stack.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.local.stack.pop()
+        self.flush()
+
+
+class TemplateCache(object):
+    """
+    Per process cache of compiled email templates pairs, the `.txt` template and its `.html` counterpart (or `None`
+    if it doesn't exist, so the lookup isn't repeated for every sent email)
+
+    Entries are reloaded when modification time of a template file changes (missing `.html` counterparts are looked up
+    again when the `.txt` template changes) or when they are removed with `clear()`.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        # template name -> (modification times, templates pair)
+        self.entries = dict()
+
+    def get(self, name):
+        """
+        Returns `(txt template, html template or None)` pair of passed `.txt` template name
+        """
+        entry = self.entries.get(name)
+        if entry is not None and self.get_mtimes(entry[1]) == entry[0]:
+            return entry[1]
+
+        if entry is not None:
+            self.reset_loaders()
+
+        templates = self.load(name)
+        with self.lock:
+            self.entries[name] = (self.get_mtimes(templates), templates)
+        return templates
+
+    @staticmethod
+    def load(name):
+        """
+        Returns compiled templates pair of passed `.txt` template name
+        """
+        template = get_template(name)
+        try:
+            html_template = get_template(name.replace('.txt', '.html'))
+        except TemplateDoesNotExist:
+            html_template = None
+        return template, html_template
+
+    @staticmethod
+    def reset_loaders():
+        """
+        Resets Django cached template loaders, so changed templates aren't loaded from their cache
+        """
+        for engine in engines.all():
+            for loader in getattr(getattr(engine, 'engine', None), 'template_loaders', ()):
+                if hasattr(loader, 'reset'):
+                    loader.reset()
+
+    @staticmethod
+    def get_mtimes(templates):
+        """
+        Returns modification times of passed templates files (`None` for missing templates and templates that weren't
+        loaded from a file)
+        """
+        mtimes = list()
+        for template in templates:
+            try:
+                mtimes.append(os.path.getmtime(template.origin.name))
+            except (AttributeError, OSError, TypeError):
+                mtimes.append(None)
+        return tuple(mtimes)
+
+    def clear(self, name=None):
+        """
+        Removes cached templates pair of passed template name or all of them
+        """
+        self.reset_loaders()
+        with self.lock:
+            if name is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(name, None)
+
+
+template_cache = TemplateCache()
+
+
 class SendTemplatedEmailAction(BaseAction):
     """
     Class representation of a send templated email action
 
     It takes an email subject and email template (selected from available templates) and sends it to passed
-    email address when linked condition is met.
+    email address when linked condition is met. The template is rendered with the target instance (`instance`) and
+    the action (`action`) in its context.
     """
     email = models.EmailField(
         verbose_name='email address',
@@ -32,6 +201,27 @@ class SendTemplatedEmailAction(BaseAction):
         max_length=256,
     )
 
+    SEND = 'send'
+    OUTBOX = 'outbox'
+    DELIVERY_MODE_CHOICES = (
+        (SEND, 'Send immediately'),
+        (OUTBOX, 'Add to the outbox (delivered by "deliver_outbox" command)'),
+    )
+    delivery_mode = models.CharField(
+        verbose_name='delivery mode',
+        choices=DELIVERY_MODE_CHOICES,
+        default=SEND,
+        max_length=64,
+    )
+
+    context_related = models.CharField(
+        verbose_name='context related objects',
+        max_length=256,
+        blank=True,
+        help_text='Comma separated related objects lookups of the target instance used by the template (i.e. '
+                  '"user, user__groups"), loaded for all instances at once when emails are sent in a batch.',
+    )
+
     class Meta(BaseAction.Meta):
         verbose_name = 'send templated email action'
         verbose_name_plural = 'send templated email actions'
@@ -47,27 +237,108 @@ class SendTemplatedEmailAction(BaseAction):
         """
         return get_available_templates('templates/conditioner/actions/emails/')
 
-    def run_action(self, *args, **kwargs):
+    def get_context_related(self):
+        """
+        Returns list of related objects lookups that are loaded for target instances before emails are rendered
+        """
+        return [lookup.strip() for lookup in self.context_related.split(',') if lookup.strip()]
+
+    def target_fields(self):
+        """
+        Extends default `target_fields()` behaviour and returns names of target model fields that related objects
+        lookups start with
+        """
+        return [lookup.split('__')[0] for lookup in self.get_context_related()]
+
+    def prepare_instances(self, instances):
+        """
+        Extends default `prepare_instances()` behaviour and loads related objects used by the email template for all
+        passed instances at once
+        """
+        lookups = self.get_context_related()
+        instances = [instance for instance in instances if instance is not None]
+        if lookups and instances:
+            if django.VERSION < (1, 10):
+                prefetch_related_objects(instances, lookups)
+            else:
+                prefetch_related_objects(instances, *lookups)
+
+    def get_context(self, instance=None):
+        """
+        Returns email template context of passed target instance
+        """
+        return {
+            'action': self,
+            'instance': instance,
+        }
+
+    def get_email(self, instance=None, templates=None):
         """
-        Send selected email template
+        Returns email message with rendered selected email template (and passed templates pair, if it was already
+        loaded)
         """
+        template, html_template = templates or template_cache.get(self.template)
+        context = self.get_context(instance)
+
         email = EmailMultiAlternatives(
             subject=self.subject,
-            body=render_to_string(self.template),
+            body=template.render(context),
             from_email=settings.DEFAULT_FROM_EMAIL,
             to=[self.email],
         )
 
         # Attach HTML template with the same name if it exists
-        try:
+        if html_template is not None:
             email.attach_alternative(
-                content=render_to_string(self.template.replace('.txt', '.html')),
+                content=html_template.render(context),
                 mimetype='text/html',
             )
-        except TemplateDoesNotExist:
-            pass
+
+        return email
+
+    def get_emails(self, instances):
+        """
+        Returns email messages of passed target instances, rendered with the same compiled templates after related
+        objects of all instances are loaded
+        """
+        templates = template_cache.get(self.template)
+        self.prepare_instances(instances)
+        return [self.get_email(instance, templates=templates) for instance in instances]
+
+    def run_action(self, *args, **kwargs):
+        """
+        Send selected email template (rendered with the target instance, passed as the first argument or as
+        'instance' keyword argument), or add it to the current email batch (see `EmailBatch`) if there's one, or to
+        the outbox (see `OutboxEmail`) in outbox delivery mode
+        """
+        email = self.get_email(kwargs.get('instance', args[0] if args else None))
+
+        if self.delivery_mode == self.OUTBOX:
+            OutboxEmail.from_message(email, rule_id=self.rule_id).save()
+            return None
+
+        batch = EmailBatch.get_current()
+        if batch is not None:
+            batch.add(email)
+            return None
 
         return email.send()
 
+    def run_batch_action(self, instances, *args, **kwargs):
+        """
+        Overrides default `run_batch_action()` behaviour, renders emails of all instances at once and sends them with
+        a single connection (or adds them to the outbox with a single query)
+        """
+        emails = self.get_emails(instances)
+
+        if self.delivery_mode == self.OUTBOX:
+            return OutboxEmail.objects.bulk_create(
+                OutboxEmail.from_message(email, rule_id=self.rule_id) for email in emails
+            )
+
+        with EmailBatch() as batch:
+            for email in emails:
+                batch.add(email)
+
     def __str__(self):
         return 'Send templated email action ({0.email}: {0.template})'.format(self)
@@ -43,12 +43,29 @@ class LoggerAction(BaseAction):
         verbose_name = 'logger action'
         verbose_name_plural = 'logger actions'
 
+    def get_log_extra(self, instance=None, condition_type=None):
+        """
+        Returns structured fields of the logged record: rule primary key ('rule_id'), passed rule condition class name
+        ('condition_type') and target instance primary key ('instance_pk')
+
+        It only uses values that are already loaded, so logging doesn't query the database.
+        """
+        return {
+            'rule_id': self.rule_id,
+            'condition_type': condition_type,
+            'instance_pk': getattr(instance, 'pk', None),
+        }
+
     def run_action(self, *args, **kwargs):
         """
-        Log saved message with saved logging level
+        Log saved message with saved logging level (with structured fields of the target instance, passed as the first
+        argument or as 'instance' keyword argument, and the condition class name, passed as 'condition_type' keyword
+        argument)
         """
         logging_func = getattr(logger, self.level.lower())
-        logging_func(self.message)
+        logging_func(self.message, extra=self.get_log_extra(
+            kwargs.get('instance', args[0] if args else None), kwargs.get('condition_type'),
+        ))
 
     def __str__(self):
         return 'Logger action ({0.level}: {0.message:.20})'.format(self)
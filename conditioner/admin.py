@@ -4,14 +4,17 @@ Conditioner module Django Admin integration
 from django.contrib import admin
 from django.contrib.admin.options import IS_POPUP_VAR
 from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
 
 from polymorphic.admin import PolymorphicInlineSupportMixin, StackedPolymorphicInline
 
 from conditioner.actions import SendTemplatedEmailAction, LoggerAction
 from conditioner.actions.forms import SendTemplatedEmailActionModelForm
 from conditioner.base import BaseAction, BaseCondition
-from conditioner.conditions import DayOfMonthCondition, DayOfWeekCondition, ModelSignalCondition
-from conditioner.models import Rule
+from conditioner.conditions import (
+    DayOfMonthCondition, DayOfWeekCondition, FieldChangeCondition, ModelSignalCondition,
+)
+from conditioner.models import OutboxEmail, Rule
 
 
 class ActionInline(StackedPolymorphicInline):
@@ -75,11 +78,16 @@ class ConditionInline(StackedPolymorphicInline):
     class ModelSignalConditionInline(StackedPolymorphicInline.Child):
         model = ModelSignalCondition
 
+    class FieldChangeConditionInline(StackedPolymorphicInline.Child):
+        model = FieldChangeCondition
+        exclude = ('signal',)  # Changes are always checked after the instance is saved
+
     model = BaseCondition
     child_inlines = [
         DayOfMonthConditionInline,
         DayOfWeekConditionInline,
         ModelSignalConditionInline,
+        FieldChangeConditionInline,
     ]
 
     def get_formset_children(self, request, obj=None):
@@ -173,3 +181,24 @@ class RuleAdmin(PolymorphicInlineSupportMixin, admin.ModelAdmin):
             )
 
         return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    """
+    Django Admin integration for `conditioner.OutboxEmail` model, with an action that retries failed emails
+    """
+    list_display = ('pk', 'subject', 'to', 'rule', 'status', 'attempts', 'next_attempt_at', 'created', 'sent')
+    list_filter = ('status',)
+    search_fields = ('subject', 'to')
+    actions = ('retry',)
+
+    def retry(self, request, queryset):
+        """
+        Schedules selected failed emails to be delivered again
+        """
+        count = queryset.filter(status=OutboxEmail.FAILED).update(
+            status=OutboxEmail.PENDING, attempts=0, next_attempt_at=timezone.now(),
+        )
+        self.message_user(request, '{} email(s) will be delivered again.'.format(count))
+    retry.short_description = 'Retry selected failed emails'
@@ -1,8 +1,10 @@
 """
 Conditioner module AppConfig integration
 """
-from django import db
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.signals import request_started
+from django.db.models.signals import post_delete, post_save
 
 
 class ConditionerAppConfig(AppConfig):
@@ -16,10 +18,29 @@ class ConditionerAppConfig(AppConfig):
         # Make sure that all models are imported
         from conditioner import actions  # noqa
         from conditioner import conditions  # noqa
+        from conditioner.base import BaseAction
+        from conditioner.dispatch import dispatcher
+        from conditioner.models import Rule
 
-        # Signals aren't persistent so we need to register them on startup
-        try:
-            for signal_condition in conditions.ModelSignalCondition.objects.all():
-                signal_condition.connect_signal()
-        except db.DatabaseError:  # Django migrations weren't run yet
-            pass
+        # Signal rules changes need to be picked up by other processes (only models that rules consist of are
+        # connected, so saving any other model isn't affected)
+        for model in self.apps.get_models():
+            if issubclass(model, (Rule, BaseAction, conditions.ModelSignalCondition)):
+                for signal in (post_save, post_delete):
+                    signal.connect(
+                        dispatcher.rules_changed, sender=model,
+                        dispatch_uid='conditioner.rules_changed.{0.app_label}.{0.model_name}'.format(model._meta),
+                    )
+
+        # Signals aren't persistent so we need to register them, but querying the database on startup would slow down
+        # every management command (and fail before migrations are run), so it's deferred until the first request or
+        # model signal
+        request_started.connect(dispatcher.request_started, dispatch_uid='conditioner.request_started')
+        dispatcher.connect_lazy_load()
+
+        # Logging handlers (i.e. files or syslog) can be moved to a background thread, so they don't block actions
+        log_queue_options = getattr(settings, 'CONDITIONER_LOG_QUEUE', None)
+        if log_queue_options:
+            from conditioner.log import log_queue
+
+            log_queue.start(**(log_queue_options if isinstance(log_queue_options, dict) else {}))
@@ -2,8 +2,11 @@
 Conditioner module base models
 """
 from django.db import models
+from django.utils import timezone
 
+from polymorphic.managers import PolymorphicManager
 from polymorphic.models import PolymorphicModel
+from polymorphic.query import PolymorphicQuerySet
 
 
 # Actions
@@ -35,11 +38,50 @@ class BaseAction(PolymorphicModel):
             "You have to implement 'run_action()' in all actions that inherit from 'BaseAction'"
         )
 
+    def target_fields(self):
+        """
+        Returns names of target model fields that the action needs, which are loaded together with the ones its model
+        specific cron condition needs (see `BaseCronCondition.target_fields()`), i.e. foreign keys of related objects
+        loaded by `prepare_instances()`, by default none
+        """
+        return ()
+
+    def prepare_instances(self, instances):
+        """
+        Prepares target instances the action is about to be run for, i.e. loads related objects the action needs for
+        all of them at once, by default does nothing
+        """
+
+    def run_batch_action(self, instances, *args, **kwargs):
+        """
+        Implements the action for a list of instances affected by a single bulk operation, by default runs the action
+        for each of them (actions that can handle all instances at once, i.e. with a single query, should override it)
+        """
+        self.prepare_instances(instances)
+        for instance in instances:
+            self.run_action(*args, instance=instance, **kwargs)
+
     def __str__(self):
         return 'Action'
 
 
 # Conditions
+class BaseConditionQuerySet(PolymorphicQuerySet):
+    """
+    Polymorphic queryset for `conditioner.base.BaseCondition` models
+    """
+    def with_actions(self):
+        """
+        Loads linked rules (with their target content types) and concrete rule actions in a fixed number of queries,
+        no matter how many conditions there are: one per condition subclass plus one per action subclass.
+        """
+        return self.select_related(
+            'rule', 'rule__target_content_type',
+        ).prefetch_related(
+            models.Prefetch('rule__action', queryset=BaseAction.objects.all()),
+        )
+
+
 class BaseCondition(PolymorphicModel):
     """
     Class representation of a base condition
@@ -51,6 +93,8 @@ class BaseCondition(PolymorphicModel):
         verbose_name='rule',
     )
 
+    objects = PolymorphicManager.from_queryset(BaseConditionQuerySet)()
+
     @staticmethod
     def model_specific():
         """
@@ -75,6 +119,50 @@ class BaseCronCondition(BaseCondition):
         editable=False,
     )
 
+    next_run_at = models.DateTimeField(
+        verbose_name='next run at',
+        null=True,
+        editable=False,
+        db_index=True,
+    )
+
+    @staticmethod
+    def target_fields():
+        """
+        Returns names of target model fields that model specific condition (and its action) needs, so only those are
+        loaded when target instances are checked, or `None` if all fields should be loaded (default). Fields that
+        aren't listed are loaded with a separate query per instance when accessed.
+        """
+        return None
+
+    def get_target_filter(self):
+        """
+        Returns a `Q` object that selects target instances which meet model specific condition, so they can be
+        selected by the database instead of checking each of them with `is_met()`, or `None` if the condition can't
+        be expressed as a filter (default). When a filter is returned, `is_met()` isn't called for target instances,
+        `is_due()` is checked once before they are selected instead.
+        """
+        return None
+
+    def is_due(self):
+        """
+        Returns whether the condition can be met at the moment regardless of target instances (i.e. it's the right day
+        and it wasn't executed yet). By default it's due once its next run date and time has passed and it wasn't
+        executed since, or always if it can't tell when it will be met.
+        """
+        if self.next_run_at is None:
+            return True
+        if self.next_run_at > timezone.now():
+            return False
+        return self.last_executed is None or self.last_executed < self.next_run_at
+
+    def get_next_run_at(self):
+        """
+        Returns the earliest date and time at which the condition can be met again or `None` if it can't be
+        determined, in which case the condition is checked on every run (default).
+        """
+        return None
+
     def is_met(self, *args, **kwargs):
         """
         Implements if the condition is met
@@ -85,3 +173,10 @@ class BaseCronCondition(BaseCondition):
 
     def __str__(self):
         return 'Cron condition'
+
+    def save(self, *args, **kwargs):
+        """
+        Extends default `save()` behaviour and recomputes 'next_run_at'
+        """
+        self.next_run_at = self.get_next_run_at()
+        return super().save(*args, **kwargs)
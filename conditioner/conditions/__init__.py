@@ -4,4 +4,4 @@ Conditioner module conditions
 All available conditions should be imported here for ease of use.
 """
 from conditioner.conditions.dates import DayOfMonthCondition, DayOfWeekCondition  # noqa
-from conditioner.conditions.signals import ModelSignalCondition  # noqa
+from conditioner.conditions.signals import FieldChangeCondition, ModelSignalCondition  # noqa
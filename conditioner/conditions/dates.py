@@ -1,6 +1,10 @@
 """
 Date related conditions models
 """
+import calendar
+import datetime
+
+from django.conf import settings
 from django.core.validators import MaxValueValidator
 from django.db import models
 from django.utils import timezone
@@ -8,6 +12,28 @@ from django.utils import timezone
 from conditioner.base import BaseCronCondition
 
 
+def start_of_day(date):
+    """
+    Helper method for returning the start of passed date as a datetime, aware (in UTC, the same as `timezone.now()`)
+    if time zone support is enabled
+    """
+    value = datetime.datetime.combine(date, datetime.time.min)
+    if settings.USE_TZ:
+        value = timezone.make_aware(value, timezone.utc)
+    return value
+
+
+def first_possible_date(last_executed):
+    """
+    Helper method for returning the first date on which a daily condition can be met, i.e. today or tomorrow if it
+    was already executed today
+    """
+    today = timezone.now().date()
+    if last_executed and last_executed.date() == today:
+        return today + datetime.timedelta(days=1)
+    return today
+
+
 class DayOfMonthCondition(BaseCronCondition):
     """
     Class representation of a day of month condition
@@ -34,6 +60,30 @@ class DayOfMonthCondition(BaseCronCondition):
 
         return False
 
+    def is_due(self):
+        """
+        Condition doesn't depend on target instances, so it's due whenever it's met
+        """
+        return self.is_met()
+
+    def get_next_run_at(self):
+        """
+        Next run is at the start of the closest day (today included, unless it was already executed today) with
+        day of the month equal to `day`
+        """
+        date = first_possible_date(self.last_executed)
+
+        # Not every month has all the days, so we may need to skip a few of them
+        for _ in range(13):
+            if 1 <= self.day <= calendar.monthrange(date.year, date.month)[1]:
+                candidate = date.replace(day=self.day)
+                if candidate >= date:
+                    return start_of_day(candidate)
+
+            date = (date.replace(day=1) + datetime.timedelta(days=32)).replace(day=1)
+
+        return None
+
     def __str__(self):
         return 'Day of month condition (day: {0.day})'.format(self)
 
@@ -74,5 +124,19 @@ class DayOfWeekCondition(BaseCronCondition):
 
         return False
 
+    def is_due(self):
+        """
+        Condition doesn't depend on target instances, so it's due whenever it's met
+        """
+        return self.is_met()
+
+    def get_next_run_at(self):
+        """
+        Next run is at the start of the closest day (today included, unless it was already executed today) with
+        ISO week day equal to `weekday`
+        """
+        date = first_possible_date(self.last_executed)
+        return start_of_day(date + datetime.timedelta(days=(self.weekday - date.isoweekday()) % 7))
+
     def __str__(self):
         return 'Day of week condition (day: {0})'.format(self.get_weekday_display())
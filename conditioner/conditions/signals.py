@@ -3,17 +3,21 @@ Conditioner module conditions signals related models
 """
 import uuid
 
+from django.core.exceptions import ValidationError
 from django.db import models
 
 from conditioner.base import BaseCondition
+from conditioner.dispatch import dispatcher
+from conditioner.tracking import tracker
 
 
 class ModelSignalCondition(BaseCondition):
     """
     Class representation of a model signal condition
 
-    It mirrors available Django model signals and creates a given signal for linked rule content type, with
-    linked action as signal receiver.
+    It mirrors available Django model signals (and conditioner bulk signals, sent by target models that use
+    `conditioner.signals.BulkSignalsQuerySetMixin`) and registers linked action in the signal dispatcher, which runs it
+    when a given signal is sent for linked rule content type.
     """
     PRE_INIT = 'pre_init'
     POST_INIT = 'post_init'
@@ -21,6 +25,9 @@ class ModelSignalCondition(BaseCondition):
     POST_SAVE = 'post_save'
     PRE_DELETE = 'pre_delete'
     POST_DELETE = 'post_delete'
+    POST_BULK_CREATE = 'post_bulk_create'
+    POST_BULK_UPDATE = 'post_bulk_update'
+    POST_BULK_DELETE = 'post_bulk_delete'
     SIGNAL_CHOICES = (
         ('Save', (
             (PRE_SAVE, 'Before creation'),
@@ -34,6 +41,11 @@ class ModelSignalCondition(BaseCondition):
             (PRE_INIT, 'Before initialization'),
             (POST_INIT, 'After initialization'),
         )),
+        ('Bulk', (
+            (POST_BULK_CREATE, 'After bulk creation'),
+            (POST_BULK_UPDATE, 'After bulk update'),
+            (POST_BULK_DELETE, 'After bulk deletion'),
+        )),
     )
     signal = models.CharField(
         verbose_name='signal',
@@ -41,6 +53,33 @@ class ModelSignalCondition(BaseCondition):
         max_length=64,
     )
 
+    IMMEDIATE = 'immediate'
+    ON_COMMIT = 'on_commit'
+    EXECUTION_MODE_CHOICES = (
+        (IMMEDIATE, 'Immediately, when the signal is sent'),
+        (ON_COMMIT, 'After the transaction is committed'),
+    )
+    execution_mode = models.CharField(
+        verbose_name='execution mode',
+        choices=EXECUTION_MODE_CHOICES,
+        default=IMMEDIATE,
+        max_length=64,
+    )
+
+    coalesce = models.BooleanField(
+        verbose_name='coalesce',
+        default=False,
+        help_text='Run the action once per queryset evaluation (with all loaded instances) instead of once per '
+                  'instance. Only for "After initialization" signal of target models that use bulk signals queryset.',
+    )
+
+    debounce = models.PositiveIntegerField(
+        verbose_name='debounce window',
+        default=0,
+        help_text='Number of seconds during which repeated signals for the same instance are collapsed into a single '
+                  'action run (0 to run the action for every signal).',
+    )
+
     dispatch_uid = models.UUIDField(
         verbose_name='dispatch ID',
         editable=False,
@@ -63,27 +102,49 @@ class ModelSignalCondition(BaseCondition):
         Connect selected signal to rule's target model
         """
         if hasattr(self.rule, 'action'):
-            signal = getattr(models.signals, self.signal)
-
-            signal.connect(
-                receiver=self.rule.action.run_action,
+            dispatcher.register(
+                signal_name=self.signal,
                 sender=self.rule.target_model,
                 dispatch_uid=self.dispatch_uid,
-                weak=False,
+                action=self.rule.action,
+                on_commit=self.execution_mode == self.ON_COMMIT,
+                check=self.get_check(),
+                coalesce=self.coalesce,
+                debounce=self.debounce,
+                condition_type=self.__class__.__name__,
             )
 
+    def is_met(self, **kwargs):
+        """
+        Implements if the condition is met for signal keyword arguments (i.e. `instance`), checked before the action
+        is run. Conditions that don't override it are always met and aren't checked at all, which keeps frequently sent
+        signals (i.e. initialization) cheap.
+        """
+        return True
+
+    def get_check(self):
+        """
+        Returns a callable that decides (when called with signal keyword arguments) if the action should be run or
+        `None` if it should always be run (if `is_met()` isn't overridden)
+        """
+        if type(self).is_met is ModelSignalCondition.is_met:
+            return None
+        return self.is_met
+
+    def clean(self):
+        """
+        Makes sure that only initialization signal is coalesced and that coalesced actions aren't debounced
+        """
+        if self.coalesce and self.signal != self.POST_INIT:
+            raise ValidationError({'coalesce': 'Only "After initialization" signal can be coalesced.'})
+        if self.coalesce and self.debounce:
+            raise ValidationError({'debounce': 'Coalesced actions can\'t be debounced.'})
+
     def disconnects_signal(self):
         """
         Disconnect selected signal from rule's target model
         """
-        if hasattr(self.rule, 'action'):
-            signal = getattr(models.signals, self.signal)
-
-            signal.disconnect(
-                receiver=self.rule.action.run_action,
-                sender=self.rule.target_model,
-                dispatch_uid=self.dispatch_uid,
-            )
+        dispatcher.unregister(self.dispatch_uid)
 
     def __str__(self):
         return 'Model signal condition ({0.signal} for {0.rule.target_content_type})'.format(self)
@@ -103,3 +164,73 @@ class ModelSignalCondition(BaseCondition):
         super_delete = super().delete(*args, **kwargs)
         self.disconnects_signal()  # After deletion to make sure that everything went OK
         return super_delete
+
+
+class FieldChangeCondition(ModelSignalCondition):
+    """
+    Class representation of a field change condition
+
+    It's met when selected rule target model field is changed (optionally to a given value) and the instance is saved.
+    Changes are tracked only for fields (and models) used by field change conditions.
+    """
+    field_name = models.CharField(
+        verbose_name='field name',
+        max_length=255,
+    )
+
+    value = models.CharField(
+        verbose_name='value',
+        max_length=255,
+        blank=True,
+        help_text='Leave empty to run the action on any change.',
+    )
+
+    class Meta(ModelSignalCondition.Meta):
+        verbose_name = 'field change condition'
+        verbose_name_plural = 'field change conditions'
+
+    def clean(self):
+        """
+        Extends default `clean()` behaviour and makes sure that selected field exists in rule's target model
+        """
+        super().clean()
+        if hasattr(self, 'rule') and self.rule.target_model and not tracker.get_attname(
+                self.rule.target_model, self.field_name):
+            raise ValidationError({'field_name': "Field doesn't exist in selected target model."})
+
+    def connect_signal(self):
+        """
+        Extends default `connect_signal()` behaviour and starts tracking selected field changes
+        """
+        super().connect_signal()
+        if hasattr(self.rule, 'action'):
+            tracker.track(self.dispatch_uid, self.rule.target_model, self.field_name)
+
+    def disconnects_signal(self):
+        """
+        Extends default `disconnects_signal()` behaviour and stops tracking selected field changes
+        """
+        super().disconnects_signal()
+        tracker.untrack(self.dispatch_uid)
+
+    def is_met(self, instance, **kwargs):
+        """
+        Checks if selected field of saved instance was changed (to selected value)
+        """
+        attname = tracker.get_attname(type(instance), self.field_name)
+        if not attname or not tracker.has_changed(instance, attname):
+            return False
+
+        return not self.value or str(getattr(instance, attname)) == self.value
+
+    def __str__(self):
+        if self.value:
+            return 'Field change condition ({0.field_name} changed to {0.value})'.format(self)
+        return 'Field change condition ({0.field_name} changed)'.format(self)
+
+    def save(self, *args, **kwargs):
+        """
+        Extends default `save()` behaviour and makes sure that changes are checked after the instance is saved
+        """
+        self.signal = self.POST_SAVE
+        return super().save(*args, **kwargs)
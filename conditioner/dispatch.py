@@ -0,0 +1,609 @@
+"""
+Conditioner module model signals dispatching
+"""
+import atexit
+import heapq
+import itertools
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict, namedtuple
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import OperationalError, ProgrammingError, connections, models, transaction
+
+from conditioner import signals as bulk_signals
+from conditioner.ratelimit import limiter
+from conditioner.tracking import tracker
+
+
+logger = logging.getLogger(__name__)
+
+
+RULES_VERSION_CACHE_KEY = 'conditioner:rules_version'
+
+# Signal rule action with its execution options
+Registration = namedtuple('Registration', ['action', 'on_commit', 'check', 'coalesce', 'debounce', 'condition_type'])
+
+
+def on_commit(func, using=None):
+    """
+    Calls passed function after the current transaction is committed (immediately if there's no transaction or
+    transaction hooks aren't supported, i.e. Django 1.8)
+    """
+    hook = getattr(transaction, 'on_commit', None)  # Django 1.9+
+    if hook is None:
+        func()
+    else:
+        hook(func, using=using)
+
+
+class ActionBatch(object):
+    """
+    Actions deferred until the current transaction is committed, which are run by a background thread (so they don't
+    add to the latency of the request that triggered them)
+
+    Every action is deferred with its own `on_commit()` callback, so Django discards the ones triggered in a rolled
+    back transaction (or savepoint). The callbacks only queue actions and the background (daemon) thread, which is
+    started with the first action, runs all queued actions together. Actions still queued when the process exits are
+    run on exit, but they are lost if the process is killed (i.e. with SIGKILL).
+    """
+    def __init__(self, autostart=True):
+        self.autostart = autostart
+        self.condition = threading.Condition()
+        # [(run, keyword arguments)]
+        self.actions = list()
+        self.thread = None
+
+    def defer(self, run, kwargs, using=None):
+        """
+        Calls action method (`run_action()` or `run_batch_action()`) with passed keyword arguments in the background
+        thread, after the current transaction is committed
+        """
+        on_commit(partial(self.add, run, kwargs), using=using)
+
+    def add(self, run, kwargs):
+        """
+        Queues action method to be called with passed keyword arguments by the background thread
+        """
+        with self.condition:
+            self.actions.append((run, kwargs))
+
+            if self.autostart and (self.thread is None or not self.thread.is_alive()):
+                self.start()
+            self.condition.notify()
+
+    def run(self):
+        """
+        Runs all queued actions, making sure that a failed one doesn't prevent others from running
+        """
+        with self.condition:
+            actions, self.actions = self.actions, list()
+
+        for run, kwargs in actions:
+            try:
+                run(**kwargs)
+            except Exception:
+                logger.exception("Deferred action '{}' failed".format(getattr(run, '__self__', run)))
+
+    def start(self):
+        """
+        Starts background thread that runs queued actions
+        """
+        if self.thread is None:
+            atexit.register(self.run)
+
+        self.thread = threading.Thread(target=self.work, name='conditioner-actions', daemon=True)
+        self.thread.start()
+
+    def work(self):
+        while True:
+            with self.condition:
+                while not self.actions:
+                    self.condition.wait()
+
+            try:
+                self.run()
+            finally:
+                connections.close_all()
+
+
+class Debouncer(object):
+    """
+    Collapses repeated signals for the same rule and instance into a single action run
+
+    The first signal starts a window (of rule debounce seconds) and the action is run once, when it ends, with
+    keyword arguments (i.e. instance) of the latest signal. Actions are run by a background (daemon) thread, which is
+    started with the first signal, and the ones still pending when the process exits are run on exit (or discarded,
+    if `run_on_exit` isn't set).
+    """
+    def __init__(self, autostart=True, run_on_exit=True):
+        self.autostart = autostart
+        self.run_on_exit = run_on_exit
+        self.condition = threading.Condition()
+        # key -> [run, keyword arguments]
+        self.pending = dict()
+        # (deadline, sequence number, key)
+        self.heap = list()
+        self.sequence = itertools.count()
+        self.thread = None
+
+    def add(self, key, run, kwargs, window):
+        """
+        Schedules action method to be called with passed keyword arguments after `window` seconds, or replaces
+        keyword arguments of the one that's already pending for passed key
+
+        :return: if a new action was scheduled
+        :rtype: bool
+        """
+        with self.condition:
+            entry = self.pending.get(key)
+            if entry is not None:
+                entry[1] = kwargs
+                return False
+
+            self.pending[key] = [run, kwargs]
+            heapq.heappush(self.heap, (time.monotonic() + window, next(self.sequence), key))
+
+            if self.autostart and (self.thread is None or not self.thread.is_alive()):
+                self.start()
+            self.condition.notify()
+            return True
+
+    def flush(self, now=None):
+        """
+        Runs pending actions which window ended before passed monotonic time (all pending actions by default)
+        """
+        if now is None:
+            now = float('inf')
+
+        with self.condition:
+            due = list()
+            while self.heap and self.heap[0][0] <= now:
+                _, _, key = heapq.heappop(self.heap)
+                due.append(self.pending.pop(key))
+
+        for run, kwargs in due:
+            try:
+                run(**kwargs)
+            except Exception:
+                logger.exception("Debounced action '{}' failed".format(getattr(run, '__self__', run)))
+
+    def discard(self):
+        """
+        Removes all pending actions without running them and logs their number
+
+        :return: number of discarded actions
+        :rtype: int
+        """
+        with self.condition:
+            discarded = len(self.pending)
+            self.pending.clear()
+            self.heap = list()
+
+        if discarded:
+            logger.warning("{} pending action run(s) discarded".format(discarded))
+        return discarded
+
+    def start(self):
+        """
+        Starts background thread that runs actions when their window ends
+        """
+        if self.thread is None:
+            atexit.register(self.flush if self.run_on_exit else self.discard)
+
+        self.thread = threading.Thread(target=self.work, name='conditioner-debouncer', daemon=True)
+        self.thread.start()
+
+    def work(self):
+        while True:
+            with self.condition:
+                while not self.heap:
+                    self.condition.wait()
+
+                timeout = self.heap[0][0] - time.monotonic()
+                if timeout > 0:
+                    self.condition.wait(timeout)
+                    continue
+
+            try:
+                self.flush(time.monotonic())
+            finally:
+                connections.close_all()
+
+
+class SignalDispatcher(object):
+    """
+    Dispatches Django model signals to rule actions
+
+    Instead of connecting every action as a separate signal receiver, a single receiver is connected per signal and
+    sender (model) pair. It looks up actions in an in-memory index, so the cost of sending a signal doesn't depend on
+    how many rules use other signals or models, and signals of models without rules aren't received at all.
+
+    Rules are loaded lazily (so starting the application doesn't query the database), when the first request is
+    started or the first model signal is sent, whichever comes first.
+
+    Rules can be changed by other processes, so the dispatcher keeps the rules version stamp (stored in Django cache)
+    it was loaded with and reloads the index when it changes. The stamp is checked at most once per
+    `CONDITIONER_RULES_CHECK_INTERVAL` seconds (5 by default), when a request is started or a signal is dispatched.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        # (signal name, sender) -> {dispatch ID: registration}, entries are replaced (and not modified) on change so
+        # they can be safely iterated over while dispatching
+        self.index = dict()
+        # dispatch ID (as a string, which hash is cached) -> (signal name, sender)
+        self.keys = dict()
+        self.batch = ActionBatch()
+        self.debouncer = Debouncer()
+        self.load_lock = threading.RLock()
+        self.loaded = False
+        self.loading = False
+        self.version = None
+        self.next_check = 0
+        self.failed_loads = 0
+
+    @staticmethod
+    def get_dispatch_uid(signal_name, sender):
+        """
+        Returns signal receiver dispatch ID for passed signal name and sender
+        """
+        if sender is None:
+            return 'conditioner.{}'.format(signal_name)
+        return 'conditioner.{}.{}.{}'.format(signal_name, sender._meta.app_label, sender._meta.model_name)
+
+    def register(self, signal_name, sender, dispatch_uid, action, on_commit=False, check=None, coalesce=False,
+                 debounce=0, condition_type=None):
+        """
+        Adds action to the index (replacing the previously registered one with the same dispatch ID) and connects
+        signal receiver if it's the first action for passed signal name and sender. Actions registered with
+        `on_commit` are deferred until the transaction that sent the signal is committed, actions registered with
+        `check` are only run if it returns `True` when called with signal keyword arguments and actions registered with
+        `coalesce` are run once per queryset evaluation (see `conditioner.signals.FetchBatch`). Repeated signals for
+        the same instance of actions registered with `debounce` are collapsed into one run (see `Debouncer`). Actions
+        registered with `condition_type` (class name of their condition) get it as a keyword argument.
+        """
+        key = (signal_name, sender)
+        dispatch_uid = str(dispatch_uid)
+
+        with self.lock:
+            if self.keys.get(dispatch_uid, key) != key:
+                self._remove(dispatch_uid)
+
+            actions = self.index.get(key)
+            if actions is None:
+                actions = OrderedDict()
+                self._connect(key)
+            else:
+                actions = actions.copy()
+
+            actions[dispatch_uid] = Registration(action, on_commit, check, coalesce, debounce, condition_type)
+            self.index[key] = actions
+            self.keys[dispatch_uid] = key
+
+    def unregister(self, dispatch_uid):
+        """
+        Removes action from the index and disconnects signal receiver if it was the last action for its signal name
+        and sender
+        """
+        with self.lock:
+            self._remove(str(dispatch_uid))
+
+    def sync(self, registrations):
+        """
+        Replaces the index with passed `(dispatch ID, signal name, sender, registration)` tuples, only connecting and
+        disconnecting receivers of signal name and sender pairs that were added or removed
+        """
+        index = dict()
+        keys = dict()
+        for dispatch_uid, signal_name, sender, registration in registrations:
+            key = (signal_name, sender)
+            index.setdefault(key, OrderedDict())[str(dispatch_uid)] = registration
+            keys[str(dispatch_uid)] = key
+
+        with self.lock:
+            for key in set(self.index) - set(index):
+                self._disconnect(key)
+            for key in set(index) - set(self.index):
+                self._connect(key)
+
+            self.index = index
+            self.keys = keys
+
+    def clear(self):
+        """
+        Removes all actions from the index and disconnects all signal receivers
+        """
+        self.sync([])
+
+    def load(self):
+        """
+        Loads all signal rules (with their rules, target content types and actions) from the database, with a fixed
+        number of queries, and syncs the index (and fields watched by field change conditions) with them
+        """
+        from conditioner.conditions import FieldChangeCondition, ModelSignalCondition
+
+        with self.load_lock:
+            # Instances created while loading send signals too
+            self.loading = True
+            try:
+                # Version is read first, so changes made while rules are loaded aren't missed
+                version = self.get_version()
+
+                # Savepoint makes sure that a failed query (i.e. migrations weren't run yet) doesn't break the
+                # transaction that sent the signal
+                with transaction.atomic():
+                    conditions = list(ModelSignalCondition.objects.exclude(rule__isnull=True).with_actions())
+            finally:
+                self.loading = False
+
+            conditions = [condition for condition in conditions if hasattr(condition.rule, 'action')]
+            self.sync(
+                (
+                    condition.dispatch_uid, condition.signal, condition.rule.target_model, Registration(
+                        action=condition.rule.action,
+                        on_commit=condition.execution_mode == ModelSignalCondition.ON_COMMIT,
+                        check=condition.get_check(),
+                        coalesce=condition.coalesce,
+                        debounce=condition.debounce,
+                        condition_type=condition.__class__.__name__,
+                    ),
+                )
+                for condition in conditions
+            )
+            tracker.sync(
+                (condition.dispatch_uid, condition.rule.target_model, condition.field_name)
+                for condition in conditions if isinstance(condition, FieldChangeCondition)
+            )
+            self.version = version
+
+            if not self.loaded:
+                self.loaded = True
+                self.disconnect_lazy_load()
+
+    def ensure_loaded(self):
+        """
+        Loads signal rules if they weren't loaded yet
+        """
+        if self.loaded or self.loading:
+            return
+
+        with self.load_lock:
+            if not self.loaded and not self.loading:
+                self.load()
+
+    def check_version(self):
+        """
+        Loads the index if it wasn't loaded yet or reloads it if rules were changed (by any process) since it was
+        loaded, checking the rules version at most once per `CONDITIONER_RULES_CHECK_INTERVAL` seconds
+        """
+        now = time.monotonic()
+        if now < self.next_check:
+            return
+        self.next_check = now + getattr(settings, 'CONDITIONER_RULES_CHECK_INTERVAL', 5)
+
+        try:
+            if not self.loaded:
+                self.ensure_loaded()
+            elif self.get_version() != self.version:
+                self.load()
+        except (OperationalError, ProgrammingError):
+            # Tables don't exist yet (migrations weren't run) or the database is unavailable, so keep the current
+            # index and try again after the next interval
+            logger.debug("Couldn't load conditioner signal rules", exc_info=True)
+            self.failed_loads += 1
+
+    def connect_lazy_load(self):
+        """
+        Connects receivers of all model signals that load signal rules when the first signal is sent
+        """
+        for signal_name in self.get_signal_names():
+            self.get_signal(signal_name).connect(
+                receiver=self.get_lazy_load_receiver(signal_name),
+                dispatch_uid='conditioner.lazy_load.{}'.format(signal_name),
+                weak=False,
+            )
+
+    def disconnect_lazy_load(self):
+        """
+        Disconnects receivers connected with `connect_lazy_load()`
+        """
+        for signal_name in self.get_signal_names():
+            self.get_signal(signal_name).disconnect(
+                dispatch_uid='conditioner.lazy_load.{}'.format(signal_name),
+            )
+
+    @staticmethod
+    def get_signal(signal_name):
+        """
+        Returns Django model signal or conditioner bulk signal with passed name
+        """
+        if signal_name in bulk_signals.BULK_SIGNALS:
+            return getattr(bulk_signals, signal_name)
+        return getattr(models.signals, signal_name)
+
+    @staticmethod
+    def get_signal_names():
+        """
+        Returns names of model signals that signal conditions can use
+        """
+        from conditioner.conditions import ModelSignalCondition
+
+        return [signal_name for _, signals in ModelSignalCondition.SIGNAL_CHOICES for signal_name, _ in signals]
+
+    def get_lazy_load_receiver(self, signal_name):
+        """
+        Returns signal receiver that loads signal rules and runs actions registered for the signal that triggered it
+        (receivers connected while a signal is sent aren't called until it's sent again)
+
+        Receivers are disconnected once rules fail to load `CONDITIONER_LAZY_LOAD_ATTEMPTS` times (10 by default), so
+        model signals aren't slowed down for good when they can't be loaded (i.e. migrations weren't run). Rules are
+        still loaded when a request is started.
+        """
+        def receiver(sender, **kwargs):
+            if self.loaded or self.loading:
+                return
+
+            self.check_version()
+            if self.loaded:
+                self.run_actions(signal_name, sender, dict(kwargs, sender=sender))
+            elif self.failed_loads >= getattr(settings, 'CONDITIONER_LAZY_LOAD_ATTEMPTS', 10):
+                logger.warning("Conditioner signal rules couldn't be loaded, model signals stopped loading them")
+                self.disconnect_lazy_load()
+
+        return receiver
+
+    @staticmethod
+    def get_cache():
+        """
+        Returns Django cache that stores the rules version, set with `CONDITIONER_CACHE` setting
+        """
+        return caches[getattr(settings, 'CONDITIONER_CACHE', 'default')]
+
+    def get_version(self):
+        """
+        Returns current rules version stamp
+        """
+        return self.get_cache().get(RULES_VERSION_CACHE_KEY)
+
+    def bump_version(self):
+        """
+        Changes rules version stamp (after the current transaction is committed, if supported), so all processes
+        reload their index
+        """
+        def bump():
+            # A random stamp (and not a counter) makes sure that evicted cache entries are also seen as a change
+            self.get_cache().set(RULES_VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+
+        on_commit = getattr(transaction, 'on_commit', None)  # Django 1.9+
+        if on_commit is not None:
+            on_commit(bump)
+        else:
+            bump()
+
+    def rules_changed(self, **kwargs):
+        """
+        Signal receiver that bumps rules version when a rule, action or signal condition is changed
+        """
+        self.bump_version()
+
+    def request_started(self, **kwargs):
+        """
+        Signal receiver that checks rules version when a request is started
+        """
+        self.check_version()
+
+    def get_actions(self, signal_name, sender):
+        """
+        Returns actions registered for passed signal name and sender
+        """
+        return [registration.action for registration in self.index.get((signal_name, sender), {}).values()]
+
+    def run_actions(self, signal_name, sender, kwargs):
+        """
+        Runs (or defers) actions registered for passed signal name and sender with signal keyword arguments, bulk
+        signals run `run_batch_action()` (once per bulk operation) instead of `run_action()`
+
+        Conditions checks are evaluated before actions are run and coalesced actions (of initialization signals sent
+        while a queryset is evaluated) only collect the instance, to be run once the whole queryset is loaded.
+        Debounced actions are passed to the debouncer when the signal is sent or, for `on_commit` actions, when the
+        transaction is committed (so rolled back changes don't trigger them).
+        """
+        method_name = 'run_batch_action' if signal_name in bulk_signals.BULK_SIGNALS else 'run_action'
+        batch = None
+
+        for dispatch_uid, registration in self.index.get((signal_name, sender), {}).items():
+            if registration.check is not None and not registration.check(**kwargs):
+                continue
+
+            action_kwargs = kwargs
+            if registration.condition_type is not None:
+                action_kwargs = dict(kwargs, condition_type=registration.condition_type)
+
+            if registration.coalesce and 'instance' in kwargs:
+                batch = batch or bulk_signals.FetchBatch.get_current(sender)
+                if batch is not None:
+                    instances = batch.get(dispatch_uid)
+                    if instances is None:
+                        batch_kwargs = {key: value for key, value in action_kwargs.items() if key != 'instance'}
+                        instances = batch.add(dispatch_uid, partial(self.run_batch, registration, batch_kwargs))
+                    instances.append(kwargs['instance'])
+                    continue
+
+            instance = kwargs.get('instance')
+            if registration.debounce and instance is not None and instance.pk is not None:
+                debounce = partial(
+                    self.debouncer.add, (dispatch_uid, sender, instance.pk),
+                    partial(limiter.call, getattr(registration.action, method_name)), action_kwargs,
+                    registration.debounce,
+                )
+                if registration.on_commit:
+                    on_commit(debounce, using=kwargs.get('using'))
+                else:
+                    debounce()
+                continue
+
+            self.run(getattr(registration.action, method_name), registration.on_commit, action_kwargs)
+
+    def run(self, run, deferred, kwargs):
+        """
+        Calls action method with signal keyword arguments now or (in the background) after the transaction is
+        committed, subject to action rate limits
+        """
+        run = partial(limiter.call, run)
+        if deferred:
+            self.batch.defer(run, kwargs, using=kwargs.get('using'))
+        else:
+            run(**kwargs)
+
+    def run_batch(self, registration, kwargs, instances):
+        """
+        Runs coalesced action for all instances collected while a queryset was evaluated
+        """
+        self.run(registration.action.run_batch_action, registration.on_commit, dict(kwargs, instances=instances))
+
+    def get_receiver(self, signal_name, sender):
+        """
+        Returns signal receiver that runs all actions registered for passed signal name and sender
+        """
+        def receiver(**kwargs):
+            self.check_version()
+            self.run_actions(signal_name, sender, kwargs)
+
+        return receiver
+
+    def _connect(self, key):
+        signal_name, sender = key
+        self.get_signal(signal_name).connect(
+            receiver=self.get_receiver(signal_name, sender),
+            sender=sender,
+            dispatch_uid=self.get_dispatch_uid(signal_name, sender),
+            weak=False,
+        )
+
+    def _disconnect(self, key):
+        signal_name, sender = key
+        self.get_signal(signal_name).disconnect(
+            sender=sender,
+            dispatch_uid=self.get_dispatch_uid(signal_name, sender),
+        )
+
+    def _remove(self, dispatch_uid):
+        key = self.keys.pop(dispatch_uid, None)
+        if key is None:
+            return
+
+        actions = self.index[key].copy()
+        del actions[dispatch_uid]
+
+        if actions:
+            self.index[key] = actions
+        else:
+            del self.index[key]
+            self._disconnect(key)
+
+
+dispatcher = SignalDispatcher()
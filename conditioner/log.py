@@ -0,0 +1,130 @@
+"""
+Conditioner module non-blocking logging
+"""
+import atexit
+import logging
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+
+DROP_NEW = 'drop_new'
+DROP_OLDEST = 'drop_oldest'
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Logging handler that puts records to a bounded queue and never blocks the logging thread
+
+    When the queue is full, the new record is dropped (`drop_new` overflow policy) or the oldest queued record is
+    dropped to make room for it (`drop_oldest` overflow policy). Dropped records are counted in `dropped`.
+    """
+    def __init__(self, record_queue, overflow=DROP_NEW):
+        super().__init__(record_queue)
+        self.overflow = overflow
+        self.dropped = 0
+        self.dropped_lock = threading.Lock()
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+
+        if self.overflow == DROP_OLDEST:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                self.queue.put_nowait(record)
+            except queue.Full:
+                pass
+
+        with self.dropped_lock:
+            self.dropped += 1
+
+
+class LevelQueueListener(QueueListener):
+    """
+    Queue listener that passes records only to handlers whose level they meet (`respect_handler_level` isn't
+    available before Python 3.5) and can be stopped when the queue is full
+    """
+    def enqueue_sentinel(self):
+        # The queue can be full when the listener is stopped, so it needs to wait until the listener makes room
+        self.queue.put(self._sentinel)
+
+    def handle(self, record):
+        record = self.prepare(record)
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
+class QueueLogging(object):
+    """
+    Routes 'conditioner' loggers records through a bounded in-memory queue, which is drained by a background listener
+    thread that passes them to the original handlers (so slow handlers, i.e. files or syslog, don't block request
+    threads)
+
+    Original handlers are the 'conditioner' logger handlers and, if it propagates records, handlers of its ancestors
+    (i.e. the root logger), at the time the queue is started. They're restored when it's stopped.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.handler = None
+        self.listener = None
+        self.previous = None
+
+    def start(self, size=10000, overflow=DROP_NEW):
+        """
+        Starts routing 'conditioner' loggers records through a queue of passed size with passed overflow policy
+        """
+        with self.lock:
+            if self.listener is not None:
+                return
+
+            logger = logging.getLogger('conditioner')
+            self.previous = (list(logger.handlers), logger.propagate)
+
+            handlers = list()
+            current = logger
+            while current is not None:
+                handlers += current.handlers
+                if not current.propagate:
+                    break
+                current = current.parent
+
+            self.handler = DroppingQueueHandler(queue.Queue(size), overflow=overflow)
+            self.listener = LevelQueueListener(self.handler.queue, *handlers)
+            self.listener.start()
+
+            logger.handlers = [self.handler]
+            logger.propagate = False
+
+        atexit.register(self.stop)
+
+    def stop(self):
+        """
+        Processes queued records, stops the listener thread and restores original handlers
+        """
+        with self.lock:
+            if self.listener is None:
+                return
+
+            logger = logging.getLogger('conditioner')
+            logger.handlers, logger.propagate = self.previous
+            self.listener.stop()
+            self.listener = None
+
+        atexit.unregister(self.stop)
+
+    def get_dropped(self):
+        """
+        Returns number of records dropped because the queue was full
+        """
+        return self.handler.dropped if self.handler is not None else 0
+
+
+log_queue = QueueLogging()
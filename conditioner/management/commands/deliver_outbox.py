@@ -0,0 +1,203 @@
+import datetime
+import signal
+import threading
+import time
+import uuid
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections, router, transaction
+from django.utils import timezone
+
+from conditioner.actions.common import EmailBatch
+from conditioner.models import OutboxEmail
+
+
+class Command(BaseCommand):
+    help = "Deliver emails waiting in the outbox"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help="Number of emails claimed and sent with a single connection at once (default: 100).",
+        )
+        parser.add_argument(
+            '--max-attempts', type=int, default=5,
+            help="Number of delivery attempts before an email is marked as failed (default: 5).",
+        )
+        parser.add_argument(
+            '--backoff', type=float, default=60,
+            help="Delay (in seconds) before the first retry of an email, doubled with every next attempt "
+                 "(default: 60).",
+        )
+        parser.add_argument(
+            '--lease', type=float, default=300,
+            help="Time (in seconds) after which emails claimed by a worker that didn't deliver them (i.e. it crashed) "
+                 "can be claimed again (default: 300).",
+        )
+        parser.add_argument(
+            '--daemon', action='store_true', default=False,
+            help="Keep running and deliver emails as soon as they are added, until stopped with SIGTERM or SIGINT.",
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=5,
+            help="How often (in seconds) the daemon checks the outbox when it's empty (default: 5).",
+        )
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.max_attempts = options['max_attempts']
+        self.backoff = options['backoff']
+        self.lease = options['lease']
+        # The connection is reused by all batches (it's opened once per batch)
+        self.connection = get_connection()
+
+        if options['daemon']:
+            self.run_daemon(options['poll_interval'])
+        else:
+            started = time.monotonic()
+            sent, failed = self.deliver_all()
+            self.stdout.write("Delivered {} email(s) ({} failed) in {:.3f}s".format(
+                sent, failed, time.monotonic() - started,
+            ))
+
+    def deliver_all(self):
+        """
+        Delivers batches of due emails until there are none left
+
+        :return: number of sent and failed emails
+        :rtype: tuple
+        """
+        sent = failed = 0
+        while True:
+            emails = self.claim()
+            if not emails:
+                return sent, failed
+
+            batch_sent, batch_failed = self.deliver(emails)
+            sent += batch_sent
+            failed += batch_failed
+
+    def run_daemon(self, poll_interval):
+        """
+        Delivers emails until stopped, sleeping for the poll interval whenever the outbox is empty
+        """
+        self.stop_event = threading.Event()
+        previous_handlers = {
+            signum: signal.signal(signum, self.stop) for signum in (signal.SIGTERM, signal.SIGINT)
+        }
+
+        try:
+            while not self.stop_event.is_set():
+                close_old_connections()
+
+                try:
+                    emails = self.claim()
+                    if emails:
+                        self.deliver(emails)
+                        continue
+                except Exception as e:
+                    # Transient errors (i.e. a lost database connection) shouldn't stop the daemon, claimed emails are
+                    # claimed again when their lease expires
+                    self.stderr.write("Delivery failed ({}: {})".format(e.__class__.__name__, e))
+                    close_old_connections()
+
+                self.stop_event.wait(poll_interval)
+        finally:
+            for signum, handler in previous_handlers.items():
+                signal.signal(signum, handler)
+
+        self.stdout.write(self.style.SUCCESS("Daemon stopped."))
+
+    def stop(self, signum, frame):
+        """
+        Signal handler that gracefully stops the daemon (after the current batch is delivered)
+        """
+        self.stop_event.set()
+
+    def claim(self):
+        """
+        Claims a batch of due emails, so they aren't delivered by other workers at the same time
+
+        Emails are claimed with a conditional `UPDATE` that sets a unique claim token only for emails that are still
+        due (and postpones them by the lease), so concurrent workers never claim the same email. On databases that
+        support it (i.e. PostgreSQL, Django 1.11+) candidates are selected with `SELECT ... FOR UPDATE SKIP LOCKED`,
+        so workers don't compete for the same rows.
+        """
+        using = router.db_for_write(OutboxEmail)
+        now = timezone.now()
+        token = uuid.uuid4().hex
+        due = OutboxEmail.objects.using(using).filter(status=OutboxEmail.PENDING, next_attempt_at__lte=now)
+
+        with transaction.atomic(using=using):
+            candidates = due.order_by('next_attempt_at')
+            if getattr(connections[using].features, 'has_select_for_update_skip_locked', False):
+                candidates = candidates.select_for_update(skip_locked=True)
+            pks = list(candidates.values_list('pk', flat=True)[:self.batch_size])
+
+            due.filter(pk__in=pks).update(
+                claim=token, next_attempt_at=now + datetime.timedelta(seconds=self.lease),
+            )
+
+        return list(OutboxEmail.objects.using(using).filter(claim=token).order_by('pk'))
+
+    def deliver(self, emails):
+        """
+        Sends claimed emails with the shared connection and marks them as sent, or schedules their next attempt (or
+        marks them as failed after the maximum number of attempts)
+
+        Emails that couldn't be turned into a message and all emails of a batch which connection couldn't be opened
+        are failed attempts as well. Emails are only updated while they are still claimed by this worker (i.e. not
+        after the lease expired and another worker claimed them).
+
+        :return: number of sent and failed emails
+        :rtype: tuple
+        """
+        # All emails are claimed with the same token (in the database they were claimed in)
+        claimed = OutboxEmail.objects.using(router.db_for_write(OutboxEmail)).filter(claim=emails[0].claim)
+        messages = dict()
+        failed = dict()
+        with EmailBatch(chunk_size=len(emails), connection=self.connection) as batch:
+            for email in emails:
+                try:
+                    message = email.get_message()
+                except Exception as e:
+                    failed[email.pk] = e
+                    continue
+                messages[id(message)] = email
+                batch.add(message)
+
+        now = timezone.now()
+        for message, exception in batch.failed:
+            failed[messages[id(message)].pk] = exception
+
+        sent = [email.pk for email in emails if email.pk not in failed]
+        if sent:
+            claimed.filter(pk__in=sent).update(status=OutboxEmail.SENT, sent=now, claim=None)
+
+        for email in emails:
+            if email.pk not in failed:
+                continue
+
+            email.attempts += 1
+            email.last_error = '{}: {}'.format(failed[email.pk].__class__.__name__, failed[email.pk])
+            email.claim = None
+            if email.attempts >= self.max_attempts:
+                email.status = OutboxEmail.FAILED
+                self.stdout.write(self.style.ERROR("{} failed after {} attempt(s): {}".format(
+                    email, email.attempts, email.last_error,
+                )))
+            else:
+                email.next_attempt_at = now + datetime.timedelta(seconds=self.get_backoff(email.attempts))
+            claimed.filter(pk=email.pk).update(**{
+                field_name: getattr(email, field_name)
+                for field_name in ('attempts', 'last_error', 'claim', 'status', 'next_attempt_at')
+            })
+
+        return len(sent), len(failed)
+
+    def get_backoff(self, attempts):
+        """
+        Returns delay (in seconds) before the next attempt of an email that failed passed number of times
+        """
+        return self.backoff * 2 ** (attempts - 1)
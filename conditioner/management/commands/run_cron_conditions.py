@@ -1,45 +1,719 @@
-from django.core.management.base import BaseCommand
+import datetime
+import heapq
+import queue
+import signal
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections, router, transaction
+from django.db.models import Case, DateTimeField, Max, Min, Q, Value, When
 from django.utils import timezone
 
+from conditioner.actions.common import EmailBatch
 from conditioner.base import BaseCronCondition
+from conditioner.models import CronConditionExecution
+from conditioner.ratelimit import RUN, limiter
+
+
+@contextmanager
+def _noop_context():
+    yield
+
+
+ConditionResult = namedtuple('ConditionResult', ['condition', 'executed', 'error', 'duration'])
+
+
+def parse_shard(value):
+    """
+    Helper method for parsing '--shard' option value in 'i/n' format (where 0 <= i < n)
+    """
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise CommandError("Shard should be in 'i/n' format, got '{}'.".format(value))
+
+    if not 0 <= index < count:
+        raise CommandError("Shard index should be between 0 and {}, got {}.".format(count - 1, index))
+
+    return index, count
+
+
+class ExecutionBuffer(object):
+    """
+    Collects executed conditions and saves their 'last_executed' and 'next_run_at' (and only those) in batches, with
+    a single `UPDATE` query per batch
+
+    Executions of model specific conditions for target instances are collected as well, but they are saved after every
+    chunk of target instances (see `flush_executions()`), so a crash doesn't lose more than a chunk of them.
+    """
+    def __init__(self, batch_size, atomic=False):
+        self.batch_size = batch_size
+        self.atomic = atomic
+        self.conditions = dict()
+        self.executions = dict()
+        self.lock = threading.Lock()
+
+    def add(self, condition):
+        """
+        Adds executed condition to the buffer and flushes it if it's full
+        """
+        with self.lock:
+            self.conditions[condition.pk] = condition
+            if len(self.conditions) >= self.batch_size:
+                self._flush()
+
+    def add_execution(self, condition, instance):
+        """
+        Adds model specific condition execution for target instance to the buffer
+        """
+        with self.lock:
+            self.executions.setdefault(condition.pk, set()).add(str(instance.pk))
+
+    def flush_executions(self):
+        """
+        Saves buffered executions of model specific conditions (but not the conditions)
+        """
+        with self.lock:
+            self._flush(conditions=False)
+
+    def flush(self):
+        """
+        Saves all buffered conditions and executions
+        """
+        with self.lock:
+            self._flush()
+
+    def _flush(self, conditions=True):
+        executions, self.executions = self.executions, dict()
+        if conditions:
+            conditions, self.conditions = self.conditions, dict()
+        else:
+            conditions = dict()
+
+        if not conditions and not executions:
+            return
+
+        using = router.db_for_write(BaseCronCondition)
+        with transaction.atomic(using=using) if self.atomic else _noop_context():
+            for condition_pk, object_pks in executions.items():
+                self._save_executions(using, condition_pk, object_pks)
+
+            if conditions:
+                BaseCronCondition.objects.using(using).filter(pk__in=list(conditions)).update(**{
+                    field_name: Case(
+                        *[When(pk=pk, then=Value(getattr(condition, field_name)))
+                          for pk, condition in conditions.items()],
+                        output_field=DateTimeField()
+                    ) for field_name in ('last_executed', 'next_run_at')
+                })
+
+    @staticmethod
+    def _save_executions(using, condition_pk, object_pks):
+        """
+        Updates execution date and time of target instances that were executed before and bulk creates the rest
+        """
+        executed = timezone.now()
+        queryset = CronConditionExecution.objects.using(using).filter(condition_id=condition_pk)
+
+        existing = set(queryset.filter(object_pk__in=object_pks).values_list('object_pk', flat=True))
+        if existing:
+            queryset.filter(object_pk__in=existing).update(executed=executed)
+
+        CronConditionExecution.objects.using(using).bulk_create([
+            CronConditionExecution(condition_id=condition_pk, object_pk=object_pk, executed=executed)
+            for object_pk in object_pks - existing
+        ])
+
+
+class InstanceEmailBatch(EmailBatch):
+    """
+    Email batch that keeps track of target instances which emails were added for (while they were set as the current
+    `instance`), so only executions of instances which emails were sent are recorded
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.instance = None
+        # message ID -> (message, instance)
+        self.instances = dict()
+        self.reported = 0
+
+    def add(self, message):
+        self.instances[id(message)] = (message, self.instance)
+        super().add(message)
+
+    def flush_instances(self):
+        """
+        Sends collected messages and returns primary keys (as strings) of target instances which messages failed since
+        the previous call, forgetting instances of the others
+        """
+        self.flush()
+
+        failed = {
+            str(self.instances[id(message)][1].pk) for message, _ in self.failed[self.reported:]
+            if self.instances.get(id(message), (None, None))[1] is not None
+        }
+        self.reported = len(self.failed)
+        self.instances = dict()
+        return failed
+
+
+class CronSchedule(object):
+    """
+    Min-heap of cron conditions next run dates and times, used in daemon mode to sleep until the earliest one
+
+    Outdated heap entries (i.e. of conditions that were rescheduled) aren't removed from the heap, but are skipped when
+    they are popped.
+    """
+    def __init__(self):
+        self.heap = list()
+        self.next_runs = dict()
+
+    def __len__(self):
+        return len(self.next_runs)
+
+    def schedule(self, pk, next_run_at):
+        """
+        Schedules (or reschedules) condition with passed primary key
+        """
+        if self.next_runs.get(pk) != next_run_at:
+            self.next_runs[pk] = next_run_at
+            heapq.heappush(self.heap, (next_run_at, pk))
+
+    def pop_due(self, now):
+        """
+        Removes conditions that are due from the schedule and returns their primary keys
+        """
+        due = set()
+        while self.heap and self.heap[0][0] <= now:
+            next_run_at, pk = heapq.heappop(self.heap)
+            if self.next_runs.get(pk) == next_run_at:
+                del self.next_runs[pk]
+                due.add(pk)
+        return due
+
+    def next_run_at(self):
+        """
+        Returns the earliest scheduled date and time or `None` if there's nothing scheduled
+        """
+        while self.heap and self.next_runs.get(self.heap[0][1]) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+        return self.heap[0][0] if self.heap else None
 
 
 class Command(BaseCommand):
     help = "Check cron related conditions and run their actions if the condition is met"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help="Number of threads used to run actions concurrently (by default actions are run one after another).",
+        )
+        parser.add_argument(
+            '--claim', action='store_true', default=False,
+            help="Claim each condition before running it, so the command can be safely run on multiple nodes.",
+        )
+        parser.add_argument(
+            '--shard', type=str, default=None,
+            help="Run only 'i' out of 'n' parts of the cron tick, in 'i/n' format (i.e. '0/4').",
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help="Number of target instances of model specific conditions loaded at once (default: 1000).",
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help="Number of executed conditions saved at once (default: 100).",
+        )
+        parser.add_argument(
+            '--atomic-batches', action='store_true', default=False,
+            help="Save each batch of executed conditions in a transaction.",
+        )
+        parser.add_argument(
+            '--daemon', action='store_true', default=False,
+            help="Keep running and check conditions as soon as they are due, until stopped with SIGTERM or SIGINT.",
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=30,
+            help="How often (in seconds) the daemon picks up rule changes and checks conditions without next run "
+                 "date and time (default: 30).",
+        )
+
     def handle(self, *args, **options):
-        conditions = BaseCronCondition.objects.exclude(rule__isnull=True)
+        self.output_lock = threading.Lock()
+        self.claim = options['claim']
+        self.shard = parse_shard(options['shard']) if options['shard'] else None
+        self.chunk_size = options['chunk_size']
+        self.workers = options['workers']
+        self.execution_buffer = ExecutionBuffer(options['batch_size'], atomic=options['atomic_batches'])
+
+        if options['daemon']:
+            self.run_daemon(options['poll_interval'])
+        else:
+            self.run_tick()
+
+    def run_tick(self, pks=None):
+        """
+        Checks conditions that are due (optionally only those with passed primary keys) and writes the summary
+        """
+        self.started = time.monotonic()
+        conditions = [condition for condition in self.get_conditions(pks) if self.is_in_shard(condition)]
+
+        if self.workers > 1:
+            results = self.run_in_workers(conditions)
+        else:
+            results = [self.run_condition(condition) for condition in conditions]
+
+        self.execution_buffer.flush()
+        self.write_summary(results)
+
+    def run_daemon(self, poll_interval):
+        """
+        Keeps conditions that are due within the next poll interval in a min-heap and sleeps until the earliest of
+        them (or the next poll) instead of checking all of them periodically
+
+        Conditions are (re)loaded from the database every poll interval, so rule changes (and conditions executed by
+        other nodes) are picked up incrementally. Conditions without next run date and time are checked on every poll.
+        """
+        self.stop_event = threading.Event()
+        previous_handlers = {
+            signum: signal.signal(signum, self.stop) for signum in (signal.SIGTERM, signal.SIGINT)
+        }
+
+        schedule = CronSchedule()
+        next_poll = time.monotonic()
+
+        try:
+            while not self.stop_event.is_set():
+                close_old_connections()
+
+                try:
+                    pks = set()
+                    if time.monotonic() >= next_poll:
+                        next_poll = time.monotonic() + poll_interval
+                        pks |= self.poll_schedule(schedule, timezone.now() + datetime.timedelta(seconds=poll_interval))
+                    pks |= schedule.pop_due(timezone.now())
+
+                    if pks:
+                        self.run_tick(pks)
+                except CommandError as e:
+                    self.stderr.write(str(e))
+                except Exception as e:
+                    # Transient errors (i.e. a lost database connection) shouldn't stop the daemon, conditions that
+                    # weren't run are picked up by the next poll
+                    self.stderr.write("Tick failed ({}: {})".format(e.__class__.__name__, e))
+                    close_old_connections()
+
+                timeout = next_poll - time.monotonic()
+                next_run_at = schedule.next_run_at()
+                if next_run_at is not None:
+                    timeout = min(timeout, (next_run_at - timezone.now()).total_seconds())
+
+                self.sleep(max(timeout, 0))
+        finally:
+            for signum, handler in previous_handlers.items():
+                signal.signal(signum, handler)
+
+        self.stdout.write(self.style.SUCCESS("Daemon stopped."))
+
+    @staticmethod
+    def poll_schedule(schedule, until):
+        """
+        Schedules conditions that are due before passed date and time, using 'next_run_at' index, and returns primary
+        keys of conditions that don't have next run date and time (and need to be checked now)
+        """
+        unscheduled = set()
+        rows = BaseCronCondition.objects.non_polymorphic().exclude(rule__isnull=True).filter(
+            Q(next_run_at__isnull=True) | Q(next_run_at__lte=until)
+        ).values_list('pk', 'next_run_at')
+
+        for pk, next_run_at in rows:
+            if next_run_at is None:
+                unscheduled.add(pk)
+            else:
+                schedule.schedule(pk, next_run_at)
+
+        return unscheduled
+
+    def sleep(self, seconds):
+        """
+        Sleeps for passed number of seconds or until the daemon is stopped
+        """
+        self.stop_event.wait(seconds)
+
+    def stop(self, signum, frame):
+        """
+        Signal handler that gracefully stops the daemon (after the current tick is finished)
+        """
+        self.stop_event.set()
+
+    def get_conditions(self, pks=None):
+        """
+        Returns conditions that need to be checked (optionally only those with passed primary keys), together with
+        their rules and actions
+        """
+        # Only conditions that are due (or which can't tell when they will be) need to be checked
+        conditions = BaseCronCondition.objects.exclude(rule__isnull=True).filter(
+            Q(next_run_at__isnull=True) | Q(next_run_at__lte=timezone.now())
+        )
+        if pks is not None:
+            conditions = conditions.filter(pk__in=pks)
+        return conditions.with_actions()
 
-        for condition in conditions:
-            # Make sure that there is an action to be run
-            if not hasattr(condition.rule, 'action'):
-                self.stdout.write(self.style.WARNING(
-                    "Condition was met but rule {} doesn't have linked action.".format(condition.rule.pk))
+    def is_in_shard(self, condition):
+        """
+        Returns whether the condition should be checked by the current shard
+
+        Generic conditions are partitioned by rule primary key, while model specific conditions are checked by all the
+        shards, as their target instances are partitioned instead (see `get_instances()`).
+        """
+        if self.shard is None or condition.model_specific() is not False:
+            return True
+
+        index, count = self.shard
+        return condition.rule_id % count == index
+
+    def get_instances(self, condition):
+        """
+        Returns target model instances that should be checked against model specific condition
+
+        When running a shard, instances are partitioned into contiguous primary key ranges. That requires an integer
+        primary key, so instances of other models are all checked by the first shard.
+        """
+        queryset = condition.rule.target_model.objects.all()
+        if self.shard is None:
+            return queryset
+
+        index, count = self.shard
+        bounds = queryset.aggregate(lowest=Min('pk'), highest=Max('pk'))
+        if bounds['lowest'] is None:
+            return queryset.none()
+        if not isinstance(bounds['lowest'], int):
+            return queryset if index == 0 else queryset.none()
+
+        size = -(-(bounds['highest'] - bounds['lowest'] + 1) // count)  # Ceiling division
+        lowest = bounds['lowest'] + index * size
+        return queryset.filter(pk__gte=lowest, pk__lt=lowest + size)
+
+    def iterate_chunks(self, condition, target_filter=None):
+        """
+        Iterates over target model instances of model specific condition (optionally narrowed down with passed
+        filter) in primary key ordered chunks (using keyset pagination), so that memory usage doesn't depend on the
+        size of the target model table
+        """
+        queryset = self.get_instances(condition).order_by('pk')
+        if target_filter is not None:
+            queryset = queryset.filter(target_filter)
+
+        fields = condition.target_fields()
+        if fields:
+            # Fields the action needs (i.e. foreign keys of related objects it loads) are loaded as well, otherwise
+            # they would be loaded with a query per instance
+            action = getattr(condition.rule, 'action', None)
+            if action is not None:
+                concrete_fields = {field.name for field in queryset.model._meta.concrete_fields}
+                fields = list(fields) + [name for name in action.target_fields() if name in concrete_fields]
+            queryset = queryset.only(*fields)
+
+        last_pk = None
+        while True:
+            chunk = list((queryset if last_pk is None else queryset.filter(pk__gt=last_pk))[:self.chunk_size])
+            if chunk:
+                yield chunk
+
+            if len(chunk) < self.chunk_size:
+                return
+            last_pk = chunk[-1].pk
+
+    @staticmethod
+    def get_executed_today(condition, instances):
+        """
+        Returns primary keys (as strings) of passed target instances that model specific condition was already
+        executed for today
+        """
+        today = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        return set(CronConditionExecution.objects.filter(
+            condition_id=condition.pk,
+            object_pk__in=[str(instance.pk) for instance in instances],
+            executed__gte=today,
+        ).values_list('object_pk', flat=True))
+
+    def run_in_workers(self, conditions):
+        """
+        Runs conditions in a pool of worker threads and returns their results in the same order
+
+        :rtype: list
+        """
+        pending = queue.Queue()
+        for index, condition in enumerate(conditions):
+            pending.put((index, condition))
+
+        results = [None] * len(conditions)
+        threads = [
+            threading.Thread(target=self.run_worker, args=(pending, results), name='conditioner-worker-{}'.format(i))
+            for i in range(min(self.workers, len(conditions)))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return results
+
+    def run_worker(self, pending, results):
+        """
+        Runs pending conditions in a worker thread until there are none left
+
+        Worker threads have their own database connections, which are reused by all conditions the thread runs and
+        closed once, when it's done.
+        """
+        try:
+            while True:
+                try:
+                    index, condition = pending.get_nowait()
+                except queue.Empty:
+                    return
+                results[index] = self.run_condition(condition)
+        finally:
+            connections.close_all()
+
+    def run_condition(self, condition):
+        """
+        Checks the condition and runs its action if it's met
+
+        :rtype: ConditionResult
+        """
+        started = time.monotonic()
+
+        # Target instances of model specific conditions are partitioned between shards, so the whole condition can't
+        # be claimed by any of them
+        claim = self.claim and not (self.shard and condition.model_specific() is not False)
+
+        try:
+            if not claim:
+                executed = self.process_condition(condition)
+            else:
+                with self.claim_condition(condition) as claimed:
+                    if claimed:
+                        executed = self.process_condition(condition)
+                        # Make sure that 'last_executed' is saved before the claim is released
+                        self.execution_buffer.flush()
+                    else:
+                        executed = 0
+                        self.write("Condition for rule {} was claimed by another node.".format(condition.rule_id))
+        except Exception as e:
+            return ConditionResult(condition, 0, e, time.monotonic() - started)
+
+        return ConditionResult(condition, executed, None, time.monotonic() - started)
+
+    @contextmanager
+    def claim_condition(self, condition):
+        """
+        Claims the condition, so that other nodes running the command at the same time skip it, and yields whether it
+        was successfully claimed
+
+        On databases that support it the condition row is locked with `SELECT ... FOR UPDATE SKIP LOCKED` until the
+        condition is processed. Other databases (i.e. SQLite) fall back to claiming the condition by conditionally
+        updating its 'last_executed', which is restored if the action wasn't executed.
+        """
+        using = router.db_for_write(BaseCronCondition)
+        queryset = BaseCronCondition.objects.using(using).non_polymorphic().filter(pk=condition.pk)
+
+        if getattr(connections[using].features, 'has_select_for_update_skip_locked', False):
+            with transaction.atomic(using=using):
+                # Another node could have executed the condition since it was loaded
+                row = queryset.select_for_update(skip_locked=True).values_list('last_executed', 'next_run_at').first()
+                if row is not None:
+                    condition.last_executed, condition.next_run_at = row
+                yield row is not None
+            return
+
+        last_executed = condition.last_executed
+        claimed_at = timezone.now()
+        claimed = queryset.filter(
+            **({'last_executed': last_executed} if last_executed else {'last_executed__isnull': True})
+        ).update(last_executed=claimed_at)
+
+        executed = False
+        try:
+            yield bool(claimed)
+            executed = condition.last_executed != last_executed
+        finally:
+            if claimed and not executed:
+                queryset.filter(last_executed=claimed_at).update(last_executed=last_executed)
+
+    def process_condition(self, condition):
+        """
+        Checks the condition and runs its action if it's met
+
+        :return: number of times the action was executed
+        :rtype: int
+        """
+        # Make sure that there is an action to be run
+        if not hasattr(condition.rule, 'action'):
+            self.write(self.style.WARNING(
+                "Condition was met but rule {} doesn't have linked action.".format(condition.rule.pk))
+            )
+            return 0
+
+        executed = 0
+
+        # Generic conditions
+        if condition.model_specific() is False:
+            if condition.is_met() and self.run_action(condition):
+                self.mark_executed(condition)
+                executed += 1
+
+                self.write(self.style.SUCCESS(
+                    "Condition for rule {} was met and the action "
+                    "was successfully executed".format(condition.rule.pk))
                 )
-                continue
-
-            # Generic conditions
-            if condition.model_specific() is False:
-                if condition.is_met():
-                    condition.rule.action.run_action()
-                    condition.last_executed = timezone.now()
-                    condition.save()
-
-                    self.stdout.write(self.style.SUCCESS(
-                        "Condition for rule {} was met and the action "
-                        "was successfully executed".format(condition.rule.pk))
-                    )
-            # Model specific conditions
+        # Model specific conditions
+        else:
+            # Conditions that can be compiled to a filter are checked by the database, once they are due
+            target_filter = condition.get_target_filter()
+            if target_filter is None or condition.is_due():
+                chunks = self.iterate_chunks(condition, target_filter)
             else:
-                for instance in condition.rule.target_model.objects.all():
-                    if condition.is_met(instance):
-                        condition.rule.action.run_action(instance)
-                        condition.last_executed = timezone.now()
-                        condition.save()
-
-                        self.stdout.write(self.style.SUCCESS(
-                            "Model specific condition for rule {} was met and the action "
-                            "was successfully executed".format(condition.rule.pk))
-                        )
+                chunks = ()
+
+            # Emails of templated email actions are sent with a single connection
+            with InstanceEmailBatch() as emails:
+                for chunk in chunks:
+                    # Skip instances that the action was already executed for today, i.e. before the previous run
+                    # crashed
+                    executed_today = self.get_executed_today(condition, chunk)
+                    met = [
+                        instance for instance in chunk
+                        if str(instance.pk) not in executed_today
+                        and (target_filter is not None or condition.is_met(instance))
+                    ]
+                    # Related objects are only loaded for instances the action is run for
+                    condition.rule.action.prepare_instances(met)
+
+                    run = list()
+                    try:
+                        for instance in met:
+                            emails.instance = instance
+                            if self.run_action(condition, instance):
+                                run.append(instance)
+                    finally:
+                        # Instances the action was already run for are recorded even if it fails for one of the
+                        # next ones, otherwise they would be run again on every run
+                        emails.instance = None
+
+                        # Emails are sent before executions are recorded, so the ones that couldn't be sent (i.e.
+                        # the email backend is down) are retried on the next run
+                        failed = emails.flush_instances()
+
+                        for instance in run:
+                            if str(instance.pk) in failed:
+                                continue
+
+                            self.execution_buffer.add_execution(condition, instance)
+                            executed += 1
+
+                            self.write(self.style.SUCCESS(
+                                "Model specific condition for rule {} was met and the action "
+                                "was successfully executed".format(condition.rule.pk))
+                            )
+
+                        # Executions are saved after every chunk, so a crash doesn't run the action for them again
+                        self.execution_buffer.flush_executions()
+
+            for message, exception in emails.failed:
+                self.write(self.style.WARNING(
+                    "Email to {} of rule {} couldn't be sent: {}".format(
+                        ', '.join(message.to), condition.rule.pk, exception,
+                    )
+                ))
+
+            # Condition 'last_executed' is set once all target instances are checked, so it doesn't affect the rest.
+            # Shards check only a part of them and the condition is shared with other shards (which could be yet to
+            # run), so it's left due and its target instances aren't executed twice thanks to the executions ledger.
+            if executed and self.shard is None:
+                self.mark_executed(condition)
+
+        # Conditions that weren't met (i.e. the command didn't run on the due day or the value was never computed)
+        # need their next run refreshed, otherwise they would be loaded on every run
+        if not executed:
+            self.refresh_next_run_at(condition)
+
+        return executed
+
+    def run_action(self, condition, *args):
+        """
+        Helper method for running condition action (with passed arguments and condition class name as
+        'condition_type' keyword argument) subject to action rate limits (runs over limits with queue policy are
+        delayed, as the command needs to know whether they were run)
+
+        :return: whether the action was run (and not dropped)
+        :rtype: bool
+        """
+        kwargs = {'condition_type': condition.__class__.__name__}
+        if limiter.throttle(condition.rule.action.run_action, args, kwargs, queue=False) == RUN:
+            return True
+
+        self.write(self.style.WARNING(
+            "Action of rule {} was dropped, its rate limit was reached".format(condition.rule_id)
+        ))
+        return False
+
+    def mark_executed(self, condition):
+        """
+        Helper method for setting condition 'last_executed' and 'next_run_at' and adding it to the buffer of
+        conditions to be saved
+        """
+        condition.last_executed = timezone.now()
+        condition.next_run_at = condition.get_next_run_at()
+        self.execution_buffer.add(condition)
+
+    @staticmethod
+    def refresh_next_run_at(condition):
+        """
+        Helper method for updating condition 'next_run_at' (and only that) if it's outdated
+        """
+        next_run_at = condition.get_next_run_at()
+        if next_run_at != condition.next_run_at:
+            BaseCronCondition.objects.filter(pk=condition.pk).update(next_run_at=next_run_at)
+            condition.next_run_at = next_run_at
+
+    def write(self, message):
+        """
+        Helper method for writing to stdout from multiple threads
+        """
+        with self.output_lock:
+            self.stdout.write(message)
+
+    def write_summary(self, results):
+        """
+        Writes per rule summary and fails the command if any of the rules failed
+        """
+        failed = 0
+
+        self.stdout.write("\nSummary:")
+        for result in results:
+            if result.error is not None:
+                failed += 1
+                self.stdout.write(self.style.ERROR("Rule {}: failed ({}: {}) in {:.3f}s".format(
+                    result.condition.rule_id, result.error.__class__.__name__, result.error, result.duration,
+                )))
+            elif result.executed:
+                self.stdout.write(self.style.SUCCESS("Rule {}: action executed {} time(s) in {:.3f}s".format(
+                    result.condition.rule_id, result.executed, result.duration,
+                )))
+
+        duration = time.monotonic() - self.started
+        if self.shard:
+            self.stdout.write("Shard {}/{} checked {} rule(s) in {:.3f}s".format(
+                self.shard[0], self.shard[1], len(results), duration,
+            ))
+        else:
+            self.stdout.write("Checked {} rule(s) in {:.3f}s".format(len(results), duration))
+
+        if failed:
+            raise CommandError("{} of {} checked rule(s) failed".format(failed, len(results)))
 
         self.stdout.write(self.style.SUCCESS("\nAll done!"))
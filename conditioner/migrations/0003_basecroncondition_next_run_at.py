@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 15:59
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conditioner', '0002_condition_managers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='basecroncondition',
+            name='next_run_at',
+            field=models.DateTimeField(db_index=True, editable=False, null=True, verbose_name='next run at'),
+        ),
+    ]
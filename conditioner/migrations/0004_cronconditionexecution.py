@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 16:05
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conditioner', '0003_basecroncondition_next_run_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CronConditionExecution',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_pk', models.CharField(max_length=64, verbose_name='object primary key')),
+                ('executed', models.DateTimeField(verbose_name='executed')),
+                ('condition', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='executions', to='conditioner.BaseCronCondition', verbose_name='condition')),
+            ],
+            options={
+                'verbose_name': 'cron condition execution',
+                'verbose_name_plural': 'cron condition executions',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='cronconditionexecution',
+            unique_together=set([('condition', 'object_pk')]),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 16:12
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conditioner', '0004_cronconditionexecution'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='modelsignalcondition',
+            name='execution_mode',
+            field=models.CharField(choices=[('immediate', 'Immediately, when the signal is sent'), ('on_commit', 'After the transaction is committed')], default='immediate', max_length=64, verbose_name='execution mode'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 16:14
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conditioner', '0005_modelsignalcondition_execution_mode'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='modelsignalcondition',
+            name='signal',
+            field=models.CharField(choices=[('Save', (('pre_save', 'Before creation'), ('post_save', 'After creation'))), ('Delete', (('pre_delete', 'Before deletion'), ('post_delete', 'After deletion'))), ('Init', (('pre_init', 'Before initialization'), ('post_init', 'After initialization'))), ('Bulk', (('post_bulk_create', 'After bulk creation'), ('post_bulk_update', 'After bulk update'), ('post_bulk_delete', 'After bulk deletion')))], max_length=64, verbose_name='signal'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 16:16
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.manager
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conditioner', '0006_modelsignalcondition_bulk_signals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FieldChangeCondition',
+            fields=[
+                ('modelsignalcondition_ptr', models.OneToOneField(auto_created=True, on_delete=django.db.models.deletion.CASCADE, parent_link=True, primary_key=True, serialize=False, to='conditioner.ModelSignalCondition')),
+                ('field_name', models.CharField(max_length=255, verbose_name='field name')),
+                ('value', models.CharField(blank=True, help_text='Leave empty to run the action on any change.', max_length=255, verbose_name='value')),
+            ],
+            options={
+                'verbose_name': 'field change condition',
+                'verbose_name_plural': 'field change conditions',
+                'abstract': False,
+            },
+            bases=('conditioner.modelsignalcondition',),
+            managers=[
+                ('objects', django.db.models.manager.Manager()),
+                ('base_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+    ]
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 16:18
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conditioner', '0007_fieldchangecondition'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='modelsignalcondition',
+            name='coalesce',
+            field=models.BooleanField(default=False, help_text='Run the action once per queryset evaluation (with all loaded instances) instead of once per instance. Only for "After initialization" signal of target models that use bulk signals queryset.', verbose_name='coalesce'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 16:19
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conditioner', '0008_modelsignalcondition_coalesce'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='modelsignalcondition',
+            name='debounce',
+            field=models.PositiveIntegerField(default=0, help_text='Number of seconds during which repeated signals for the same instance are collapsed into a single action run (0 to run the action for every signal).', verbose_name='debounce window'),
+        ),
+    ]
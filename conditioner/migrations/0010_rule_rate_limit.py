@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 16:22
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conditioner', '0009_modelsignalcondition_debounce'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rule',
+            name='rate_limit',
+            field=models.PositiveIntegerField(blank=True, help_text='Maximum number of action runs per rate limit period, leave empty for no limit.', null=True, verbose_name='rate limit'),
+        ),
+        migrations.AddField(
+            model_name='rule',
+            name='rate_limit_period',
+            field=models.PositiveIntegerField(default=60, help_text='In seconds.', verbose_name='rate limit period'),
+        ),
+        migrations.AddField(
+            model_name='rule',
+            name='rate_limit_policy',
+            field=models.CharField(choices=[('drop', 'Drop excess runs'), ('delay', 'Delay excess runs (blocking the caller)'), ('queue', 'Queue excess runs (run in the background)')], default='drop', max_length=64, verbose_name='rate limit policy'),
+        ),
+    ]
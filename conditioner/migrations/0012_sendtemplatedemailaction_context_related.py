@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 16:28
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conditioner', '0011_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sendtemplatedemailaction',
+            name='context_related',
+            field=models.CharField(blank=True, help_text='Comma separated related objects lookups of the target instance used by the template (i.e. "user, user__groups"), loaded for all instances at once when emails are sent in a batch.', max_length=256, verbose_name='context related objects'),
+        ),
+    ]
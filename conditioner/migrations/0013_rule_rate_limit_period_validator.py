@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 16:43
+from __future__ import unicode_literals
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conditioner', '0012_sendtemplatedemailaction_context_related'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='rule',
+            name='rate_limit_period',
+            field=models.PositiveIntegerField(default=60, help_text='In seconds.', validators=[django.core.validators.MinValueValidator(1)], verbose_name='rate limit period'),
+        ),
+    ]
@@ -1,9 +1,13 @@
 """
 Conditioner module models
 """
+from django.core.mail import EmailMultiAlternatives
+from django.core.validators import MinValueValidator
 from django.db import models
 from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
 
+from conditioner import ratelimit
 from conditioner.utils import TimeStampedModelMixin
 
 
@@ -18,6 +22,32 @@ class Rule(TimeStampedModelMixin, models.Model):
         blank=True,
     )
 
+    rate_limit = models.PositiveIntegerField(
+        verbose_name='rate limit',
+        null=True,
+        blank=True,
+        help_text='Maximum number of action runs per rate limit period, leave empty for no limit.',
+    )
+
+    rate_limit_period = models.PositiveIntegerField(
+        verbose_name='rate limit period',
+        default=60,
+        validators=[MinValueValidator(1)],
+        help_text='In seconds.',
+    )
+
+    RATE_LIMIT_POLICY_CHOICES = (
+        (ratelimit.DROP, 'Drop excess runs'),
+        (ratelimit.DELAY, 'Delay excess runs (blocking the caller)'),
+        (ratelimit.QUEUE, 'Queue excess runs (run in the background)'),
+    )
+    rate_limit_policy = models.CharField(
+        verbose_name='rate limit policy',
+        choices=RATE_LIMIT_POLICY_CHOICES,
+        default=ratelimit.DROP,
+        max_length=64,
+    )
+
     # There are reverse 'BaseAction' and 'BaseCondition' foreign keys to allow Django Admin inline form
     # handling (with polymorphism), and thus aren't enforced but *should* be considered required
 
@@ -35,3 +65,168 @@ class Rule(TimeStampedModelMixin, models.Model):
             return "Do '{0.action}' to '{0.target_model}' when '{0.condition}'".format(self)
 
         return 'Rule for {0.target_content_type}'.format(self)
+
+
+class CronConditionExecution(models.Model):
+    """
+    Class representation of model specific cron condition execution for a single target instance
+
+    There's at most one row for every condition and target instance pair, holding the date and time of the latest
+    execution, so it can be cheaply checked if the action was already executed for a given instance today.
+    """
+    condition = models.ForeignKey(
+        'conditioner.BaseCronCondition', related_name='executions',
+        verbose_name='condition',
+    )
+
+    object_pk = models.CharField(
+        verbose_name='object primary key',
+        max_length=64,
+    )
+
+    executed = models.DateTimeField(
+        verbose_name='executed',
+    )
+
+    class Meta:
+        verbose_name = 'cron condition execution'
+        verbose_name_plural = 'cron condition executions'
+        unique_together = ('condition', 'object_pk')
+
+    def __str__(self):
+        return 'Cron condition {0.condition_id} execution for {0.object_pk}'.format(self)
+
+
+class OutboxEmail(models.Model):
+    """
+    Class representation of a rendered email waiting in the outbox to be delivered by the `deliver_outbox` management
+    command
+
+    Emails that couldn't be delivered are retried with exponential backoff ('next_attempt_at') and moved to the failed
+    (dead letter) state after the maximum number of attempts. Workers claim emails by setting their 'claim' token (and
+    postponing 'next_attempt_at' by the claim lease, so emails of a crashed worker are delivered later by another one).
+    """
+    rule = models.ForeignKey(
+        'conditioner.Rule', related_name='outbox_emails',
+        verbose_name='rule',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+    )
+
+    subject = models.CharField(
+        verbose_name='subject',
+        max_length=256,
+    )
+
+    body = models.TextField(
+        verbose_name='body',
+    )
+
+    html_body = models.TextField(
+        verbose_name='HTML body',
+        blank=True,
+    )
+
+    from_email = models.CharField(
+        verbose_name='from email address',
+        max_length=256,
+    )
+
+    to = models.TextField(
+        verbose_name='to',
+        help_text='Comma separated email addresses.',
+    )
+
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    )
+    status = models.CharField(
+        verbose_name='status',
+        choices=STATUS_CHOICES,
+        default=PENDING,
+        max_length=64,
+    )
+
+    attempts = models.PositiveIntegerField(
+        verbose_name='attempts',
+        default=0,
+    )
+
+    next_attempt_at = models.DateTimeField(
+        verbose_name='next attempt at',
+        default=timezone.now,
+    )
+
+    claim = models.CharField(
+        verbose_name='claim',
+        max_length=32,
+        null=True,
+        blank=True,
+        editable=False,
+    )
+
+    last_error = models.TextField(
+        verbose_name='last error',
+        blank=True,
+    )
+
+    created = models.DateTimeField(
+        verbose_name='created',
+        editable=False,
+        auto_now_add=True,
+    )
+
+    sent = models.DateTimeField(
+        verbose_name='sent',
+        null=True,
+        blank=True,
+    )
+
+    class Meta:
+        verbose_name = 'outbox email'
+        verbose_name_plural = 'outbox emails'
+        index_together = ('status', 'next_attempt_at')
+
+    @classmethod
+    def from_message(cls, message, **kwargs):
+        """
+        Returns (unsaved) outbox email of passed email message, with its HTML alternative (if there's one) and other
+        fields set to passed keyword arguments
+        """
+        html_body = ''
+        for content, mimetype in getattr(message, 'alternatives', ()):
+            if mimetype == 'text/html':
+                html_body = content
+
+        return cls(
+            subject=message.subject,
+            body=message.body,
+            html_body=html_body,
+            from_email=message.from_email,
+            to=','.join(message.to),
+            **kwargs
+        )
+
+    def get_message(self, connection=None):
+        """
+        Returns email message of the outbox email
+        """
+        message = EmailMultiAlternatives(
+            subject=self.subject,
+            body=self.body,
+            from_email=self.from_email,
+            to=self.to.split(','),
+            connection=connection,
+        )
+        if self.html_body:
+            message.attach_alternative(content=self.html_body, mimetype='text/html')
+        return message
+
+    def __str__(self):
+        return "Email '{0.subject}' to {0.to} ({0.status})".format(self)
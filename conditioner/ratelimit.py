@@ -0,0 +1,286 @@
+"""
+Conditioner module actions rate limiting
+"""
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import models
+
+
+logger = logging.getLogger(__name__)
+
+
+DROP = 'drop'
+DELAY = 'delay'
+QUEUE = 'queue'
+
+# `RateLimiter.call()` results
+RUN = 'run'
+DROPPED = 'dropped'
+QUEUED = 'queued'
+
+
+class TokenBucket(object):
+    """
+    In process token bucket that allows `limit` action runs per `period` seconds, refilled continuously
+    """
+    def __init__(self, limit, period):
+        self.capacity = limit
+        self.rate = limit / period
+        self.tokens = float(limit)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, reserve=False):
+        """
+        Takes a token and returns number of seconds the caller needs to wait before running the action (`0` if
+        there was a token available). If there wasn't one and `reserve` isn't set, no token is taken and `None` is
+        returned.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            if not reserve:
+                return None
+
+            # Tokens can go below zero, so reservations are served in order
+            self.tokens -= 1
+            return -self.tokens / self.rate
+
+    def release(self):
+        """
+        Gives back a token taken by `acquire()`, i.e. when the run was dropped by another limit
+        """
+        with self.lock:
+            self.tokens = min(self.capacity, self.tokens + 1)
+
+
+class CacheTokenBucket(object):
+    """
+    Token bucket shared between processes, stored in Django cache
+
+    It's approximated with fixed windows (of `period` seconds) counters, incremented atomically with `cache.incr()`.
+    Reservations take the first window with free tokens.
+    """
+    # Maximum number of windows a reservation can be made ahead
+    max_windows = 100
+
+    def __init__(self, limit, period, key, cache):
+        self.limit = limit
+        self.period = period
+        self.key = key
+        self.cache = cache
+        # Window counter keys of the last tokens taken by each thread, so they can be given back
+        self.taken = threading.local()
+
+    def acquire(self, reserve=False):
+        """
+        Takes a token and returns number of seconds the caller needs to wait before running the action (see
+        `TokenBucket.acquire()`)
+        """
+        now = time.time()
+        window = int(now // self.period)
+
+        for offset in range(self.max_windows if reserve else 1):
+            key = '{}:{}'.format(self.key, window + offset)
+            self.cache.add(key, 0, self.period * (offset + 2))
+            if self.cache.incr(key) <= self.limit:
+                self.taken.key = key
+                return max((window + offset) * self.period - now, 0)
+
+        return None
+
+    def release(self):
+        """
+        Gives back the last token taken by `acquire()` in the current thread (see `TokenBucket.release()`)
+        """
+        key = getattr(self.taken, 'key', None)
+        self.taken.key = None
+        if key is None:
+            return
+
+        try:
+            self.cache.decr(key)
+        except ValueError:  # The window is over and its counter expired
+            pass
+
+
+class RateLimiter(object):
+    """
+    Limits how often actions are run, per rule (see `Rule.rate_limit`) and globally per action class (see
+    `CONDITIONER_RATE_LIMITS` setting), i.e.:
+
+        CONDITIONER_RATE_LIMITS = {
+            'conditioner.SendTemplatedEmailAction': {'limit': 100, 'period': 60, 'policy': 'delay'},
+        }
+
+    Excess runs are dropped, delayed (the caller is blocked until the action can run) or queued (the action is run by
+    a background thread), depending on the limit policy. Buckets live in process memory, unless
+    `CONDITIONER_RATE_LIMIT_CACHE` setting selects a (shared) Django cache. Throttled runs are counted per limit.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = dict()
+        self.counters = defaultdict(Counter)
+        self.queue = None
+
+    @staticmethod
+    def get_limits(action):
+        """
+        Returns `(scope, limit, period, policy)` tuples of limits that apply to passed action
+        """
+        limits = list()
+        if not isinstance(action, models.Model):
+            return limits
+
+        rule = getattr(action, 'rule', None)
+        if rule is not None and rule.rate_limit:
+            limits.append(
+                ('rule:{}'.format(rule.pk), rule.rate_limit, rule.rate_limit_period, rule.rate_limit_policy)
+            )
+
+        label = '{0.app_label}.{0.object_name}'.format(action._meta)
+        action_limit = getattr(settings, 'CONDITIONER_RATE_LIMITS', {}).get(label)
+        if action_limit:
+            limits.append((
+                'action:{}'.format(label), action_limit['limit'], action_limit.get('period', 60),
+                action_limit.get('policy', DROP),
+            ))
+
+        return limits
+
+    def get_bucket(self, scope, limit, period):
+        """
+        Returns token bucket of passed scope, a new one if the limit was changed
+        """
+        # Periods shorter than a second (i.e. saved before they were validated) would divide by zero
+        period = max(period, 1)
+        key = (scope, limit, period)
+
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                cache_alias = getattr(settings, 'CONDITIONER_RATE_LIMIT_CACHE', None)
+                if cache_alias:
+                    bucket = CacheTokenBucket(
+                        limit, period, 'conditioner:ratelimit:{}:{}:{}'.format(*key), caches[cache_alias],
+                    )
+                else:
+                    bucket = TokenBucket(limit, period)
+                self.buckets[key] = bucket
+
+        return bucket
+
+    def call(self, run, *args, **kwargs):
+        """
+        Calls action method (`run_action()` or `run_batch_action()`) with passed arguments, unless it's throttled
+
+        :return: `RUN` if the action was run (maybe after a delay), `DROPPED` if it was dropped or `QUEUED` if it will
+            be run by a background thread
+        :rtype: str
+        """
+        return self.throttle(run, args, kwargs)
+
+    def throttle(self, run, args, kwargs, queue=True):
+        """
+        Calls action method with passed positional and keyword arguments, unless it's throttled (see `call()`)
+
+        When `queue` isn't set, excess runs of limits with queue policy are delayed instead, i.e. in management commands
+        that need to know whether the action was run.
+        """
+        limits = self.get_limits(getattr(run, '__self__', None))
+        if not limits:
+            run(*args, **kwargs)
+            return RUN
+
+        # Limits that drop excess runs are checked first, so tokens aren't reserved for runs that will be dropped
+        limits.sort(key=lambda limit: limit[3] != DROP)
+
+        wait = 0
+        policy = DELAY
+        acquired = list()
+        for scope, limit, period, limit_policy in limits:
+            bucket = self.get_bucket(scope, limit, period)
+            limit_wait = bucket.acquire(reserve=limit_policy != DROP)
+
+            if limit_wait is None:
+                # Dropped runs don't use up tokens of the other limits
+                for acquired_bucket in acquired:
+                    acquired_bucket.release()
+
+                self.count(scope, 'dropped')
+                logger.info("Action '{}' run dropped, '{}' rate limit was reached".format(
+                    getattr(run, '__self__', run), scope,
+                ))
+                return DROPPED
+
+            if limit_wait > 0:
+                queued = limit_policy == QUEUE and queue
+                self.count(scope, 'queued' if queued else 'delayed')
+                if queued:
+                    policy = QUEUE
+            wait = max(wait, limit_wait)
+            acquired.append(bucket)
+
+        if wait <= 0:
+            run(*args, **kwargs)
+            return RUN
+
+        if policy == QUEUE:
+            # Every queued run has its own key, so they aren't collapsed
+            self.get_queue().add(object(), partial(run, *args), kwargs, wait)
+            return QUEUED
+
+        time.sleep(wait)
+        run(*args, **kwargs)
+        return RUN
+
+    def get_queue(self):
+        """
+        Returns scheduler that runs queued actions in a background thread
+
+        Runs still queued when the process exits are discarded (and their number is logged), as running them all at
+        once would exceed the limits they were queued for.
+        """
+        from conditioner.dispatch import Debouncer
+
+        with self.lock:
+            if self.queue is None:
+                self.queue = Debouncer(run_on_exit=False)
+        return self.queue
+
+    def count(self, scope, name):
+        """
+        Increments passed throttled runs counter of passed limit scope
+        """
+        with self.lock:
+            self.counters[scope][name] += 1
+
+    def get_counters(self):
+        """
+        Returns throttled runs counters (`dropped`, `delayed` and `queued`) per limit scope (i.e. 'rule:1' or
+        'action:conditioner.SendTemplatedEmailAction')
+        """
+        with self.lock:
+            return {scope: dict(counter) for scope, counter in self.counters.items()}
+
+    def reset(self):
+        """
+        Removes all buckets and counters
+        """
+        with self.lock:
+            self.buckets.clear()
+            self.counters.clear()
+
+
+limiter = RateLimiter()
@@ -0,0 +1,184 @@
+"""
+Conditioner module bulk operations signals
+
+Django doesn't send model signals for `QuerySet.bulk_create()`, `QuerySet.update()` and (per object signals aside)
+`QuerySet.delete()`, so target models that should trigger rules when changed in bulk need to use
+`BulkSignalsQuerySetMixin` (or `BulkSignalsManager`), which sends a single signal per operation with all affected
+instances and their primary keys. It also allows coalescing initialization signals rules, so they run once per
+queryset evaluation instead of once per loaded instance.
+"""
+import threading
+from collections import OrderedDict
+
+from django.db import connections, models, transaction
+from django.dispatch import Signal
+
+
+post_bulk_create = Signal(providing_args=['instances', 'pks', 'using'])
+post_bulk_update = Signal(providing_args=['instances', 'pks', 'using'])
+post_bulk_delete = Signal(providing_args=['instances', 'pks', 'using'])
+
+BULK_SIGNALS = ('post_bulk_create', 'post_bulk_update', 'post_bulk_delete')
+
+
+class FetchBatch(object):
+    """
+    Collects instances initialized while a queryset is evaluated, so coalesced actions can be run once with all of
+    them when the evaluation is finished
+
+    Batches are thread local and can be nested (i.e. querysets of other models evaluated by `prefetch_related()`).
+    """
+    local = threading.local()
+
+    def __init__(self, model):
+        self.model = model
+        # key -> (callback, instances)
+        self.entries = OrderedDict()
+
+    @classmethod
+    def get_current(cls, model):
+        """
+        Returns the innermost batch of passed model in the current thread or `None` if there's none
+        """
+        for batch in reversed(getattr(cls.local, 'stack', ())):
+            if batch.model is model:
+                return batch
+        return None
+
+    def get(self, key):
+        """
+        Returns list of instances collected with passed key or `None` if there are none
+        """
+        entry = self.entries.get(key)
+        return entry[1] if entry is not None else None
+
+    def add(self, key, callback):
+        """
+        Adds a new entry, which `callback` is called with collected instances when the batch is finished, and returns
+        its (empty) list of instances
+        """
+        instances = list()
+        self.entries[key] = (callback, instances)
+        return instances
+
+    def __enter__(self):
+        if not hasattr(self.local, 'stack'):
+            self.local.stack = list()
+        self.local.stack.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.local.stack.pop()
+
+        if exc_type is None:
+            for callback, instances in self.entries.values():
+                callback(instances)
+
+
+class BulkSignalsQuerySetMixin(object):
+    """
+    Queryset mixin that sends a bulk signal after `bulk_create()`, `update()` and `delete()`
+
+    Affected instances are only loaded if there are receivers connected for the model (i.e. it's a target of bulk
+    signal rules), so bulk operations of other models don't run any additional queries. Evaluated querysets also
+    collect instances for coalesced initialization signals rules.
+    """
+    # Number of primary keys used in a single query when instances are loaded after update
+    bulk_signals_chunk_size = 500
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """
+        Extends default `bulk_create()` behaviour and sends `post_bulk_create` signal
+        """
+        if not post_bulk_create.has_listeners(self.model):
+            return super().bulk_create(objs, *args, **kwargs)
+
+        with transaction.atomic(using=self.db, savepoint=False):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            self._set_bulk_created_pks(objs)
+
+        post_bulk_create.send(
+            sender=self.model, instances=objs, pks=[obj.pk for obj in objs], using=self.db,
+        )
+
+        return objs
+
+    def update(self, **kwargs):
+        """
+        Extends default `update()` behaviour and sends `post_bulk_update` signal with updated instances
+        """
+        if not post_bulk_update.has_listeners(self.model):
+            return super().update(**kwargs)
+
+        # Updated fields can be used in the queryset filter, so primary keys need to be selected beforehand
+        with transaction.atomic(using=self.db, savepoint=False):
+            pks = list(self.values_list('pk', flat=True))
+            rows = super().update(**kwargs)
+
+        post_bulk_update.send(
+            sender=self.model, instances=self._get_bulk_signal_instances(pks), pks=pks, using=self.db,
+        )
+
+        return rows
+
+    def delete(self):
+        """
+        Extends default `delete()` behaviour and sends `post_bulk_delete` signal with deleted instances
+        """
+        if not post_bulk_delete.has_listeners(self.model):
+            return super().delete()
+
+        with transaction.atomic(using=self.db, savepoint=False):
+            instances = list(self._clone())
+            deleted = super().delete()
+
+        post_bulk_delete.send(
+            sender=self.model, instances=instances, pks=[instance.pk for instance in instances], using=self.db,
+        )
+
+        return deleted
+
+    def _fetch_all(self):
+        """
+        Extends default `_fetch_all()` behaviour and collects coalesced initialization signals of loaded instances
+        """
+        if self._result_cache is None and models.signals.post_init.has_listeners(self.model):
+            with FetchBatch(self.model):
+                return super()._fetch_all()
+        return super()._fetch_all()
+
+    def _set_bulk_created_pks(self, objs):
+        """
+        Sets auto generated primary keys of bulk created instances on databases that can't return them from a bulk
+        insert (Django sets them on PostgreSQL, with Django 1.10+), but where they can be selected afterwards
+
+        On SQLite the transaction holds the database write lock, so the rows inserted last are the bulk created ones.
+        Other databases (i.e. MySQL) don't guarantee that, so their instances (and `pks` of the signal) are left
+        without primary keys.
+        """
+        # Instances created with explicit primary keys could be among the rows inserted last
+        if not objs or any(obj.pk is not None for obj in objs):
+            return
+        if connections[self.db].vendor != 'sqlite' or not isinstance(self.model._meta.pk, models.AutoField):
+            return
+
+        pks = self.model._base_manager.using(self.db).order_by('-pk').values_list('pk', flat=True)[:len(objs)]
+        for obj, pk in zip(objs, reversed(list(pks))):
+            obj.pk = pk
+
+    def _get_bulk_signal_instances(self, pks):
+        manager = self.model._base_manager.using(self.db)
+
+        instances = list()
+        for i in range(0, len(pks), self.bulk_signals_chunk_size):
+            instances += manager.filter(pk__in=pks[i:i + self.bulk_signals_chunk_size])
+        return instances
+
+
+class BulkSignalsQuerySet(BulkSignalsQuerySetMixin, models.QuerySet):
+    """
+    Queryset that sends bulk signals, for models that don't use a custom queryset
+    """
+
+
+BulkSignalsManager = models.Manager.from_queryset(BulkSignalsQuerySet)
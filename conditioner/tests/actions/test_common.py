@@ -1,15 +1,23 @@
 """
 Test 'conditioner.actions.common' file
 """
+import os
+import shutil
+import tempfile
 from unittest import mock
 
 from django.conf import settings
+from django.contrib.auth.models import Group, Permission
+from django.core import mail
 from django.db import models
-from django.test import TestCase
+from django.template import TemplateDoesNotExist, engines
+from django.template.loader import get_template
+from django.test import TestCase, override_settings
 from django.utils.crypto import get_random_string
 
-from conditioner.actions.common import SendTemplatedEmailAction
+from conditioner.actions.common import EmailBatch, SendTemplatedEmailAction, TemplateCache, template_cache
 from conditioner.base import BaseAction
+from conditioner.models import OutboxEmail
 from conditioner.tests.actions.factories import SendTemplatedEmailActionFactory
 
 
@@ -21,6 +29,7 @@ class LoggerActionTestCase(TestCase):
         super().setUp()
         self.model = SendTemplatedEmailAction
         self.instance = SendTemplatedEmailActionFactory()
+        template_cache.clear()
 
     def test_model_inheritance(self):
         """Test model inheritance"""
@@ -49,6 +58,25 @@ class LoggerActionTestCase(TestCase):
         self.assertEqual(field.verbose_name, 'template')
         self.assertEqual(field.max_length, 256)
 
+    def test_model_delivery_mode_field(self):
+        """Test model 'delivery_mode' field"""
+        field = self.model._meta.get_field('delivery_mode')
+
+        self.assertIsInstance(field, models.CharField)
+        self.assertEqual(field.verbose_name, 'delivery mode')
+        self.assertEqual(field.choices, self.model.DELIVERY_MODE_CHOICES)
+        self.assertEqual(field.default, self.model.SEND)
+        self.assertEqual(field.max_length, 64)
+
+    def test_model_context_related_field(self):
+        """Test model 'context_related' field"""
+        field = self.model._meta.get_field('context_related')
+
+        self.assertIsInstance(field, models.CharField)
+        self.assertEqual(field.verbose_name, 'context related objects')
+        self.assertEqual(field.max_length, 256)
+        self.assertTrue(field.blank)
+
     def test_model_meta_attributes(self):
         """Test model meta attributes"""
         meta = self.model._meta
@@ -66,11 +94,11 @@ class LoggerActionTestCase(TestCase):
         )
 
     @mock.patch('conditioner.actions.common.EmailMultiAlternatives')
-    @mock.patch('conditioner.actions.common.render_to_string')
-    def test_model_run_action_method(self, mocked_render_to_string, mocked_email):
+    @mock.patch('conditioner.actions.common.get_template')
+    def test_model_run_action_method(self, mocked_get_template, mocked_email):
         """Test model `run_action()` method"""
         rendered_template = get_random_string()
-        mocked_render_to_string.return_value = rendered_template
+        mocked_get_template.return_value.render.return_value = rendered_template
 
         self.instance.run_action()
 
@@ -80,12 +108,263 @@ class LoggerActionTestCase(TestCase):
             from_email=settings.DEFAULT_FROM_EMAIL,
             to=[self.instance.email],
         )
+        mocked_email.return_value.attach_alternative.assert_called_once_with(
+            content=rendered_template, mimetype='text/html',
+        )
+
+        self.assertEqual(mocked_get_template.call_count, 2)
+        mocked_get_template.assert_any_call(self.instance.template)
+        mocked_get_template.assert_any_call(self.instance.template.replace('.txt', '.html'))
+
+        # Compiled templates are cached
+        self.instance.run_action()
+        self.assertEqual(mocked_get_template.call_count, 2)
+        self.assertEqual(mocked_get_template.return_value.render.call_count, 4)
+
+    @mock.patch('conditioner.actions.common.get_template', return_value=engines['django'].from_string('Body'))
+    def test_model_run_action_method_with_batch(self, mocked_get_template):
+        """Test model `run_action()` method adds the email to the current batch"""
+        with EmailBatch() as batch:
+            self.instance.run_action()
+            self.assertEqual(len(mail.outbox), 0)
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [self.instance.email])
+        self.assertEqual(batch.sent, 1)
+
+    @mock.patch('conditioner.actions.common.get_template', return_value=engines['django'].from_string('Body'))
+    @mock.patch('conditioner.actions.common.get_connection', wraps=mail.get_connection)
+    def test_model_run_batch_action_method(self, mocked_get_connection, mocked_get_template):
+        """Test model `run_batch_action()` method sends all emails with a single connection"""
+        self.instance.run_batch_action(instances=[object(), object(), object()])
+
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mocked_get_connection.call_count, 1)
+
+    @mock.patch('conditioner.actions.common.get_template', return_value=engines['django'].from_string('Body'))
+    def test_model_run_action_method_with_outbox(self, mocked_get_template):
+        """Test model `run_action()` method adds the email to the outbox in outbox delivery mode"""
+        self.instance.delivery_mode = self.model.OUTBOX
+
+        self.instance.run_action()
 
-        self.assertEqual(mocked_render_to_string.call_count, 2)
-        mocked_render_to_string.assert_any_call(self.instance.template)
-        mocked_render_to_string.assert_any_call(self.instance.template.replace('.txt', '.html'))
+        self.assertEqual(len(mail.outbox), 0)
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.rule_id, self.instance.rule_id)
+        self.assertEqual(email.subject, self.instance.subject)
+        self.assertEqual(email.body, 'Body')
+        self.assertEqual(email.to, self.instance.email)
+        self.assertEqual(email.status, OutboxEmail.PENDING)
+
+    @mock.patch('conditioner.actions.common.get_template', return_value=engines['django'].from_string('Body'))
+    def test_model_run_batch_action_method_with_outbox(self, mocked_get_template):
+        """Test model `run_batch_action()` method adds all emails to the outbox with a single query"""
+        self.instance.delivery_mode = self.model.OUTBOX
+
+        with self.assertNumQueries(1):
+            self.instance.run_batch_action(instances=[object(), object(), object()])
+
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboxEmail.objects.filter(rule=self.instance.rule).count(), 3)
+
+    @mock.patch('conditioner.actions.common.get_template',
+                return_value=engines['django'].from_string('{{ action.subject }}: {{ instance.name }}'))
+    def test_model_run_action_method_with_instance(self, mocked_get_template):
+        """Test model `run_action()` method renders the template with passed instance"""
+        self.instance.run_action(Group(name='Positional'))
+        self.instance.run_action(instance=Group(name='Keyword'), sender=Group)
+
+        self.assertEqual([message.body for message in mail.outbox], [
+            '{}: Positional'.format(self.instance.subject), '{}: Keyword'.format(self.instance.subject),
+        ])
+
+    def test_model_get_context_related_method(self):
+        """Test model `get_context_related()` method"""
+        self.instance.context_related = 'user, user__groups,'
+
+        self.assertEqual(self.instance.get_context_related(), ['user', 'user__groups'])
+
+    def test_model_target_fields_method(self):
+        """Test model `target_fields()` method"""
+        self.instance.context_related = 'user, user__groups, permissions'
+
+        self.assertEqual(self.instance.target_fields(), ['user', 'user', 'permissions'])
+
+    @mock.patch('conditioner.actions.common.get_template', return_value=engines['django'].from_string(
+        '{{ instance.name }}:{% for permission in instance.permissions.all %} {{ permission.codename }}{% endfor %}'
+    ))
+    def test_model_run_batch_action_method_renders_instances(self, mocked_get_template):
+        """Test model `run_batch_action()` method loads related objects of all instances at once"""
+        permissions = list(Permission.objects.order_by('pk')[:2])
+        groups = [Group.objects.create(name='Group {}'.format(i)) for i in range(3)]
+        for group in groups:
+            group.permissions.add(*permissions)
+        groups = list(Group.objects.filter(pk__in=[group.pk for group in groups]).order_by('pk'))
+        self.instance.context_related = 'permissions'
+
+        with self.assertNumQueries(1):
+            self.instance.run_batch_action(groups)
+
+        self.assertEqual(mocked_get_template.call_count, 2)
+        self.assertEqual([message.body for message in mail.outbox], [
+            '{}: {} {}'.format(group.name, permissions[0].codename, permissions[1].codename) for group in groups
+        ])
 
     def test_model_str_method(self):
         """Test model `__str__` method"""
         self.assertIn(self.instance.email, str(self.instance))
         self.assertIn(self.instance.template, str(self.instance))
+
+
+class EmailBatchTestCase(TestCase):
+    """
+    Test `conditioner.actions.common.EmailBatch` class
+    """
+    def get_message(self, to='user@example.com'):
+        return mail.EmailMessage(subject='Subject', body='Body', to=[to])
+
+    def test_batch_sends_messages_in_chunks(self):
+        """Test that messages are sent when the chunk is full and when the batch is finished"""
+        with EmailBatch(chunk_size=2) as batch:
+            for _ in range(3):
+                batch.add(self.get_message())
+            self.assertEqual(len(mail.outbox), 2)
+
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(batch.sent, 3)
+        self.assertEqual(batch.failed, [])
+
+    def test_batch_reuses_connection(self):
+        """Test that all chunks are sent with the same connection"""
+        connection = mail.get_connection()
+
+        with mock.patch.object(connection, 'open') as mocked_open:
+            with EmailBatch(chunk_size=1, connection=connection) as batch:
+                batch.add(self.get_message())
+                batch.add(self.get_message())
+
+        self.assertEqual(mocked_open.call_count, 2)
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_batch_reports_failed_messages(self):
+        """Test that a failed message is reported and doesn't prevent others from being sent"""
+        connection = mail.get_connection()
+        send_messages = connection.send_messages
+        error = ValueError('Oops')
+
+        def mocked_send_messages(messages):
+            if messages[0].to == ['failed@example.com']:
+                raise error
+            return send_messages(messages)
+
+        with mock.patch.object(connection, 'send_messages', side_effect=mocked_send_messages), \
+                self.assertLogs('conditioner.actions.common', 'ERROR'):
+            with EmailBatch(connection=connection) as batch:
+                batch.add(self.get_message())
+                failed_message = self.get_message('failed@example.com')
+                batch.add(failed_message)
+                batch.add(self.get_message())
+
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(batch.sent, 2)
+        self.assertEqual(batch.failed, [(failed_message, error)])
+
+    def test_batch_reports_messages_of_failed_connections(self):
+        """Test that all messages of a chunk are reported when the connection can't be opened"""
+        connection = mail.get_connection()
+        error = ConnectionRefusedError('Oops')
+
+        with mock.patch.object(connection, 'open', side_effect=error), \
+                self.assertLogs('conditioner.actions.common', 'ERROR'):
+            with EmailBatch(chunk_size=2, connection=connection) as batch:
+                messages = [self.get_message() for _ in range(3)]
+                for message in messages:
+                    batch.add(message)
+
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(batch.sent, 0)
+        self.assertEqual(batch.failed, [(message, error) for message in messages])
+
+    def test_batches_can_be_nested(self):
+        """Test that the innermost batch is the current one"""
+        self.assertIsNone(EmailBatch.get_current())
+
+        with EmailBatch() as batch:
+            with EmailBatch() as inner_batch:
+                self.assertIs(EmailBatch.get_current(), inner_batch)
+            self.assertIs(EmailBatch.get_current(), batch)
+
+        self.assertIsNone(EmailBatch.get_current())
+
+
+class TemplateCacheTestCase(TestCase):
+    """
+    Test `conditioner.actions.common.TemplateCache` class
+    """
+    def setUp(self):
+        super().setUp()
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+        override = override_settings(TEMPLATES=[{
+            'BACKEND': 'django.template.backends.django.DjangoTemplates',
+            'DIRS': [self.dir],
+        }])
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.cache = TemplateCache()
+
+    def write_template(self, name, content, mtime=None):
+        path = os.path.join(self.dir, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+
+    def render(self, name):
+        return tuple(template.render() if template else None for template in self.cache.get(name))
+
+    def test_cache_returns_templates_pair(self):
+        """Test that `.txt` template is returned with its `.html` counterpart"""
+        self.write_template('email.txt', 'Text')
+        self.write_template('email.html', 'HTML')
+
+        self.assertEqual(self.render('email.txt'), ('Text', 'HTML'))
+
+    def test_cache_records_missing_html_template(self):
+        """Test that missing `.html` counterpart is looked up only once"""
+        self.write_template('email.txt', 'Text')
+
+        with mock.patch('conditioner.actions.common.get_template', wraps=get_template) as mocked_get_template:
+            self.assertEqual(self.render('email.txt'), ('Text', None))
+            self.assertEqual(self.render('email.txt'), ('Text', None))
+
+        self.assertEqual(mocked_get_template.call_count, 2)
+
+    def test_cache_reloads_changed_templates(self):
+        """Test that templates are reloaded when their modification time changes"""
+        self.write_template('email.txt', 'Text', mtime=1000)
+        self.assertEqual(self.render('email.txt'), ('Text', None))
+
+        self.write_template('email.txt', 'Changed text', mtime=2000)
+        self.write_template('email.html', 'HTML')
+        self.assertEqual(self.render('email.txt'), ('Changed text', 'HTML'))
+
+    def test_cache_clear(self):
+        """Test that `clear()` removes cached templates"""
+        self.write_template('email.txt', 'Text', mtime=1000)
+        self.render('email.txt')
+
+        self.write_template('email.txt', 'Changed text', mtime=1000)
+        self.assertEqual(self.render('email.txt'), ('Text', None))
+
+        self.cache.clear('email.txt')
+        self.assertEqual(self.render('email.txt'), ('Changed text', None))
+
+    def test_cache_raises_for_missing_template(self):
+        """Test that missing `.txt` template isn't cached"""
+        with self.assertRaises(TemplateDoesNotExist):
+            self.cache.get('email.txt')
+
+        self.assertEqual(self.cache.entries, {})
@@ -1,12 +1,14 @@
 """
 Test 'conditioner.actions.misc' file
 """
+from django.contrib.auth.models import Group
 from django.db import models
 from django.test import TestCase
 
 from conditioner.actions.misc import LoggerAction
 from conditioner.base import BaseAction
 from conditioner.tests.actions.factories import LoggerActionFactory
+from conditioner.tests.conditions.factories import DayOfMonthConditionFactory
 
 
 class LoggerActionTestCase(TestCase):
@@ -57,6 +59,32 @@ class LoggerActionTestCase(TestCase):
         self.assertEqual(self.instance.level, log_item.levelname)
         self.assertEqual(self.instance.message, log_item.message)
 
+    def test_model_run_action_method_structured_fields(self):
+        """Test model `run_action()` method logs structured fields of the rule and target instance"""
+        instance = Group.objects.create(name='Group')
+
+        with self.assertLogs('conditioner.actions.misc', level='DEBUG') as log:
+            self.instance.run_action(instance, condition_type='DayOfMonthCondition')
+            self.instance.run_action(instance=instance, sender=Group, condition_type='ModelSignalCondition')
+            self.instance.run_action()
+
+        for record in log.records:
+            self.assertEqual(record.rule_id, self.instance.rule_id)
+        self.assertEqual([record.instance_pk for record in log.records], [instance.pk, instance.pk, None])
+        self.assertEqual(
+            [record.condition_type for record in log.records], ['DayOfMonthCondition', 'ModelSignalCondition', None]
+        )
+
+    def test_model_get_log_extra_method_doesnt_query_database(self):
+        """Test model `get_log_extra()` method doesn't load the rule or its condition"""
+        DayOfMonthConditionFactory(rule=self.instance.rule)
+        action = LoggerAction.objects.get(pk=self.instance.pk)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(action.get_log_extra(condition_type='DayOfMonthCondition'), {
+                'rule_id': self.instance.rule_id, 'condition_type': 'DayOfMonthCondition', 'instance_pk': None,
+            })
+
     def test_model_str_method(self):
         """Test model `__str__` method"""
         self.assertIn(self.instance.level, str(self.instance))
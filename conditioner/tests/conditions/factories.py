@@ -3,7 +3,9 @@ Conditioner module conditions related factories
 """
 import random
 
-from conditioner.conditions import DayOfMonthCondition, DayOfWeekCondition, ModelSignalCondition
+from conditioner.conditions import (
+    DayOfMonthCondition, DayOfWeekCondition, FieldChangeCondition, ModelSignalCondition,
+)
 from conditioner.tests.factories import BaseConditionFactory, BaseCronConditionFactory
 
 
@@ -39,3 +41,13 @@ class ModelSignalConditionFactory(BaseConditionFactory):
 
     class Meta:
         model = ModelSignalCondition
+
+
+class FieldChangeConditionFactory(BaseConditionFactory):
+    """
+    Factory for `conditioner.conditions.signals.FieldChangeCondition` model
+    """
+    field_name = 'name'
+
+    class Meta:
+        model = FieldChangeCondition
@@ -2,6 +2,7 @@
 Test 'conditioner.conditions.dates' file
 """
 from datetime import datetime
+from unittest import mock
 
 from django.core.validators import MaxValueValidator
 from django.db import models
@@ -77,6 +78,43 @@ class DayOfMonthConditionTestCase(TestCase):
         with freeze_time('2016-02-02'):
             self.assertTrue(instance.is_met())
 
+    @mock.patch.object(DayOfMonthCondition, 'is_met')
+    def test_model_is_due_method(self, mocked_is_met):
+        """Test model `is_due()` method"""
+        self.assertEqual(self.instance.is_due(), mocked_is_met.return_value)
+        mocked_is_met.assert_called_once_with()
+
+    def test_model_get_next_run_at_method(self):
+        """Test model `get_next_run_at()` method"""
+        instance = DayOfMonthConditionFactory(day=2)
+
+        # Later this month
+        with freeze_time('2016-01-01'):
+            self.assertEqual(instance.get_next_run_at(), datetime(2016, 1, 2))
+
+        # Today
+        with freeze_time('2016-01-02'):
+            self.assertEqual(instance.get_next_run_at(), datetime(2016, 1, 2))
+
+        instance.last_executed = datetime(2016, 1, 2, 12)
+
+        # Today, but it was already executed
+        with freeze_time('2016-01-02'):
+            self.assertEqual(instance.get_next_run_at(), datetime(2016, 2, 2))
+
+        # Next year
+        with freeze_time('2016-12-03'):
+            self.assertEqual(instance.get_next_run_at(), datetime(2017, 1, 2))
+
+        # Months without that day are skipped
+        instance.day = 31
+        with freeze_time('2016-04-01'):
+            self.assertEqual(instance.get_next_run_at(), datetime(2016, 5, 31))
+
+        # Day that never occurs
+        instance.day = 0
+        self.assertIsNone(instance.get_next_run_at())
+
     def test_model_str_method(self):
         """Test model `__str__` method"""
         self.assertIn(str(self.instance.day), str(self.instance))
@@ -138,6 +176,30 @@ class DayOfWeekConditionTestCase(TestCase):
         with freeze_time('2007-01-14'):
             self.assertTrue(instance.is_met())
 
+    @mock.patch.object(DayOfWeekCondition, 'is_met')
+    def test_model_is_due_method(self, mocked_is_met):
+        """Test model `is_due()` method"""
+        self.assertEqual(self.instance.is_due(), mocked_is_met.return_value)
+        mocked_is_met.assert_called_once_with()
+
+    def test_model_get_next_run_at_method(self):
+        """Test model `get_next_run_at()` method"""
+        instance = DayOfWeekConditionFactory(weekday=7)
+
+        # Later this week (January 1 2007 is Monday)
+        with freeze_time('2007-01-01'):
+            self.assertEqual(instance.get_next_run_at(), datetime(2007, 1, 7))
+
+        # Today
+        with freeze_time('2007-01-07'):
+            self.assertEqual(instance.get_next_run_at(), datetime(2007, 1, 7))
+
+        instance.last_executed = datetime(2007, 1, 7, 12)
+
+        # Today, but it was already executed
+        with freeze_time('2007-01-07'):
+            self.assertEqual(instance.get_next_run_at(), datetime(2007, 1, 14))
+
     def test_model_str_method(self):
         """Test model `__str__` method"""
         self.assertIn(self.instance.get_weekday_display(), str(self.instance))
@@ -4,12 +4,16 @@ Test 'conditioner.conditions.signals' file
 import uuid
 from unittest import mock
 
+from django.contrib.auth.models import Group
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.test import TestCase
 
-from conditioner.conditions.signals import ModelSignalCondition
+from conditioner.conditions.signals import FieldChangeCondition, ModelSignalCondition
 from conditioner.base import BaseCondition
-from conditioner.tests.conditions.factories import ModelSignalConditionFactory
+from conditioner.tests.actions.factories import LoggerActionFactory
+from conditioner.tests.conditions.factories import FieldChangeConditionFactory, ModelSignalConditionFactory
 from conditioner.tests.factories import RuleFactory, BaseActionFactory
 
 
@@ -35,6 +39,32 @@ class ModelSignalConditionTestCase(TestCase):
         self.assertEqual(field.choices, self.model.SIGNAL_CHOICES)
         self.assertEqual(field.max_length, 64)
 
+    def test_model_execution_mode_field(self):
+        """Test model 'execution_mode' field"""
+        field = self.model._meta.get_field('execution_mode')
+
+        self.assertIsInstance(field, models.CharField)
+        self.assertEqual(field.verbose_name, 'execution mode')
+        self.assertEqual(field.choices, self.model.EXECUTION_MODE_CHOICES)
+        self.assertEqual(field.default, self.model.IMMEDIATE)
+        self.assertEqual(field.max_length, 64)
+
+    def test_model_coalesce_field(self):
+        """Test model 'coalesce' field"""
+        field = self.model._meta.get_field('coalesce')
+
+        self.assertIsInstance(field, models.BooleanField)
+        self.assertEqual(field.verbose_name, 'coalesce')
+        self.assertFalse(field.default)
+
+    def test_model_debounce_field(self):
+        """Test model 'debounce' field"""
+        field = self.model._meta.get_field('debounce')
+
+        self.assertIsInstance(field, models.PositiveIntegerField)
+        self.assertEqual(field.verbose_name, 'debounce window')
+        self.assertEqual(field.default, 0)
+
     def test_model_dispatch_uid_field(self):
         """Test model 'dispatch_uid' field"""
         field = self.model._meta.get_field('dispatch_uid')
@@ -51,40 +81,53 @@ class ModelSignalConditionTestCase(TestCase):
         self.assertEqual(meta.verbose_name, 'model signal condition')
         self.assertEqual(meta.verbose_name_plural, 'model signal conditions')
 
-    @mock.patch('django.db.models.signals')
-    def test_model_connect_signal_method(self, patched_signals):
+    @mock.patch('conditioner.conditions.signals.dispatcher')
+    def test_model_connect_signal_method(self, mocked_dispatcher):
         """Test model `connect_signal()` method"""
-        mocked_signal = getattr(patched_signals, self.instance.signal)
-        mocked_signal_connect = mock.Mock()
-        mocked_signal.connect = mocked_signal_connect
-
         self.instance.rule = RuleFactory()
         self.instance.rule.action = BaseActionFactory()
         self.instance.connect_signal()
 
-        mocked_signal_connect.assert_called_once_with(
-            receiver=self.instance.rule.action.run_action,
+        mocked_dispatcher.register.assert_called_once_with(
+            signal_name=self.instance.signal,
             sender=self.instance.rule.target_model,
             dispatch_uid=self.instance.dispatch_uid,
-            weak=False,
+            action=self.instance.rule.action,
+            on_commit=False,
+            check=None,
+            coalesce=False,
+            debounce=0,
+            condition_type='ModelSignalCondition',
         )
 
-    @mock.patch('django.db.models.signals')
-    def test_model_disconnects_signal_method(self, patched_signals):
+    @mock.patch('conditioner.conditions.signals.dispatcher')
+    def test_model_disconnects_signal_method(self, mocked_dispatcher):
         """Test model `disconnects_signal()` method"""
-        mocked_signal = getattr(patched_signals, self.instance.signal)
-        mocked_signal_disconnect = mock.Mock()
-        mocked_signal.disconnect = mocked_signal_disconnect
-
-        self.instance.rule = RuleFactory()
-        self.instance.rule.action = BaseActionFactory()
         self.instance.disconnects_signal()
 
-        mocked_signal_disconnect.assert_called_once_with(
-            receiver=self.instance.rule.action.run_action,
-            sender=self.instance.rule.target_model,
-            dispatch_uid=self.instance.dispatch_uid,
-        )
+        mocked_dispatcher.unregister.assert_called_once_with(self.instance.dispatch_uid)
+
+    def test_model_is_met_method(self):
+        """Test model `is_met()` method"""
+        self.assertTrue(self.instance.is_met(instance=mock.Mock()))
+
+    def test_model_get_check_method(self):
+        """Test model `get_check()` method"""
+        self.assertIsNone(self.instance.get_check())
+
+    def test_model_clean_method(self):
+        """Test model `clean()` method"""
+        self.instance.coalesce = True
+        self.instance.signal = self.model.POST_INIT
+        self.instance.clean()
+
+        self.instance.signal = self.model.POST_SAVE
+        self.assertRaises(ValidationError, self.instance.clean)
+
+        # Coalesced actions can't be debounced
+        self.instance.signal = self.model.POST_INIT
+        self.instance.debounce = 60
+        self.assertRaises(ValidationError, self.instance.clean)
 
     def test_model_str_method(self):
         """Test model `__str__` method"""
@@ -104,3 +147,111 @@ class ModelSignalConditionTestCase(TestCase):
         ModelSignalConditionFactory().delete()
 
         self.assertEqual(mocked_disconnects_signal.call_count, 1)
+
+
+class FieldChangeConditionTestCase(TestCase):
+    """
+    Test `conditioner.conditions.signals.FieldChangeCondition` model
+    """
+    def setUp(self):
+        super().setUp()
+        self.model = FieldChangeCondition
+        self.instance = FieldChangeConditionFactory(
+            rule__target_content_type=ContentType.objects.get_for_model(Group),
+        )
+
+    def connect(self):
+        """Helper method for connecting tested condition with an action"""
+        action = LoggerActionFactory(rule=self.instance.rule)
+        self.instance.connect_signal()
+        self.addCleanup(self.instance.disconnects_signal)
+        return action
+
+    def test_model_inheritance(self):
+        """Test model inheritance"""
+        self.assertIsInstance(self.instance, ModelSignalCondition)
+
+    def test_model_field_name_field(self):
+        """Test model 'field_name' field"""
+        field = self.model._meta.get_field('field_name')
+
+        self.assertIsInstance(field, models.CharField)
+        self.assertEqual(field.verbose_name, 'field name')
+        self.assertEqual(field.max_length, 255)
+
+    def test_model_value_field(self):
+        """Test model 'value' field"""
+        field = self.model._meta.get_field('value')
+
+        self.assertIsInstance(field, models.CharField)
+        self.assertEqual(field.verbose_name, 'value')
+        self.assertEqual(field.max_length, 255)
+        self.assertTrue(field.blank)
+
+    def test_model_meta_attributes(self):
+        """Test model meta attributes"""
+        meta = self.model._meta
+
+        self.assertEqual(meta.verbose_name, 'field change condition')
+        self.assertEqual(meta.verbose_name_plural, 'field change conditions')
+
+    def test_model_clean_method(self):
+        """Test model `clean()` method"""
+        self.instance.clean()
+
+        self.instance.field_name = 'missing'
+        self.assertRaises(ValidationError, self.instance.clean)
+
+    def test_model_get_check_method(self):
+        """Test model `get_check()` method"""
+        self.assertEqual(self.instance.get_check(), self.instance.is_met)
+
+    def test_model_save_method(self):
+        """Test model `save()` method"""
+        self.assertEqual(self.instance.signal, self.model.POST_SAVE)
+
+    def test_model_str_method(self):
+        """Test model `__str__` method"""
+        self.assertIn('name changed', str(self.instance))
+
+        self.instance.value = 'shipped'
+        self.assertIn('name changed to shipped', str(self.instance))
+
+    @mock.patch('conditioner.actions.misc.LoggerAction.run_action')
+    def test_action_is_run_when_field_changes(self, mocked_run_action):
+        """Test that action is only run when watched field changes"""
+        self.connect()
+
+        group = Group.objects.create(name='first')
+        self.assertFalse(mocked_run_action.called)
+
+        group.save()
+        self.assertFalse(mocked_run_action.called)
+
+        group.name = 'second'
+        group.save()
+        self.assertEqual(mocked_run_action.call_count, 1)
+
+        group = Group.objects.get(pk=group.pk)
+        group.save()
+        self.assertEqual(mocked_run_action.call_count, 1)
+
+        group.name = 'third'
+        group.save()
+        self.assertEqual(mocked_run_action.call_count, 2)
+
+    @mock.patch('conditioner.actions.misc.LoggerAction.run_action')
+    def test_action_is_run_when_field_changes_to_value(self, mocked_run_action):
+        """Test that action is only run when watched field changes to selected value"""
+        self.instance.value = 'shipped'
+        self.instance.save()
+        self.connect()
+
+        group = Group.objects.create(name='new')
+        group.name = 'packed'
+        group.save()
+        self.assertFalse(mocked_run_action.called)
+
+        group.name = 'shipped'
+        group.save()
+        self.assertEqual(mocked_run_action.call_count, 1)
@@ -49,3 +49,28 @@ class BaseCronConditionFactory(BaseConditionFactory):
 
     class Meta:
         model = BaseCronCondition
+
+
+class CronConditionExecutionFactory(factory.DjangoModelFactory):
+    """
+    Factory for `conditioner.CronConditionExecution` model
+    """
+    condition = factory.SubFactory(BaseCronConditionFactory)
+    object_pk = factory.Sequence(lambda n: str(n))
+    executed = factory.LazyAttribute(lambda n: faker.date_time())
+
+    class Meta:
+        model = 'conditioner.CronConditionExecution'
+
+
+class OutboxEmailFactory(factory.DjangoModelFactory):
+    """
+    Factory for `conditioner.OutboxEmail` model
+    """
+    subject = factory.LazyAttribute(lambda n: faker.sentence())
+    body = factory.LazyAttribute(lambda n: faker.text())
+    from_email = factory.LazyAttribute(lambda n: faker.email())
+    to = factory.LazyAttribute(lambda n: faker.email())
+
+    class Meta:
+        model = 'conditioner.OutboxEmail'
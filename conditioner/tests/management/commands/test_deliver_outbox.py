@@ -0,0 +1,196 @@
+"""
+Test 'conditioner.management.commands.deliver_outbox' file
+"""
+import datetime
+import signal
+import threading
+from io import StringIO
+from unittest import mock
+
+from django.core import mail
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import TestCase
+from django.utils import timezone
+
+from freezegun import freeze_time
+
+from conditioner.management.commands.deliver_outbox import Command
+from conditioner.models import OutboxEmail
+from conditioner.tests.factories import OutboxEmailFactory
+
+
+class DeliverOutboxCommandTestCase(TestCase):
+    """
+    Test `deliver_outbox` management command
+    """
+    def run_command(self, *args):
+        """Helper method for running the command and returning its output"""
+        out = StringIO()
+        call_command('deliver_outbox', *args, stdout=out)
+        return out.getvalue()
+
+    def mock_send_messages(self, failed_to):
+        """Helper method for mocking email backend that fails to send emails to passed address"""
+        send_messages = mail.get_connection().send_messages
+
+        def mocked_send_messages(messages):
+            if messages[0].to == [failed_to]:
+                raise ValueError('Oops')
+            return send_messages(messages)
+
+        return mock.patch(
+            'django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=mocked_send_messages,
+        )
+
+    def test_command_delivers_pending_emails(self):
+        """Test that pending emails are sent in batches and marked as sent"""
+        emails = OutboxEmailFactory.create_batch(5)
+
+        with mock.patch('conditioner.management.commands.deliver_outbox.get_connection',
+                        wraps=mail.get_connection) as mocked_get_connection:
+            output = self.run_command('--batch-size', '2')
+
+        self.assertEqual(mocked_get_connection.call_count, 1)
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), sorted(email.to for email in emails))
+        self.assertEqual(OutboxEmail.objects.filter(status=OutboxEmail.SENT, sent__isnull=False).count(), 5)
+        self.assertIn('Delivered 5 email(s) (0 failed)', output)
+
+    def test_command_skips_emails_that_are_not_due(self):
+        """Test that emails are delivered only when they are due and pending"""
+        OutboxEmailFactory(next_attempt_at=timezone.now() + datetime.timedelta(minutes=5))
+        OutboxEmailFactory(status=OutboxEmail.FAILED)
+        OutboxEmailFactory(status=OutboxEmail.SENT)
+
+        self.run_command()
+
+        self.assertEqual(len(mail.outbox), 0)
+
+    @freeze_time('2016-01-01')
+    def test_command_retries_failed_emails_with_backoff(self):
+        """Test that failed emails are retried with exponential backoff"""
+        email = OutboxEmailFactory(to='failed@example.com', attempts=2)
+        OutboxEmailFactory()
+
+        with self.mock_send_messages('failed@example.com'), self.assertLogs('conditioner.actions.common', 'ERROR'):
+            output = self.run_command('--backoff', '10')
+
+        email.refresh_from_db()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(email.status, OutboxEmail.PENDING)
+        self.assertEqual(email.attempts, 3)
+        self.assertEqual(email.next_attempt_at, datetime.datetime(2016, 1, 1, 0, 0, 40))
+        self.assertEqual(email.last_error, 'ValueError: Oops')
+        self.assertIsNone(email.claim)
+        self.assertIn('Delivered 1 email(s) (1 failed)', output)
+
+    def test_command_marks_emails_failed_after_max_attempts(self):
+        """Test that emails are dead-lettered after the maximum number of attempts"""
+        email = OutboxEmailFactory(to='failed@example.com', attempts=2)
+
+        with self.mock_send_messages('failed@example.com'), self.assertLogs('conditioner.actions.common', 'ERROR'):
+            output = self.run_command('--max-attempts', '3')
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboxEmail.FAILED)
+        self.assertEqual(email.attempts, 3)
+        self.assertIn('failed after 3 attempt(s)', output)
+
+    @freeze_time('2016-01-01')
+    def test_command_retries_emails_when_connection_fails(self):
+        """Test that all claimed emails are retried with backoff when the connection can't be opened"""
+        OutboxEmailFactory.create_batch(2)
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.open', side_effect=ConnectionRefusedError), \
+                self.assertLogs('conditioner.actions.common', 'ERROR'):
+            output = self.run_command('--backoff', '10')
+
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboxEmail.objects.filter(
+            status=OutboxEmail.PENDING, attempts=1, claim=None, next_attempt_at=datetime.datetime(2016, 1, 1, 0, 0, 10),
+        ).count(), 2)
+        self.assertIn('Delivered 0 email(s) (2 failed)', output)
+
+    def test_command_doesnt_update_emails_claimed_by_other_workers(self):
+        """Test that emails claimed by another worker after the lease expired aren't updated"""
+        email = OutboxEmailFactory()
+        command = Command()
+        command.batch_size, command.lease, command.max_attempts, command.backoff = 10, 60, 5, 60
+        command.connection = mail.get_connection()
+        emails = command.claim()
+
+        # Lease expired and another worker claimed the email
+        OutboxEmail.objects.filter(pk=email.pk).update(claim='other')
+        command.deliver(emails)
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboxEmail.PENDING)
+        self.assertEqual(email.claim, 'other')
+
+    def test_command_updates_emails_in_write_database(self):
+        """Test that delivered emails are updated in the database they were claimed in"""
+        OutboxEmailFactory.create_batch(2)
+        command = Command()
+        command.batch_size, command.lease, command.max_attempts, command.backoff = 10, 60, 5, 60
+        command.connection = mail.get_connection()
+
+        with mock.patch('conditioner.management.commands.deliver_outbox.router.db_for_write',
+                        return_value='default') as mocked_db_for_write, \
+                mock.patch.object(OutboxEmail.objects, 'using', wraps=OutboxEmail.objects.using) as mocked_using:
+            command.deliver(command.claim())
+
+        self.assertEqual(mocked_db_for_write.call_count, 2)
+        self.assertEqual(mocked_using.call_args_list, [mock.call('default')] * 3)
+        self.assertEqual(OutboxEmail.objects.filter(status=OutboxEmail.SENT).count(), 2)
+
+    def test_command_retries_with_doubled_backoff(self):
+        """Test that the retry delay is doubled with every attempt"""
+        command = Command()
+        command.backoff = 60
+
+        self.assertEqual([command.get_backoff(attempts) for attempts in range(1, 5)], [60, 120, 240, 480])
+
+    def test_command_skips_emails_claimed_by_other_workers(self):
+        """Test that emails claimed by another worker aren't claimed until the lease expires"""
+        email = OutboxEmailFactory()
+        command = Command()
+        command.batch_size, command.lease = 10, 60
+
+        self.assertEqual(command.claim(), [email])
+        self.assertEqual(command.claim(), [])
+
+        with freeze_time(timezone.now() + datetime.timedelta(seconds=61)):
+            self.assertEqual(command.claim(), [email])
+
+    def test_command_runs_until_stopped(self):
+        """Test that the daemon delivers emails until it's stopped with SIGTERM"""
+        OutboxEmailFactory()
+        sleeps = list()
+
+        def mocked_wait(stop_event, timeout):
+            sleeps.append(timeout)
+            if len(sleeps) == 2:
+                OutboxEmailFactory()
+            if len(sleeps) == 3:
+                signal.getsignal(signal.SIGTERM)(signal.SIGTERM, None)
+            return False
+
+        with mock.patch.object(threading.Event, 'wait', autospec=True, side_effect=mocked_wait):
+            output = self.run_command('--daemon', '--poll-interval', '7')
+
+        self.assertEqual(sleeps, [7, 7, 7])
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertIn('Daemon stopped.', output)
+
+    def test_command_survives_failed_deliveries(self):
+        """Test that the daemon keeps running when a delivery fails with an unexpected error"""
+        def mocked_wait(stop_event, timeout):
+            signal.getsignal(signal.SIGTERM)(signal.SIGTERM, None)
+            return False
+
+        err = StringIO()
+        with mock.patch.object(threading.Event, 'wait', autospec=True, side_effect=mocked_wait), \
+                mock.patch.object(Command, 'claim', side_effect=DatabaseError('Gone away')):
+            call_command('deliver_outbox', '--daemon', stdout=StringIO(), stderr=err)
+
+        self.assertIn('Delivery failed (DatabaseError: Gone away)', err.getvalue())
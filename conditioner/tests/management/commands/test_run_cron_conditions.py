@@ -0,0 +1,724 @@
+"""
+Test 'conditioner.management.commands.run_cron_conditions' file
+"""
+import signal
+import threading
+from datetime import datetime
+from io import StringIO
+from unittest import mock
+
+from django.contrib.contenttypes.models import ContentType
+from django.core import mail
+from django.core.management import call_command, CommandError
+from django.db import connection, connections, DatabaseError
+from django.db.models import Q, QuerySet
+from django.template import engines
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from freezegun import freeze_time
+
+from conditioner.actions.common import SendTemplatedEmailAction
+from conditioner.base import BaseCronCondition
+from conditioner.conditions.dates import DayOfMonthCondition
+from conditioner.management.commands.run_cron_conditions import Command, CronSchedule, parse_shard
+from conditioner.models import CronConditionExecution, Rule
+from conditioner.ratelimit import limiter
+from conditioner.tests.actions.factories import LoggerActionFactory, SendTemplatedEmailActionFactory
+from conditioner.tests.conditions.factories import DayOfMonthConditionFactory, DayOfWeekConditionFactory
+
+
+class RunCronConditionsCommandTestCase(TestCase):
+    """
+    Test `run_cron_conditions` management command
+    """
+    def create_rules(self, count, day=1):
+        """Helper method for creating cron rules with a mix of condition and action types"""
+        for i in range(count):
+            if i % 2:
+                condition = DayOfMonthConditionFactory(day=day)
+                LoggerActionFactory(rule=condition.rule)
+            else:
+                condition = DayOfWeekConditionFactory(weekday=7)
+                SendTemplatedEmailActionFactory(rule=condition.rule)
+
+    def run_command(self, *args):
+        """Helper method for running the command and returning its output"""
+        out = StringIO()
+        call_command('run_cron_conditions', *args, stdout=out)
+        return out.getvalue()
+
+    @freeze_time('2016-01-01')  # Friday
+    def test_command_runs_met_conditions(self):
+        """Test that actions of met conditions are run and 'last_executed' is saved"""
+        condition = DayOfMonthConditionFactory(day=1)
+        LoggerActionFactory(rule=condition.rule)
+
+        with self.assertLogs('conditioner.actions.misc', level='DEBUG') as log:
+            output = self.run_command()
+
+        self.assertEqual(len(log.records), 1)
+        self.assertEqual(log.records[0].condition_type, 'DayOfMonthCondition')
+        self.assertIn('Rule {}: action executed 1 time(s)'.format(condition.rule.pk), output)
+
+        condition = DayOfMonthCondition.objects.get(pk=condition.pk)
+        self.assertEqual(condition.last_executed, datetime(2016, 1, 1))
+        self.assertEqual(condition.next_run_at, datetime(2016, 2, 1))
+
+    @freeze_time('2016-01-01')
+    @mock.patch('conditioner.actions.misc.LoggerAction.run_action')
+    def test_command_reports_failed_rules(self, mocked_run_action):
+        """Test that failing actions don't stop other rules from running and are reported in the summary"""
+        mocked_run_action.side_effect = [ValueError('Oops'), None]
+        failing, succeeding = DayOfMonthConditionFactory(day=1), DayOfMonthConditionFactory(day=1)
+        LoggerActionFactory(rule=failing.rule)
+        LoggerActionFactory(rule=succeeding.rule)
+
+        with self.assertRaisesMessage(CommandError, '1 of 2 checked rule(s) failed'):
+            call_command('run_cron_conditions', stdout=StringIO())
+
+        self.assertEqual(mocked_run_action.call_count, 2)
+        self.assertEqual(DayOfMonthCondition.objects.filter(last_executed__isnull=False).count(), 1)
+
+    @freeze_time('2016-01-01')
+    @mock.patch('conditioner.actions.misc.LoggerAction.run_action')
+    def test_command_saves_executed_conditions_in_batches(self, mocked_run_action):
+        """Test that 'last_executed' of executed conditions is saved in batches"""
+        self.create_rules(10)  # 5 day of month conditions are met
+
+        with CaptureQueriesContext(connection) as queries:
+            self.run_command('--batch-size', '2')
+
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 3)
+        self.assertEqual(DayOfMonthCondition.objects.filter(last_executed=datetime(2016, 1, 1)).count(), 5)
+        self.assertEqual(DayOfMonthCondition.objects.filter(next_run_at=datetime(2016, 2, 1)).count(), 5)
+
+    @freeze_time('2016-01-01')
+    @mock.patch('conditioner.actions.misc.LoggerAction.run_action')
+    def test_command_saves_executed_conditions_in_transactions(self, mocked_run_action):
+        """Test that batches of executed conditions can be saved in a transaction"""
+        self.create_rules(4)
+
+        # Test case is wrapped in a transaction, so nested transactions are savepoints
+        with CaptureQueriesContext(connection) as queries:
+            self.run_command('--batch-size', '2')
+        self.assertFalse([query for query in queries if query['sql'].startswith('SAVEPOINT')])
+
+        BaseCronCondition.objects.update(last_executed=None, next_run_at=None)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.run_command('--batch-size', '2', '--atomic-batches')
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('SAVEPOINT')]), 1)
+
+    @freeze_time('2016-01-01')
+    def test_command_skips_rules_without_action(self):
+        """Test that rules without linked action are reported and skipped"""
+        condition = DayOfMonthConditionFactory(day=1)
+
+        output = self.run_command()
+
+        self.assertIn("rule {} doesn't have linked action".format(condition.rule.pk), output)
+        self.assertIsNone(DayOfMonthCondition.objects.get(pk=condition.pk).last_executed)
+
+    @freeze_time('2016-01-02')
+    @mock.patch('conditioner.conditions.dates.DayOfMonthCondition.is_met')
+    def test_command_skips_conditions_that_are_not_due(self, mocked_is_met):
+        """Test that only conditions with 'next_run_at' in the past (or not set) are checked"""
+        condition = DayOfMonthConditionFactory(day=3)
+        LoggerActionFactory(rule=condition.rule)
+
+        self.run_command()
+        self.assertFalse(mocked_is_met.called)
+
+        BaseCronCondition.objects.update(next_run_at=None)
+        mocked_is_met.return_value = False
+
+        self.run_command()
+        self.assertEqual(mocked_is_met.call_count, 1)
+
+    def test_command_refreshes_outdated_next_run_at(self):
+        """Test that 'next_run_at' of conditions that were due, but weren't met, is refreshed"""
+        with freeze_time('2016-01-01'):
+            condition = DayOfMonthConditionFactory(day=1)
+            LoggerActionFactory(rule=condition.rule)
+
+        with freeze_time('2016-01-03'):
+            self.run_command()
+
+        self.assertEqual(DayOfMonthCondition.objects.get(pk=condition.pk).next_run_at, datetime(2016, 2, 1))
+
+    @freeze_time('2016-01-02')  # Saturday, no condition is met
+    @mock.patch('conditioner.management.commands.run_cron_conditions.Command.refresh_next_run_at')
+    def test_command_query_count_is_constant(self, mocked_refresh_next_run_at):
+        """Test that loading conditions, rules and actions doesn't depend on the number of rules"""
+        self.create_rules(4)
+        BaseCronCondition.objects.update(next_run_at=None)  # Make sure that all conditions are checked
+        ContentType.objects.clear_cache()
+        with CaptureQueriesContext(connection) as small_run:
+            self.run_command()
+
+        self.create_rules(20)
+        BaseCronCondition.objects.update(next_run_at=None)
+        ContentType.objects.clear_cache()
+        with CaptureQueriesContext(connection) as large_run:
+            self.run_command()
+
+        self.assertEqual(len(small_run), len(large_run))
+
+
+@mock.patch.object(DayOfMonthCondition, 'model_specific', return_value=True)
+class RunCronConditionsModelSpecificTestCase(TestCase):
+    """
+    Test `run_cron_conditions` management command with model specific conditions
+    """
+    def setUp(self):
+        super().setUp()
+        with freeze_time('2016-01-01'):
+            self.condition = DayOfMonthConditionFactory(
+                day=1, rule__target_content_type=ContentType.objects.get_for_model(ContentType),
+            )
+            LoggerActionFactory(rule=self.condition.rule)
+
+    @freeze_time('2016-01-01')
+    @mock.patch('conditioner.actions.misc.LoggerAction.run_action')
+    @mock.patch.object(DayOfMonthCondition, 'is_met', return_value=True)
+    def test_command_runs_action_for_each_instance(self, mocked_is_met, mocked_run_action, mocked_model_specific):
+        """Test that target instances are checked in chunks and the action is run for each of them"""
+        instances = list(ContentType.objects.order_by('pk'))
+
+        out = StringIO()
+        call_command('run_cron_conditions', '--chunk-size', '2', stdout=out)
+
+        self.assertEqual([c[0][0] for c in mocked_is_met.call_args_list], instances)
+        self.assertEqual([c[0][0] for c in mocked_run_action.call_args_list], instances)
+        self.assertIn('Rule {}: action executed {} time(s)'.format(self.condition.rule.pk, len(instances)),
+                      out.getvalue())
+
+    @freeze_time('2016-01-01')
+    @mock.patch('conditioner.actions.misc.LoggerAction.prepare_instances')
+    @mock.patch('conditioner.actions.misc.LoggerAction.run_action')
+    @mock.patch.object(DayOfMonthCondition, 'is_met', return_value=True)
+    def test_command_prepares_instances_per_chunk(self, mocked_is_met, mocked_run_action, mocked_prepare_instances,
+                                                  mocked_model_specific):
+        """Test that the action prepares each chunk of target instances before it's run for them"""
+        instances = list(ContentType.objects.order_by('pk'))
+
+        call_command('run_cron_conditions', '--chunk-size', '2', stdout=StringIO())
+
+        self.assertEqual(
+            [c[0][0] for c in mocked_prepare_instances.call_args_list],
+            [instances[i:i + 2] for i in range(0, len(instances), 2)],
+        )
+
+    @mock.patch('conditioner.actions.misc.LoggerAction.run_action')
+    @mock.patch.object(DayOfMonthCondition, 'is_met', return_value=True)
+    def test_command_tracks_executions_per_instance(self, mocked_is_met, mocked_run_action, mocked_model_specific):
+        """Test that executions are tracked per target instance and instances are executed at most once a day"""
+        instances_count = ContentType.objects.count()
+
+        with freeze_time('2016-01-01 10:00'):
+            call_command('run_cron_conditions', '--chunk-size', '2', '--batch-size', '3', stdout=StringIO())
+
+        self.assertEqual(mocked_run_action.call_count, instances_count)
+        self.assertEqual(CronConditionExecution.objects.filter(condition=self.condition).count(), instances_count)
+
+        condition = DayOfMonthCondition.objects.get(pk=self.condition.pk)
+        self.assertEqual(condition.last_executed, datetime(2016, 1, 1, 10))
+        self.assertEqual(condition.next_run_at, datetime(2016, 2, 1))
+
+        # The same day, i.e. after the command crashed and was restarted
+        BaseCronCondition.objects.update(next_run_at=None)
+        mocked_run_action.reset_mock()
+
+        with freeze_time('2016-01-01 11:00'):
+            call_command('run_cron_conditions', '--chunk-size', '2', stdout=StringIO())
+
+        self.assertFalse(mocked_run_action.called)
+
+        # Next day
+        BaseCronCondition.objects.update(next_run_at=None)
+        with freeze_time('2016-01-02 10:00'):
+            call_command('run_cron_conditions', '--chunk-size', '2', stdout=StringIO())
+
+        self.assertEqual(mocked_run_action.call_count, instances_count)
+        self.assertEqual(CronConditionExecution.objects.filter(condition=self.condition).count(), instances_count)
+        self.assertEqual(
+            CronConditionExecution.objects.filter(executed=datetime(2016, 1, 2, 10)).count(), instances_count
+        )
+
+    @freeze_time('2016-01-01')
+    @mock.patch('conditioner.actions.misc.LoggerAction.run_action')
+    @mock.patch.object(DayOfMonthCondition, 'is_met', return_value=True)
+    def test_command_saves_executions_after_every_chunk(self, mocked_is_met, mocked_run_action,
+                                                        mocked_model_specific):
+        """Test that executions are saved after every chunk, regardless of the batch size"""
+        saved_counts = list()
+        mocked_run_action.side_effect = lambda instance, **kwargs: saved_counts.append(
+            CronConditionExecution.objects.filter(condition=self.condition).count()
+        )
+
+        call_command('run_cron_conditions', '--chunk-size', '2', '--batch-size', '100', stdout=StringIO())
+
+        self.assertEqual(saved_counts[:5], [0, 0, 2, 2, 4])
+
+    @freeze_time('2016-01-01')
+    @mock.patch('conditioner.actions.misc.LoggerAction.run_action', autospec=True)
+    @mock.patch.object(DayOfMonthCondition, 'is_met', return_value=True)
+    def test_command_doesnt_track_dropped_runs(self, mocked_is_met, mocked_run_action, mocked_model_specific):
+        """Test that runs dropped by the rule rate limit aren't tracked as executed"""
+        self.condition.rule.rate_limit = 2
+        self.condition.rule.save()
+        limiter.reset()
+        self.addCleanup(limiter.reset)
+
+        output = StringIO()
+        call_command('run_cron_conditions', stdout=output)
+
+        self.assertEqual(mocked_run_action.call_count, 2)
+        self.assertEqual(CronConditionExecution.objects.filter(condition=self.condition).count(), 2)
+        self.assertIn('Action of rule {} was dropped'.format(self.condition.rule.pk), output.getvalue())
+
+    @freeze_time('2016-01-01')
+    @mock.patch('conditioner.actions.misc.LoggerAction.run_action')
+    @mock.patch.object(DayOfMonthCondition, 'is_met', return_value=True)
+    def test_command_leaves_sharded_conditions_due(self, mocked_is_met, mocked_run_action, mocked_model_specific):
+        """Test that shards don't mark shared model specific conditions as executed, so no shard is skipped"""
+        instances_count = ContentType.objects.count()
+
+        call_command('run_cron_conditions', '--shard', '0/2', stdout=StringIO())
+
+        condition = DayOfMonthCondition.objects.get(pk=self.condition.pk)
+        self.assertIsNone(condition.last_executed)
+        self.assertEqual(condition.next_run_at, datetime(2016, 1, 1))
+        first_shard_count = mocked_run_action.call_count
+
+        call_command('run_cron_conditions', '--shard', '1/2', stdout=StringIO())
+        call_command('run_cron_conditions', '--shard', '0/2', stdout=StringIO())
+
+        self.assertEqual(mocked_run_action.call_count, instances_count)
+        self.assertGreater(first_shard_count, 0)
+        self.assertLess(first_shard_count, instances_count)
+        self.assertEqual(CronConditionExecution.objects.filter(condition=self.condition).count(), instances_count)
+
+    @freeze_time('2016-01-01')
+    @mock.patch('conditioner.actions.common.get_template', return_value=engines['django'].from_string('Body'))
+    @mock.patch.object(DayOfMonthCondition, 'get_target_filter', return_value=Q(app_label='auth'))
+    def test_command_sends_emails_with_single_connection(self, mocked_get_target_filter, mocked_get_template,
+                                                         mocked_model_specific):
+        """Test that emails of all target instances are sent with a single connection and failures are reported"""
+        self.condition.rule.action.delete()
+        action = SendTemplatedEmailActionFactory(rule=self.condition.rule)
+        instances_count = ContentType.objects.filter(app_label='auth').count()
+        connection = mail.get_connection()
+        send_messages = connection.send_messages
+
+        def mocked_send_messages(messages):
+            if mocked_connection_send_messages.call_count == 1:
+                raise ValueError('Oops')
+            return send_messages(messages)
+
+        output = StringIO()
+        with mock.patch('conditioner.actions.common.get_connection', return_value=connection) as mocked_get_connection:
+            with mock.patch.object(connection, 'send_messages', side_effect=mocked_send_messages) \
+                    as mocked_connection_send_messages, self.assertLogs('conditioner.actions.common', 'ERROR'):
+                call_command('run_cron_conditions', '--chunk-size', '2', stdout=output)
+
+        self.assertEqual(mocked_get_connection.call_count, 1)
+        self.assertEqual(len(mail.outbox), instances_count - 1)
+        self.assertIn("Email to {} of rule {} couldn't be sent: Oops".format(action.email, self.condition.rule.pk),
+                      output.getvalue())
+
+        # Execution of the instance which email failed isn't recorded, so it's retried on the next run
+        self.assertEqual(
+            CronConditionExecution.objects.filter(condition=self.condition).count(), instances_count - 1
+        )
+        self.assertIn('Rule {}: action executed {} time(s)'.format(self.condition.rule.pk, instances_count - 1),
+                      output.getvalue())
+
+    @freeze_time('2016-01-01')
+    @mock.patch('conditioner.actions.common.get_template', return_value=engines['django'].from_string('Body'))
+    def test_command_tracks_executions_before_failed_action(self, mocked_get_template, mocked_model_specific):
+        """Test that instances the action was run for before it failed in the same chunk aren't run again"""
+        self.condition.rule.action.delete()
+        SendTemplatedEmailActionFactory(rule=self.condition.rule)
+        instances = list(ContentType.objects.order_by('pk')[:5])
+        run_action = SendTemplatedEmailAction.run_action
+
+        def mocked_run_action(action, instance, **kwargs):
+            if instance == instances[3]:
+                raise ValueError('Oops')
+            return run_action(action, instance, **kwargs)
+
+        with mock.patch.object(DayOfMonthCondition, 'get_target_filter',
+                               return_value=Q(pk__in=[instance.pk for instance in instances])), \
+                mock.patch.object(SendTemplatedEmailAction, 'run_action', autospec=True,
+                                  side_effect=mocked_run_action) as mocked:
+            for _ in range(2):
+                with self.assertRaises(CommandError):
+                    call_command('run_cron_conditions', stdout=StringIO())
+
+        # Emails of the instances before the failed one are sent once and their executions are recorded
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(
+            set(CronConditionExecution.objects.filter(condition=self.condition).values_list('object_pk', flat=True)),
+            {str(instance.pk) for instance in instances[:3]},
+        )
+        # The second run only retries the instance the action failed for
+        self.assertEqual([c[0][1] for c in mocked.call_args_list], instances[:4] + [instances[3]])
+
+    @freeze_time('2016-01-01')
+    @mock.patch('conditioner.actions.common.get_template', return_value=engines['django'].from_string('Body'))
+    @mock.patch.object(DayOfMonthCondition, 'get_target_filter', return_value=Q(app_label='auth'))
+    def test_command_doesnt_track_executions_of_unsent_emails(self, mocked_get_target_filter, mocked_get_template,
+                                                              mocked_model_specific):
+        """Test that executions aren't recorded when the email backend connection can't be opened"""
+        self.condition.rule.action.delete()
+        SendTemplatedEmailActionFactory(rule=self.condition.rule)
+        connection = mail.get_connection()
+
+        output = StringIO()
+        with mock.patch('conditioner.actions.common.get_connection', return_value=connection), \
+                mock.patch.object(connection, 'open', side_effect=ConnectionRefusedError('Oops')), \
+                self.assertLogs('conditioner.actions.common', 'ERROR'):
+            call_command('run_cron_conditions', '--chunk-size', '2', stdout=output)
+
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertFalse(CronConditionExecution.objects.filter(condition=self.condition).exists())
+        condition = DayOfMonthCondition.objects.get(pk=self.condition.pk)
+        self.assertIsNone(condition.last_executed)
+        self.assertIn("couldn't be sent: Oops", output.getvalue())
+
+    @freeze_time('2016-01-01')
+    @mock.patch('conditioner.actions.misc.LoggerAction.run_action')
+    @mock.patch.object(DayOfMonthCondition, 'is_met')
+    @mock.patch.object(DayOfMonthCondition, 'get_target_filter', return_value=Q(app_label='auth'))
+    def test_command_uses_target_filter(self, mocked_get_target_filter, mocked_is_met, mocked_run_action,
+                                        mocked_model_specific):
+        """Test that conditions compiled to a filter select target instances in the database"""
+        call_command('run_cron_conditions', '--chunk-size', '2', stdout=StringIO())
+
+        # Target instances aren't checked, only whether the condition is due
+        mocked_is_met.assert_called_once_with()
+        self.assertEqual(
+            [c[0][0] for c in mocked_run_action.call_args_list],
+            list(ContentType.objects.filter(app_label='auth').order_by('pk')),
+        )
+
+    @mock.patch('conditioner.actions.misc.LoggerAction.run_action')
+    @mock.patch.object(DayOfMonthCondition, 'get_target_filter', return_value=Q(app_label='auth'))
+    def test_command_checks_target_filter_conditions_are_due(self, mocked_get_target_filter, mocked_run_action,
+                                                             mocked_model_specific):
+        """Test that conditions compiled to a filter are run only when they are due and at most once a day"""
+        instances_count = ContentType.objects.filter(app_label='auth').count()
+
+        # The command didn't run on the due day
+        with freeze_time('2016-01-02 10:00'):
+            call_command('run_cron_conditions', stdout=StringIO())
+
+        self.assertFalse(mocked_run_action.called)
+        self.assertEqual(DayOfMonthCondition.objects.get(pk=self.condition.pk).next_run_at, datetime(2016, 2, 1))
+
+        with freeze_time('2016-02-01 10:00'):
+            call_command('run_cron_conditions', stdout=StringIO())
+            self.assertEqual(mocked_run_action.call_count, instances_count)
+
+            # Conditions that can't tell when they will be met are checked on every run
+            BaseCronCondition.objects.update(next_run_at=None)
+            CronConditionExecution.objects.all().delete()
+            call_command('run_cron_conditions', stdout=StringIO())
+
+        self.assertEqual(mocked_run_action.call_count, instances_count)
+
+    @freeze_time('2016-01-01')
+    @mock.patch('conditioner.actions.misc.LoggerAction.prepare_instances')
+    @mock.patch('conditioner.actions.misc.LoggerAction.run_action')
+    def test_command_prepares_only_met_instances(self, mocked_run_action, mocked_prepare_instances,
+                                                 mocked_model_specific):
+        """Test that the action prepares only the instances the condition is met for"""
+        instances = list(ContentType.objects.order_by('pk'))
+
+        with mock.patch.object(DayOfMonthCondition, 'is_met', side_effect=lambda instance: instance.pk % 2):
+            call_command('run_cron_conditions', stdout=StringIO())
+
+        met = [instance for instance in instances if instance.pk % 2]
+        mocked_prepare_instances.assert_called_once_with(met)
+        self.assertEqual([c[0][0] for c in mocked_run_action.call_args_list], met)
+
+    @mock.patch.object(DayOfMonthCondition, 'target_fields', return_value=('created',))
+    def test_command_loads_target_fields_of_the_action(self, mocked_target_fields, mocked_model_specific):
+        """Test that target model fields the action needs are loaded together with the condition ones"""
+        self.condition.rule.target_content_type = ContentType.objects.get_for_model(Rule)
+        self.condition.rule.save()
+        self.condition.rule.action.delete()
+        SendTemplatedEmailActionFactory(rule=self.condition.rule, context_related='target_content_type, condition')
+        command = Command()
+        command.shard = None
+        command.chunk_size = 2
+
+        instances = [instance for chunk in command.iterate_chunks(self.condition) for instance in chunk]
+
+        self.assertEqual(len(instances), Rule.objects.count())
+        self.assertNotIn('target_content_type', instances[0].get_deferred_fields())
+        self.assertIn('modified', instances[0].get_deferred_fields())
+
+    @mock.patch.object(DayOfMonthCondition, 'target_fields', return_value=('model',))
+    def test_command_loads_only_target_fields(self, mocked_target_fields, mocked_model_specific):
+        """Test that only the fields needed by the condition are loaded"""
+        command = Command()
+        command.shard = None
+        command.chunk_size = 2
+
+        instances = [instance for chunk in command.iterate_chunks(self.condition) for instance in chunk]
+
+        self.assertEqual(len(instances), ContentType.objects.count())
+        self.assertEqual(instances[0].get_deferred_fields(), {'app_label'})
+
+
+class RunCronConditionsClaimTestCase(TestCase):
+    """
+    Test `run_cron_conditions` management command with conditions claiming
+    """
+    def setUp(self):
+        super().setUp()
+        with freeze_time('2016-01-01'):
+            self.condition = DayOfMonthConditionFactory(day=1)
+            LoggerActionFactory(rule=self.condition.rule)
+
+    def run_command(self):
+        """Helper method for running the command with claiming and returning its output"""
+        out = StringIO()
+        call_command('run_cron_conditions', '--claim', stdout=out)
+        return out.getvalue()
+
+    @freeze_time('2016-01-01')
+    def test_command_runs_claimed_conditions(self):
+        """Test that claimed conditions are run"""
+        with self.assertLogs('conditioner.actions.misc', level='DEBUG'):
+            output = self.run_command()
+
+        self.assertIn('Rule {}: action executed 1 time(s)'.format(self.condition.rule.pk), output)
+        self.assertEqual(DayOfMonthCondition.objects.get(pk=self.condition.pk).last_executed, datetime(2016, 1, 1))
+
+    @freeze_time('2016-01-01')
+    @mock.patch('conditioner.management.commands.run_cron_conditions.Command.get_conditions')
+    def test_command_skips_conditions_claimed_by_other_nodes(self, mocked_get_conditions):
+        """Test that conditions that were executed by another node since they were loaded are skipped"""
+        mocked_get_conditions.return_value = list(BaseCronCondition.objects.with_actions())
+        BaseCronCondition.objects.update(last_executed=timezone.now())
+
+        with mock.patch('conditioner.actions.misc.LoggerAction.run_action') as mocked_run_action:
+            output = self.run_command()
+
+        self.assertFalse(mocked_run_action.called)
+        self.assertIn('Condition for rule {} was claimed by another node'.format(self.condition.rule.pk), output)
+
+    @freeze_time('2016-01-01')
+    @mock.patch('conditioner.actions.misc.LoggerAction.run_action')
+    def test_command_releases_claim_when_action_fails(self, mocked_run_action):
+        """Test that the claim is released if the action wasn't executed"""
+        mocked_run_action.side_effect = ValueError('Oops')
+
+        with self.assertRaises(CommandError):
+            self.run_command()
+
+        self.assertIsNone(DayOfMonthCondition.objects.get(pk=self.condition.pk).last_executed)
+
+    @freeze_time('2016-01-01')
+    def test_command_locks_conditions_when_supported(self):
+        """Test that conditions are locked with `SELECT ... FOR UPDATE SKIP LOCKED` if the database supports it"""
+        select_for_update = QuerySet.select_for_update
+
+        with mock.patch.object(connection.features, 'has_select_for_update_skip_locked', True, create=True), \
+                mock.patch.object(QuerySet, 'select_for_update', autospec=True,
+                                  side_effect=select_for_update) as mocked_select_for_update, \
+                self.assertLogs('conditioner.actions.misc', level='DEBUG'):
+            self.run_command()
+
+        self.assertEqual(mocked_select_for_update.call_count, 1)
+        self.assertEqual(mocked_select_for_update.call_args[1], {'skip_locked': True})
+        self.assertEqual(DayOfMonthCondition.objects.get(pk=self.condition.pk).last_executed, datetime(2016, 1, 1))
+
+
+class RunCronConditionsShardTestCase(TestCase):
+    """
+    Test `run_cron_conditions` management command sharding
+    """
+    def test_parse_shard_function(self):
+        """Test `parse_shard()` function"""
+        self.assertEqual(parse_shard('0/1'), (0, 1))
+        self.assertEqual(parse_shard('3/4'), (3, 4))
+
+        for value in ('1', 'a/b', '4/4', '-1/4'):
+            self.assertRaises(CommandError, parse_shard, value)
+
+    @freeze_time('2016-01-01')
+    def test_command_partitions_generic_conditions(self):
+        """Test that generic conditions are partitioned between shards by rule primary key"""
+        conditions = [DayOfMonthConditionFactory(day=1) for _ in range(4)]
+        for condition in conditions:
+            LoggerActionFactory(rule=condition.rule)
+
+        for index in range(2):
+            out = StringIO()
+            with self.assertLogs('conditioner.actions.misc', level='DEBUG') as log:
+                call_command('run_cron_conditions', '--shard', '{}/2'.format(index), stdout=out)
+
+            self.assertEqual(len(log.records), 2)
+            self.assertIn('Shard {}/2 checked 2 rule(s)'.format(index), out.getvalue())
+            for condition in conditions:
+                self.assertEqual(
+                    'Rule {}: action executed'.format(condition.rule.pk) in out.getvalue(),
+                    condition.rule.pk % 2 == index,
+                )
+
+    def test_command_partitions_target_instances(self):
+        """Test that target instances of model specific conditions are partitioned into primary key ranges"""
+        condition = DayOfMonthConditionFactory(rule__target_content_type=ContentType.objects.get_for_model(ContentType))
+        command = Command()
+
+        command.shard = None
+        all_pks = set(command.get_instances(condition).values_list('pk', flat=True))
+
+        sharded_pks = list()
+        for index in range(3):
+            command.shard = (index, 3)
+            sharded_pks += command.get_instances(condition).values_list('pk', flat=True)
+
+        self.assertEqual(len(sharded_pks), len(all_pks))
+        self.assertEqual(set(sharded_pks), all_pks)
+
+
+class RunCronConditionsWorkersTestCase(TestCase):
+    """
+    Test `run_cron_conditions` management command with multiple worker threads
+    """
+    def setUp(self):
+        super().setUp()
+
+        # In-memory SQLite databases can't be shared between connections, so (like `LiveServerTestCase` does) we
+        # need to pass the connection to worker threads
+        shared_connection = connections['default']
+        shared_connection.allow_thread_sharing = True
+        self.addCleanup(setattr, shared_connection, 'allow_thread_sharing', False)
+
+        run_worker = Command.run_worker
+
+        def shared_connection_run_worker(command, *args):
+            connections['default'] = shared_connection
+            return run_worker(command, *args)
+
+        patcher = mock.patch.object(Command, 'run_worker', shared_connection_run_worker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @freeze_time('2016-01-01')
+    def test_command_runs_actions_in_workers(self):
+        """Test that actions are run in worker threads and each rule is reported"""
+        conditions = [DayOfMonthConditionFactory(day=1) for _ in range(4)]
+        for condition in conditions:
+            LoggerActionFactory(rule=condition.rule)
+
+        thread_names = set()
+
+        def run_action(*args, **kwargs):
+            thread_names.add(threading.current_thread().name)
+
+        out = StringIO()
+        with mock.patch('conditioner.actions.misc.LoggerAction.run_action', side_effect=run_action):
+            call_command('run_cron_conditions', '--workers', '2', stdout=out)
+
+        self.assertTrue(thread_names)
+        self.assertNotIn(threading.main_thread().name, thread_names)
+        self.assertEqual(DayOfMonthCondition.objects.filter(last_executed__isnull=False).count(), 4)
+        for condition in conditions:
+            self.assertIn('Rule {}: action executed 1 time(s)'.format(condition.rule.pk), out.getvalue())
+
+    @freeze_time('2016-01-01')
+    @mock.patch('conditioner.actions.misc.LoggerAction.run_action')
+    def test_command_closes_connections_once_per_worker(self, mocked_run_action):
+        """Test that worker threads reuse their database connections and close them once they are done"""
+        for _ in range(6):
+            LoggerActionFactory(rule=DayOfMonthConditionFactory(day=1).rule)
+
+        with mock.patch.object(connections, 'close_all') as mocked_close_all:
+            call_command('run_cron_conditions', '--workers', '2', stdout=StringIO())
+
+        self.assertEqual(mocked_run_action.call_count, 6)
+        self.assertEqual(mocked_close_all.call_count, 2)
+
+
+class RunCronConditionsDaemonTestCase(TestCase):
+    """Test 'run_cron_conditions' management command daemon mode"""
+    def test_cron_schedule(self):
+        """Test 'CronSchedule' class"""
+        now = timezone.now()
+        schedule = CronSchedule()
+        self.assertIsNone(schedule.next_run_at())
+
+        schedule.schedule(1, now + timezone.timedelta(minutes=5))
+        schedule.schedule(2, now + timezone.timedelta(minutes=1))
+        schedule.schedule(3, now - timezone.timedelta(minutes=1))
+        self.assertEqual(len(schedule), 3)
+        self.assertEqual(schedule.next_run_at(), now - timezone.timedelta(minutes=1))
+
+        # Rescheduled conditions outdated entries are skipped
+        schedule.schedule(3, now + timezone.timedelta(minutes=10))
+        self.assertEqual(schedule.pop_due(now), set())
+        self.assertEqual(schedule.next_run_at(), now + timezone.timedelta(minutes=1))
+
+        self.assertEqual(schedule.pop_due(now + timezone.timedelta(minutes=5)), {1, 2})
+        self.assertEqual(len(schedule), 1)
+        self.assertEqual(schedule.next_run_at(), now + timezone.timedelta(minutes=10))
+
+    @freeze_time('2016-01-01')
+    def test_command_runs_due_conditions_until_stopped(self):
+        """Test that daemon runs conditions that are due and stops gracefully"""
+        due = DayOfMonthConditionFactory(day=1)
+        LoggerActionFactory(rule=due.rule)
+        not_due = DayOfMonthConditionFactory(day=15)
+        LoggerActionFactory(rule=not_due.rule)
+
+        timeouts = list()
+
+        def sleep(command, seconds):
+            timeouts.append(seconds)
+            command.stop(signal.SIGTERM, None)
+
+        out = StringIO()
+        with mock.patch.object(Command, 'sleep', sleep), \
+                mock.patch('conditioner.actions.misc.LoggerAction.run_action') as mocked_run_action:
+            call_command('run_cron_conditions', '--daemon', '--poll-interval', '60', stdout=out)
+
+        self.assertEqual(mocked_run_action.call_count, 1)
+        due.refresh_from_db()
+        not_due.refresh_from_db()
+        self.assertIsNotNone(due.last_executed)
+        self.assertIsNone(not_due.last_executed)
+
+        # Nothing is due before the next poll
+        self.assertEqual(len(timeouts), 1)
+        self.assertAlmostEqual(timeouts[0], 60, delta=5)
+        self.assertIn('Rule {}: action executed 1 time(s)'.format(due.rule.pk), out.getvalue())
+        self.assertIn('Daemon stopped.', out.getvalue())
+
+    @freeze_time('2016-01-01')
+    def test_command_survives_failed_ticks(self):
+        """Test that daemon keeps running when a tick fails with an unexpected error"""
+        condition = DayOfMonthConditionFactory(day=1)
+        LoggerActionFactory(rule=condition.rule)
+
+        def sleep(command, seconds):
+            if mocked_run_tick.call_count > 1:
+                command.stop(signal.SIGTERM, None)
+
+        out, err = StringIO(), StringIO()
+        with mock.patch.object(Command, 'sleep', sleep), \
+                mock.patch.object(Command, 'run_tick', side_effect=[DatabaseError('Gone away'), None]) \
+                as mocked_run_tick:
+            call_command('run_cron_conditions', '--daemon', '--poll-interval', '0', stdout=out, stderr=err)
+
+        self.assertEqual(mocked_run_tick.call_count, 2)
+        self.assertIn('Tick failed (DatabaseError: Gone away)', err.getvalue())
+        self.assertIn('Daemon stopped.', out.getvalue())
@@ -1,9 +1,17 @@
 """
 Test 'conditioner.apps' file
 """
+from unittest import mock
+
 from django.apps import AppConfig
 from django.apps import apps as license_tracker_apps
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from conditioner.dispatch import dispatcher
+from conditioner.tests.actions.factories import LoggerActionFactory
+from conditioner.tests.factories import RuleFactory
 
 
 class ConditionerAppConfigTestCase(TestCase):
@@ -11,9 +19,38 @@ class ConditionerAppConfigTestCase(TestCase):
     Test 'conditioner' module `AppConfig` integration
     """
     def test_conditioner_app_config(self):
-        """Test 'licenses' module `AppConfig` instance"""
+        """Test 'conditioner' module `AppConfig` instance"""
         conditioner_app_config = license_tracker_apps.get_app_config('conditioner')
 
         self.assertIsInstance(conditioner_app_config, AppConfig)
         self.assertEqual(conditioner_app_config.name, 'conditioner')
         self.assertEqual(conditioner_app_config.verbose_name, 'Conditioner')
+
+    @mock.patch.object(dispatcher, 'bump_version')
+    def test_conditioner_app_config_rules_changed(self, mocked_bump_version):
+        """Test that rules version is bumped when rules and actions are changed"""
+        rule = RuleFactory()
+        self.assertEqual(mocked_bump_version.call_count, 1)
+
+        LoggerActionFactory(rule=rule)
+        self.assertEqual(mocked_bump_version.call_count, 2)
+
+        rule.delete()
+        self.assertGreaterEqual(mocked_bump_version.call_count, 3)
+
+    def test_conditioner_app_config_ready_method(self):
+        """Test that 'conditioner' module `AppConfig` doesn't query the database on startup"""
+        conditioner_app_config = license_tracker_apps.get_app_config('conditioner')
+
+        with CaptureQueriesContext(connection) as queries:
+            conditioner_app_config.ready()
+
+        self.assertEqual(len(queries), 0)
+
+    @override_settings(CONDITIONER_LOG_QUEUE={'size': 100, 'overflow': 'drop_oldest'})
+    @mock.patch('conditioner.log.log_queue.start')
+    def test_conditioner_app_config_ready_method_starts_log_queue(self, mocked_start):
+        """Test that logging queue is started with `CONDITIONER_LOG_QUEUE` setting options"""
+        license_tracker_apps.get_app_config('conditioner').ready()
+
+        mocked_start.assert_called_once_with(size=100, overflow='drop_oldest')
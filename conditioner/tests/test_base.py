@@ -1,13 +1,19 @@
 """
 Test 'conditioner.base' file
 """
+from datetime import datetime
+from unittest import mock
+
 from django.db import models
 from django.test import TestCase
 
+from freezegun import freeze_time
 from polymorphic.models import PolymorphicModel
 
-from conditioner.base import BaseAction, BaseCondition, BaseCronCondition
+from conditioner.base import BaseAction, BaseCondition, BaseConditionQuerySet, BaseCronCondition
 from conditioner.models import Rule
+from conditioner.actions import LoggerAction
+from conditioner.tests.actions.factories import LoggerActionFactory
 from conditioner.tests.factories import BaseActionFactory, BaseConditionFactory, BaseCronConditionFactory
 
 
@@ -34,10 +40,28 @@ class BaseActionTestCase(TestCase):
         self.assertEqual(field.rel.related_name, 'action')
         self.assertEqual(field.verbose_name, 'rule')
 
+    def test_model_target_fields_method(self):
+        """Test model `target_fields()` method"""
+        self.assertEqual(tuple(self.instance.target_fields()), ())
+
     def test_model_run_action_method(self):
         """Test model `run_action()` method"""
         self.assertRaises(NotImplementedError, self.instance.run_action)
 
+    @mock.patch('conditioner.base.BaseAction.prepare_instances')
+    @mock.patch('conditioner.base.BaseAction.run_action')
+    def test_model_run_batch_action_method(self, mocked_run_action, mocked_prepare_instances):
+        """Test model `run_batch_action()` method"""
+        instances = [mock.Mock(), mock.Mock()]
+        self.instance.run_batch_action(instances, pks=[1, 2])
+
+        mocked_prepare_instances.assert_called_once_with(instances)
+
+        mocked_run_action.assert_has_calls([
+            mock.call(instance=instances[0], pks=[1, 2]),
+            mock.call(instance=instances[1], pks=[1, 2]),
+        ])
+
     def test_model_str_method(self):
         """Test model `__str__` method"""
         self.assertEqual(str(self.instance), 'Action')
@@ -66,6 +90,21 @@ class BaseConditionTestCase(TestCase):
         self.assertEqual(field.rel.related_name, 'condition')
         self.assertEqual(field.verbose_name, 'rule')
 
+    def test_model_objects_manager(self):
+        """Test model 'objects' manager queryset"""
+        self.assertIsInstance(self.model.objects.all(), BaseConditionQuerySet)
+
+    def test_model_queryset_with_actions_method(self):
+        """Test model queryset `with_actions()` method"""
+        LoggerActionFactory(rule=self.instance.rule)
+        BaseConditionFactory()  # Rule without an action
+
+        with self.assertNumQueries(3):  # Conditions (base class only), actions and action subclass
+            conditions = list(self.model.objects.with_actions().order_by('pk'))
+            self.assertIsInstance(conditions[0].rule.action, LoggerAction)
+            self.assertFalse(hasattr(conditions[1].rule, 'action'))
+            self.assertIsNotNone(conditions[0].rule.target_content_type)
+
     def test_model_str_method(self):
         """Test model `__str__` method"""
         self.assertEqual(str(self.instance), 'Condition')
@@ -93,6 +132,58 @@ class BaseCronConditionTestCase(TestCase):
         self.assertTrue(field.null)
         self.assertFalse(field.editable)
 
+    def test_model_next_run_at_field(self):
+        """Test model 'next_run_at' field"""
+        field = self.model._meta.get_field('next_run_at')
+
+        self.assertIsInstance(field, models.DateTimeField)
+        self.assertEqual(field.verbose_name, 'next run at')
+        self.assertTrue(field.null)
+        self.assertFalse(field.editable)
+        self.assertTrue(field.db_index)
+
+    def test_model_target_fields_method(self):
+        """Test model `target_fields()` method"""
+        self.assertIsNone(self.instance.target_fields())
+
+    def test_model_get_target_filter_method(self):
+        """Test model `get_target_filter()` method"""
+        self.assertIsNone(self.instance.get_target_filter())
+
+    def test_model_get_next_run_at_method(self):
+        """Test model `get_next_run_at()` method"""
+        self.assertIsNone(self.instance.get_next_run_at())
+
+    @freeze_time('2016-01-02')
+    def test_model_is_due_method(self):
+        """Test model `is_due()` method"""
+        # Can't tell when it will be met
+        self.assertTrue(self.instance.is_due())
+
+        self.instance.next_run_at = datetime(2016, 1, 3)
+        self.assertFalse(self.instance.is_due())
+
+        self.instance.next_run_at = datetime(2016, 1, 1)
+        self.assertTrue(self.instance.is_due())
+
+        self.instance.last_executed = datetime(2016, 1, 1, 10)
+        self.assertFalse(self.instance.is_due())
+
+    def test_model_is_met_method(self):
+        """Test model `is_met()` method"""
+        self.assertRaises(NotImplementedError, self.instance.is_met)
+
     def test_model_str_method(self):
         """Test model `__str__` method"""
         self.assertEqual(str(self.instance), 'Cron condition')
+
+    @mock.patch('conditioner.base.BaseCronCondition.get_next_run_at')
+    def test_model_save_method(self, mocked_get_next_run_at):
+        """Test model `save()` method"""
+        next_run_at = datetime(2016, 1, 1)
+        mocked_get_next_run_at.return_value = next_run_at
+
+        self.instance.save()
+
+        self.assertEqual(self.instance.next_run_at, next_run_at)
+        self.assertEqual(self.model.objects.get(pk=self.instance.pk).next_run_at, next_run_at)
@@ -0,0 +1,467 @@
+"""
+Test 'conditioner.dispatch' file
+"""
+import threading
+import uuid
+from unittest import mock
+
+from django.contrib.auth.models import Group
+from django.contrib.contenttypes.models import ContentType
+from django.db import OperationalError, connection, transaction
+from django.db.models import signals
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from conditioner import signals as bulk_signals
+from conditioner.dispatch import RULES_VERSION_CACHE_KEY, ActionBatch, Debouncer, SignalDispatcher, dispatcher
+from conditioner.ratelimit import limiter
+from conditioner.tests.actions.factories import LoggerActionFactory
+from conditioner.tests.conditions.factories import ModelSignalConditionFactory
+
+
+class ActionBatchTestCase(TestCase):
+    """
+    Test `conditioner.dispatch.ActionBatch` class
+    """
+    def setUp(self):
+        super().setUp()
+        self.batch = ActionBatch(autostart=False)
+
+    def test_actions_are_deferred_until_commit(self):
+        """Test that actions triggered in a transaction are queued after commit and run together"""
+        actions = [mock.Mock(), mock.Mock()]
+
+        with transaction.atomic():
+            for action in actions:
+                self.batch.defer(action.run_action, {'instance': action})
+
+            self.assertEqual(self.batch.actions, [])
+            # `TestCase` transactions are never committed, so the callbacks need to be run manually
+            self.assertEqual(len(connection.run_on_commit), 2)
+            for _, callback in connection.run_on_commit:
+                callback()
+
+        self.assertFalse(any(action.run_action.called for action in actions))
+        self.assertEqual(len(self.batch.actions), 2)
+
+        self.batch.run()
+        for action in actions:
+            action.run_action.assert_called_once_with(instance=action)
+        self.assertEqual(self.batch.actions, [])
+
+    def test_actions_are_discarded_on_rollback(self):
+        """Test that actions triggered in a rolled back savepoint aren't run"""
+        action, rolled_back_action = mock.Mock(), mock.Mock()
+
+        with transaction.atomic():
+            self.batch.defer(action.run_action, {})
+            try:
+                with transaction.atomic():
+                    self.batch.defer(rolled_back_action.run_action, {})
+                    raise ValueError
+            except ValueError:
+                pass
+
+            self.assertEqual(len(connection.run_on_commit), 1)
+            _, callback = connection.run_on_commit[0]
+            callback()
+
+        self.batch.run()
+        self.assertEqual(action.run_action.call_count, 1)
+        self.assertFalse(rolled_back_action.run_action.called)
+
+    def test_failed_action_does_not_prevent_others(self):
+        """Test that a failed action doesn't prevent other queued actions from running"""
+        failed_action, action = mock.Mock(), mock.Mock()
+        failed_action.run_action.side_effect = ValueError
+
+        self.batch.add(failed_action.run_action, {})
+        self.batch.add(action.run_action, {})
+        with self.assertLogs('conditioner.dispatch', 'ERROR'):
+            self.batch.run()
+
+        self.assertEqual(action.run_action.call_count, 1)
+
+    def test_actions_are_run_in_background_thread(self):
+        """Test that queued actions are run by the background thread"""
+        batch = ActionBatch()
+        done = threading.Event()
+        threads = list()
+
+        def run_action():
+            threads.append(threading.current_thread())
+            done.set()
+
+        with mock.patch('conditioner.dispatch.atexit.register'):
+            batch.add(run_action, {})
+            self.assertTrue(done.wait(5))
+
+        self.assertEqual(threads, [batch.thread])
+
+
+class DebouncerTestCase(TestCase):
+    """
+    Test `conditioner.dispatch.Debouncer` class
+    """
+    def setUp(self):
+        super().setUp()
+        self.debouncer = Debouncer(autostart=False)
+
+    @mock.patch('conditioner.dispatch.time.monotonic', return_value=100)
+    def test_repeated_signals_are_collapsed(self, mocked_monotonic):
+        """Test that repeated signals for the same key are collapsed into a single run with the latest arguments"""
+        run, other_run = mock.Mock(), mock.Mock()
+
+        self.assertTrue(self.debouncer.add('key', run, {'instance': 1}, 10))
+        self.assertFalse(self.debouncer.add('key', run, {'instance': 2}, 10))
+        self.assertTrue(self.debouncer.add('other', other_run, {'instance': 3}, 20))
+
+        self.debouncer.flush(now=105)
+        self.assertFalse(run.called)
+
+        self.debouncer.flush(now=110)
+        run.assert_called_once_with(instance=2)
+        self.assertFalse(other_run.called)
+
+        # Window of flushed key starts again
+        self.assertTrue(self.debouncer.add('key', run, {'instance': 4}, 10))
+
+        self.debouncer.flush()
+        other_run.assert_called_once_with(instance=3)
+        self.assertEqual(run.call_count, 2)
+        self.assertEqual(self.debouncer.pending, {})
+
+    def test_failed_action_does_not_prevent_others(self):
+        """Test that a failed action doesn't prevent other actions from running"""
+        failed_run, run = mock.Mock(side_effect=ValueError), mock.Mock()
+        self.debouncer.add('failed', failed_run, {}, 0)
+        self.debouncer.add('key', run, {}, 0)
+
+        with self.assertLogs('conditioner.dispatch', 'ERROR'):
+            self.debouncer.flush()
+
+        self.assertEqual(run.call_count, 1)
+
+    def test_pending_actions_can_be_discarded(self):
+        """Test that `discard()` removes pending actions without running them"""
+        run = mock.Mock()
+        self.debouncer.add('key', run, {}, 60)
+        self.debouncer.add('other', run, {}, 60)
+
+        with self.assertLogs('conditioner.dispatch', 'WARNING'):
+            self.assertEqual(self.debouncer.discard(), 2)
+
+        self.debouncer.flush()
+        self.assertFalse(run.called)
+
+    @mock.patch('conditioner.dispatch.atexit.register')
+    @mock.patch('conditioner.dispatch.threading.Thread')
+    def test_pending_actions_are_run_or_discarded_on_exit(self, mocked_thread, mocked_register):
+        """Test that pending actions are run on exit, unless `run_on_exit` isn't set"""
+        debouncer, discarding_debouncer = Debouncer(), Debouncer(run_on_exit=False)
+        debouncer.add('key', mock.Mock(), {}, 60)
+        discarding_debouncer.add('key', mock.Mock(), {}, 60)
+
+        self.assertEqual(
+            [c[0][0] for c in mocked_register.call_args_list], [debouncer.flush, discarding_debouncer.discard],
+        )
+
+    def test_actions_are_run_in_background(self):
+        """Test that background thread runs actions when their window ends"""
+        debouncer = Debouncer()
+        ran = threading.Event()
+
+        debouncer.add('key', ran.set, {}, 0)
+
+        self.assertTrue(ran.wait(5))
+        self.assertNotEqual(debouncer.thread, threading.current_thread())
+
+
+class SignalDispatcherTestCase(TestCase):
+    """
+    Test `conditioner.dispatch.SignalDispatcher` class
+    """
+    def setUp(self):
+        super().setUp()
+        self.dispatcher = SignalDispatcher()
+        self.dispatcher.loaded = True
+        self.addCleanup(self.dispatcher.clear)
+        self.dispatcher.get_cache().delete(RULES_VERSION_CACHE_KEY)
+
+    def is_connected(self, signal, sender):
+        """Helper method that checks if dispatcher receiver is connected to passed signal and sender"""
+        dispatch_uid = self.dispatcher.get_dispatch_uid(signal, sender)
+        return any(lookup_key[0] == dispatch_uid for lookup_key, _ in getattr(signals, signal).receivers)
+
+    def test_dispatcher_connects_single_receiver(self):
+        """Test that a single receiver is connected per signal and sender"""
+        receivers_count = len(signals.post_save.receivers)
+
+        for _ in range(5):
+            self.dispatcher.register('post_save', Group, uuid.uuid4(), mock.Mock())
+
+        self.assertEqual(len(signals.post_save.receivers), receivers_count + 1)
+        self.assertEqual(len(self.dispatcher.get_actions('post_save', Group)), 5)
+
+    def test_dispatcher_runs_registered_actions(self):
+        """Test that only actions registered for sent signal and sender are run"""
+        action, other_signal_action = mock.Mock(), mock.Mock()
+        self.dispatcher.register('post_save', Group, uuid.uuid4(), action)
+        self.dispatcher.register('pre_delete', Group, uuid.uuid4(), other_signal_action)
+
+        instance = Group()
+        signals.post_save.send(sender=Group, instance=instance, created=True)
+
+        action.run_action.assert_called_once_with(
+            signal=signals.post_save, sender=Group, instance=instance, created=True,
+        )
+        self.assertFalse(other_signal_action.run_action.called)
+
+    def test_dispatcher_replaces_action_with_the_same_dispatch_uid(self):
+        """Test that registering the same dispatch ID again replaces the action"""
+        dispatch_uid = uuid.uuid4()
+        old_action, new_action = mock.Mock(), mock.Mock()
+
+        self.dispatcher.register('post_save', Group, dispatch_uid, old_action)
+        self.dispatcher.register('pre_save', Group, dispatch_uid, new_action)
+
+        self.assertEqual(self.dispatcher.get_actions('post_save', Group), [])
+        self.assertEqual(self.dispatcher.get_actions('pre_save', Group), [new_action])
+        self.assertFalse(self.is_connected('post_save', Group))
+
+    def test_dispatcher_disconnects_receiver_without_actions(self):
+        """Test that receiver is disconnected when the last action is unregistered"""
+        dispatch_uids = [uuid.uuid4(), uuid.uuid4()]
+        for dispatch_uid in dispatch_uids:
+            self.dispatcher.register('post_save', Group, dispatch_uid, mock.Mock())
+
+        self.dispatcher.unregister(dispatch_uids[0])
+        self.assertTrue(self.is_connected('post_save', Group))
+
+        self.dispatcher.unregister(dispatch_uids[1])
+        self.assertFalse(self.is_connected('post_save', Group))
+
+        # Unregistering unknown dispatch ID is a no-op
+        self.dispatcher.unregister(uuid.uuid4())
+
+    def test_dispatcher_loads_rules(self):
+        """Test that signal rules with actions are loaded from the database"""
+        condition = ModelSignalConditionFactory(signal='post_save')
+        condition.rule.target_content_type = ContentType.objects.get_for_model(Group)
+        condition.rule.save()
+        action = LoggerActionFactory(rule=condition.rule)
+        ModelSignalConditionFactory(signal='post_save')  # Without action
+
+        self.dispatcher.load()
+
+        self.assertEqual(self.dispatcher.get_actions('post_save', Group), [action])
+        self.assertEqual(len(self.dispatcher.keys), 1)
+
+    @mock.patch('django.db.transaction.on_commit', side_effect=lambda func: func())
+    def test_dispatcher_bump_version_method(self, mocked_on_commit):
+        """Test dispatcher `bump_version()` method"""
+        self.assertIsNone(self.dispatcher.get_version())
+
+        self.dispatcher.bump_version()
+        version = self.dispatcher.get_version()
+        self.assertIsNotNone(version)
+
+        self.dispatcher.bump_version()
+        self.assertNotEqual(self.dispatcher.get_version(), version)
+
+    @override_settings(CONDITIONER_RULES_CHECK_INTERVAL=60)
+    @mock.patch('conditioner.dispatch.SignalDispatcher.load')
+    def test_dispatcher_check_version_method(self, mocked_load):
+        """Test that rules are reloaded when the version changes, at most once per check interval"""
+        self.dispatcher.check_version()
+        self.assertEqual(mocked_load.call_count, 0)
+
+        self.dispatcher.get_cache().set(RULES_VERSION_CACHE_KEY, 'changed')
+        self.dispatcher.check_version()
+        self.assertEqual(mocked_load.call_count, 0)
+
+        self.dispatcher.next_check = 0
+        with CaptureQueriesContext(connection) as queries:
+            self.dispatcher.check_version()
+        self.assertEqual(mocked_load.call_count, 1)
+        self.assertEqual(len(queries), 0)
+
+    @mock.patch.object(dispatcher, 'loaded', True)  # Make sure that only tested dispatcher runs actions
+    @mock.patch('conditioner.actions.misc.LoggerAction.run_action')
+    def test_dispatcher_loads_rules_lazily(self, mocked_run_action):
+        """Test that rules are loaded when the first model signal is sent"""
+        condition = ModelSignalConditionFactory(signal='post_save')
+        condition.rule.target_content_type = ContentType.objects.get_for_model(Group)
+        condition.rule.save()
+        LoggerActionFactory(rule=condition.rule)
+
+        # Lazy load receivers dispatch IDs are the same for all dispatchers
+        dispatcher.disconnect_lazy_load()
+        self.addCleanup(dispatcher.connect_lazy_load)
+
+        self.dispatcher.loaded = False
+        self.dispatcher.connect_lazy_load()
+        self.addCleanup(self.dispatcher.disconnect_lazy_load)
+
+        group = Group.objects.create(name='first')
+        self.assertTrue(self.dispatcher.loaded)
+        mocked_run_action.assert_called_once_with(
+            signal=signals.post_save, sender=Group, instance=group, created=True, update_fields=None, raw=False,
+            using='default', condition_type='ModelSignalCondition',
+        )
+
+        # Lazy load receivers are disconnected and only the dispatcher receiver is called
+        with CaptureQueriesContext(connection) as queries:
+            Group.objects.create(name='second')
+        self.assertEqual(mocked_run_action.call_count, 2)
+        self.assertEqual(len(queries), 1)
+
+    @override_settings(CONDITIONER_LAZY_LOAD_ATTEMPTS=2)
+    @mock.patch.object(dispatcher, 'loaded', True)  # Make sure that only tested dispatcher loads rules
+    def test_dispatcher_stops_loading_rules_lazily_after_failed_attempts(self):
+        """Test that lazy load receivers are disconnected when rules can't be loaded"""
+        dispatcher.disconnect_lazy_load()
+        self.addCleanup(dispatcher.connect_lazy_load)
+
+        self.dispatcher.loaded = False
+        self.dispatcher.connect_lazy_load()
+        self.addCleanup(self.dispatcher.disconnect_lazy_load)
+
+        with mock.patch.object(self.dispatcher, 'load', side_effect=OperationalError) as mocked_load, \
+                self.assertLogs('conditioner.dispatch', 'WARNING'):
+            for name in ('first', 'second', 'third'):
+                self.dispatcher.next_check = 0
+                Group.objects.create(name=name)
+
+        self.assertEqual(mocked_load.call_count, 2)
+        self.assertFalse(self.dispatcher.loaded)
+        self.assertNotIn(
+            'conditioner.lazy_load.post_save', [lookup_key[0] for lookup_key, _ in signals.post_save.receivers]
+        )
+
+    def test_dispatcher_defers_on_commit_actions(self):
+        """Test that actions registered with `on_commit` are deferred"""
+        action, deferred_action = mock.Mock(), mock.Mock()
+        self.dispatcher.register('post_save', Group, uuid.uuid4(), action)
+        self.dispatcher.register('post_save', Group, uuid.uuid4(), deferred_action, on_commit=True)
+
+        with mock.patch('conditioner.dispatch.ActionBatch.defer') as mocked_defer:
+            signals.post_save.send(sender=Group, instance=Group(), created=True, using='default')
+
+        self.assertEqual(action.run_action.call_count, 1)
+        self.assertFalse(deferred_action.run_action.called)
+        self.assertEqual(mocked_defer.call_count, 1)
+        self.assertEqual(mocked_defer.call_args[0][0].func, limiter.call)
+        self.assertEqual(mocked_defer.call_args[0][0].args, (deferred_action.run_action,))
+        self.assertEqual(mocked_defer.call_args[1], {'using': 'default'})
+
+    def test_dispatcher_passes_condition_type(self):
+        """Test that actions registered with `condition_type` get it as a keyword argument"""
+        action, other_action = mock.Mock(), mock.Mock()
+        check = mock.Mock(return_value=True)
+        self.dispatcher.register('post_save', Group, uuid.uuid4(), action, condition_type='ModelSignalCondition')
+        self.dispatcher.register('post_save', Group, uuid.uuid4(), other_action, check=check)
+
+        instance = Group()
+        signals.post_save.send(sender=Group, instance=instance, created=True)
+
+        action.run_action.assert_called_once_with(
+            signal=signals.post_save, sender=Group, instance=instance, created=True,
+            condition_type='ModelSignalCondition',
+        )
+        # Other actions (and checks) get signal keyword arguments only
+        other_action.run_action.assert_called_once_with(
+            signal=signals.post_save, sender=Group, instance=instance, created=True,
+        )
+        check.assert_called_once_with(signal=signals.post_save, sender=Group, instance=instance, created=True)
+
+    def test_dispatcher_passes_condition_type_of_loaded_and_connected_rules(self):
+        """Test that actions of loaded rules and rules connected when saved get their condition class name"""
+        condition = ModelSignalConditionFactory(signal='post_save')
+        condition.rule.target_content_type = ContentType.objects.get_for_model(Group)
+        condition.rule.save()
+        LoggerActionFactory(rule=condition.rule)
+
+        for connect in (self.dispatcher.load, condition.connect_signal):
+            self.dispatcher.clear()
+            with mock.patch('conditioner.conditions.signals.dispatcher', self.dispatcher):
+                connect()
+
+            with self.assertLogs('conditioner.actions.misc', level='DEBUG') as log:
+                Group.objects.create(name=str(connect))
+
+            self.assertEqual([record.condition_type for record in log.records], ['ModelSignalCondition'])
+
+    def test_dispatcher_runs_batch_actions_for_bulk_signals(self):
+        """Test that bulk signals run actions `run_batch_action()` method"""
+        action = mock.Mock()
+        self.dispatcher.register('post_bulk_update', Group, uuid.uuid4(), action)
+
+        instances = [Group(pk=1), Group(pk=2)]
+        bulk_signals.post_bulk_update.send(sender=Group, instances=instances, pks=[1, 2], using='default')
+
+        action.run_batch_action.assert_called_once_with(
+            signal=bulk_signals.post_bulk_update, sender=Group, instances=instances, pks=[1, 2], using='default',
+        )
+        self.assertFalse(action.run_action.called)
+
+    def test_dispatcher_checks_conditions(self):
+        """Test that actions are only run when their check passes"""
+        action = mock.Mock()
+        check = mock.Mock(return_value=False)
+        self.dispatcher.register('post_save', Group, uuid.uuid4(), action, check=check)
+
+        instance = Group()
+        signals.post_save.send(sender=Group, instance=instance, created=True)
+
+        check.assert_called_once_with(signal=signals.post_save, sender=Group, instance=instance, created=True)
+        self.assertFalse(action.run_action.called)
+
+    def test_dispatcher_coalesces_init_actions(self):
+        """Test that coalesced actions are run once per queryset evaluation"""
+        Group.objects.create(name='first')
+        Group.objects.create(name='second')
+
+        action = mock.Mock()
+        self.dispatcher.register('post_init', Group, uuid.uuid4(), action, coalesce=True)
+
+        groups = list(bulk_signals.BulkSignalsQuerySet(model=Group))
+
+        self.assertFalse(action.run_action.called)
+        action.run_batch_action.assert_called_once_with(
+            signal=signals.post_init, sender=Group, instances=groups,
+        )
+
+        # Instances initialized outside of queryset evaluation aren't coalesced
+        group = Group(name='third')
+        action.run_action.assert_called_once_with(signal=signals.post_init, sender=Group, instance=group)
+
+    @mock.patch('django.db.transaction.on_commit', side_effect=lambda func, using=None: func())
+    def test_dispatcher_debounces_actions(self, mocked_on_commit):
+        """Test that repeated signals for the same instance are passed to the debouncer"""
+        self.dispatcher.debouncer = Debouncer(autostart=False)
+        action = mock.Mock()
+        self.dispatcher.register('post_save', Group, uuid.uuid4(), action, on_commit=True, debounce=60)
+
+        group = Group.objects.create(name='first')
+        for _ in range(5):
+            group.save()
+        Group.objects.create(name='second')
+
+        self.assertFalse(action.run_action.called)
+        self.assertEqual(len(self.dispatcher.debouncer.pending), 2)
+
+        self.dispatcher.debouncer.flush()
+        self.assertEqual(action.run_action.call_count, 2)
+        self.assertEqual(mocked_on_commit.call_count, 7)
+
+    @mock.patch('django.db.transaction.on_commit')
+    def test_dispatcher_debounces_immediate_actions_without_waiting_for_commit(self, mocked_on_commit):
+        """Test that debounced actions that aren't deferred are passed to the debouncer when the signal is sent"""
+        self.dispatcher.debouncer = Debouncer(autostart=False)
+        self.dispatcher.register('post_save', Group, uuid.uuid4(), mock.Mock(), debounce=60)
+
+        Group.objects.create(name='first')
+
+        self.assertFalse(mocked_on_commit.called)
+        self.assertEqual(len(self.dispatcher.debouncer.pending), 1)
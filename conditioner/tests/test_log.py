@@ -0,0 +1,124 @@
+"""
+Test 'conditioner.log' file
+"""
+import logging
+import queue
+import threading
+
+from django.test import TestCase
+
+from conditioner.log import DROP_OLDEST, DroppingQueueHandler, QueueLogging
+
+
+class RecordingHandler(logging.Handler):
+    """
+    Logging handler that collects handled records and the threads they were handled in
+    """
+    def __init__(self, level=logging.NOTSET):
+        super().__init__(level)
+        self.records = list()
+        self.threads = set()
+
+    def emit(self, record):
+        self.records.append(record)
+        self.threads.add(threading.current_thread())
+
+
+class DroppingQueueHandlerTestCase(TestCase):
+    """
+    Test `conditioner.log.DroppingQueueHandler` class
+    """
+    def get_record(self, message):
+        return logging.makeLogRecord({'msg': message})
+
+    def test_handler_drops_new_records(self):
+        """Test that new records are dropped when the queue is full"""
+        handler = DroppingQueueHandler(queue.Queue(2))
+        for i in range(3):
+            handler.handle(self.get_record(str(i)))
+
+        self.assertEqual([handler.queue.get_nowait().msg for _ in range(2)], ['0', '1'])
+        self.assertEqual(handler.dropped, 1)
+
+    def test_handler_drops_oldest_records(self):
+        """Test that the oldest records are dropped when the queue is full with `drop_oldest` policy"""
+        handler = DroppingQueueHandler(queue.Queue(2), overflow=DROP_OLDEST)
+        for i in range(3):
+            handler.handle(self.get_record(str(i)))
+
+        self.assertEqual([handler.queue.get_nowait().msg for _ in range(2)], ['1', '2'])
+        self.assertEqual(handler.dropped, 1)
+
+
+class QueueLoggingTestCase(TestCase):
+    """
+    Test `conditioner.log.QueueLogging` class
+    """
+    def setUp(self):
+        super().setUp()
+        self.logger = logging.getLogger('conditioner')
+        self.handler = RecordingHandler()
+        self.warning_handler = RecordingHandler(logging.WARNING)
+
+        previous = (self.logger.handlers, self.logger.propagate, self.logger.level)
+        self.logger.handlers = [self.handler, self.warning_handler]
+        self.logger.propagate = False
+        self.logger.setLevel(logging.DEBUG)
+        self.addCleanup(self.restore_logger, *previous)
+
+        self.log_queue = QueueLogging()
+        self.addCleanup(self.log_queue.stop)
+
+    def restore_logger(self, handlers, propagate, level):
+        self.logger.handlers, self.logger.propagate = handlers, propagate
+        self.logger.setLevel(level)
+
+    def test_queue_passes_records_to_handlers_in_background(self):
+        """Test that records are handled by original handlers in the listener thread"""
+        self.log_queue.start()
+        logging.getLogger('conditioner.actions.misc').info('Message', extra={'rule_id': 1})
+        self.log_queue.stop()
+
+        self.assertEqual([record.getMessage() for record in self.handler.records], ['Message'])
+        self.assertEqual(self.handler.records[0].rule_id, 1)
+        self.assertNotIn(threading.current_thread(), self.handler.threads)
+
+    def test_queue_respects_handlers_levels(self):
+        """Test that records are passed only to handlers whose level they meet"""
+        self.log_queue.start()
+        self.logger.info('Info')
+        self.logger.warning('Warning')
+        self.log_queue.stop()
+
+        self.assertEqual(len(self.handler.records), 2)
+        self.assertEqual([record.getMessage() for record in self.warning_handler.records], ['Warning'])
+
+    def test_queue_restores_handlers(self):
+        """Test that original handlers are restored when the queue is stopped"""
+        self.log_queue.start()
+        self.assertEqual(len(self.logger.handlers), 1)
+        self.assertIsInstance(self.logger.handlers[0], DroppingQueueHandler)
+
+        self.log_queue.stop()
+        self.assertEqual(self.logger.handlers, [self.handler, self.warning_handler])
+        self.assertFalse(self.logger.propagate)
+
+    def test_queue_counts_dropped_records(self):
+        """Test that records dropped because of the full queue are counted and the logging thread isn't blocked"""
+        entered, release = threading.Event(), threading.Event()
+
+        def emit(record):
+            entered.set()
+            release.wait(5)
+
+        self.handler.emit = emit
+        self.log_queue.start(size=1)
+
+        # The listener is blocked by the first record, the second one fills the queue and the rest is dropped
+        self.logger.info('Message')
+        entered.wait(5)
+        for _ in range(3):
+            self.logger.info('Message')
+
+        self.assertEqual(self.log_queue.get_dropped(), 2)
+        release.set()
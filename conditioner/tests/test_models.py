@@ -2,11 +2,18 @@
 Test 'conditioner.models' file
 """
 from django.contrib.contenttypes.models import ContentType
+from django.core.mail import EmailMultiAlternatives
+from django.core.validators import MinValueValidator
 from django.db import models
 from django.test import TestCase
+from django.utils import timezone
 
-from conditioner.models import Rule
-from conditioner.tests.factories import RuleFactory, BaseActionFactory, BaseConditionFactory
+from conditioner import ratelimit
+from conditioner.base import BaseCronCondition
+from conditioner.models import CronConditionExecution, OutboxEmail, Rule
+from conditioner.tests.factories import (
+    RuleFactory, BaseActionFactory, BaseConditionFactory, CronConditionExecutionFactory, OutboxEmailFactory,
+)
 from conditioner.utils import TimeStampedModelMixin
 
 
@@ -39,6 +46,34 @@ class RuleTestCase(TestCase):
         self.assertTrue(field.null)
         self.assertTrue(field.blank)
 
+    def test_model_rate_limit_field(self):
+        """Test model 'rate_limit' field"""
+        field = self.model._meta.get_field('rate_limit')
+
+        self.assertIsInstance(field, models.PositiveIntegerField)
+        self.assertEqual(field.verbose_name, 'rate limit')
+        self.assertTrue(field.null)
+        self.assertTrue(field.blank)
+
+    def test_model_rate_limit_period_field(self):
+        """Test model 'rate_limit_period' field"""
+        field = self.model._meta.get_field('rate_limit_period')
+
+        self.assertIsInstance(field, models.PositiveIntegerField)
+        self.assertEqual(field.verbose_name, 'rate limit period')
+        self.assertEqual(field.default, 60)
+        self.assertIn(MinValueValidator(1), field.validators)
+
+    def test_model_rate_limit_policy_field(self):
+        """Test model 'rate_limit_policy' field"""
+        field = self.model._meta.get_field('rate_limit_policy')
+
+        self.assertIsInstance(field, models.CharField)
+        self.assertEqual(field.verbose_name, 'rate limit policy')
+        self.assertEqual(field.choices, self.model.RATE_LIMIT_POLICY_CHOICES)
+        self.assertEqual(field.default, ratelimit.DROP)
+        self.assertEqual(field.max_length, 64)
+
     def test_model_meta_attributes(self):
         """Test model meta attributes"""
         meta = self.model._meta
@@ -58,3 +93,144 @@ class RuleTestCase(TestCase):
         self.assertIn(str(self.instance.action), str(self.instance))
         self.assertIn(str(self.instance.condition), str(self.instance))
         self.assertIn(str(self.instance.target_model), str(self.instance))
+
+
+class CronConditionExecutionTestCase(TestCase):
+    """
+    Test `conditioner.CronConditionExecution` model
+    """
+    def setUp(self):
+        super().setUp()
+        self.model = CronConditionExecution
+        self.instance = CronConditionExecutionFactory()
+
+    def test_model_inheritance(self):
+        """Test model inheritance"""
+        self.assertIsInstance(self.instance, models.Model)
+
+    def test_model_condition_field(self):
+        """Test model 'condition' field"""
+        field = self.model._meta.get_field('condition')
+
+        self.assertIsInstance(field, models.ForeignKey)
+        self.assertEqual(field.rel.model, BaseCronCondition)
+        self.assertEqual(field.rel.related_name, 'executions')
+        self.assertEqual(field.verbose_name, 'condition')
+
+    def test_model_object_pk_field(self):
+        """Test model 'object_pk' field"""
+        field = self.model._meta.get_field('object_pk')
+
+        self.assertIsInstance(field, models.CharField)
+        self.assertEqual(field.verbose_name, 'object primary key')
+        self.assertEqual(field.max_length, 64)
+
+    def test_model_executed_field(self):
+        """Test model 'executed' field"""
+        field = self.model._meta.get_field('executed')
+
+        self.assertIsInstance(field, models.DateTimeField)
+        self.assertEqual(field.verbose_name, 'executed')
+
+    def test_model_meta_attributes(self):
+        """Test model meta attributes"""
+        meta = self.model._meta
+
+        self.assertEqual(meta.verbose_name, 'cron condition execution')
+        self.assertEqual(meta.verbose_name_plural, 'cron condition executions')
+        self.assertEqual(meta.unique_together, (('condition', 'object_pk'),))
+
+    def test_model_str_method(self):
+        """Test model `__str__` method"""
+        self.assertIn(str(self.instance.condition_id), str(self.instance))
+        self.assertIn(self.instance.object_pk, str(self.instance))
+
+
+class OutboxEmailTestCase(TestCase):
+    """
+    Test `conditioner.OutboxEmail` model
+    """
+    def setUp(self):
+        super().setUp()
+        self.model = OutboxEmail
+        self.instance = OutboxEmailFactory()
+
+    def test_model_inheritance(self):
+        """Test model inheritance"""
+        self.assertIsInstance(self.instance, models.Model)
+
+    def test_model_rule_field(self):
+        """Test model 'rule' field"""
+        field = self.model._meta.get_field('rule')
+
+        self.assertIsInstance(field, models.ForeignKey)
+        self.assertEqual(field.rel.model, Rule)
+        self.assertEqual(field.rel.related_name, 'outbox_emails')
+        self.assertEqual(field.verbose_name, 'rule')
+        self.assertTrue(field.null)
+
+    def test_model_status_field(self):
+        """Test model 'status' field"""
+        field = self.model._meta.get_field('status')
+
+        self.assertIsInstance(field, models.CharField)
+        self.assertEqual(field.verbose_name, 'status')
+        self.assertEqual(field.choices, self.model.STATUS_CHOICES)
+        self.assertEqual(field.default, self.model.PENDING)
+
+    def test_model_attempts_field(self):
+        """Test model 'attempts' field"""
+        field = self.model._meta.get_field('attempts')
+
+        self.assertIsInstance(field, models.PositiveIntegerField)
+        self.assertEqual(field.verbose_name, 'attempts')
+        self.assertEqual(field.default, 0)
+
+    def test_model_next_attempt_at_field(self):
+        """Test model 'next_attempt_at' field"""
+        field = self.model._meta.get_field('next_attempt_at')
+
+        self.assertIsInstance(field, models.DateTimeField)
+        self.assertEqual(field.verbose_name, 'next attempt at')
+        self.assertEqual(field.default, timezone.now)
+
+    def test_model_meta_attributes(self):
+        """Test model meta attributes"""
+        meta = self.model._meta
+
+        self.assertEqual(meta.verbose_name, 'outbox email')
+        self.assertEqual(meta.verbose_name_plural, 'outbox emails')
+        self.assertEqual(meta.index_together, (('status', 'next_attempt_at'),))
+
+    def test_model_from_message_method(self):
+        """Test model `from_message()` method"""
+        message = EmailMultiAlternatives(
+            subject='Subject', body='Body', from_email='from@example.com', to=['a@example.com', 'b@example.com'],
+        )
+        message.attach_alternative('<p>Body</p>', 'text/html')
+
+        instance = self.model.from_message(message, rule_id=1)
+
+        self.assertEqual(instance.subject, 'Subject')
+        self.assertEqual(instance.body, 'Body')
+        self.assertEqual(instance.html_body, '<p>Body</p>')
+        self.assertEqual(instance.from_email, 'from@example.com')
+        self.assertEqual(instance.to, 'a@example.com,b@example.com')
+        self.assertEqual(instance.rule_id, 1)
+
+    def test_model_get_message_method(self):
+        """Test model `get_message()` method"""
+        self.instance.html_body = '<p>Body</p>'
+
+        message = self.instance.get_message()
+
+        self.assertEqual(message.subject, self.instance.subject)
+        self.assertEqual(message.body, self.instance.body)
+        self.assertEqual(message.from_email, self.instance.from_email)
+        self.assertEqual(message.to, [self.instance.to])
+        self.assertEqual(message.alternatives, [('<p>Body</p>', 'text/html')])
+
+    def test_model_str_method(self):
+        """Test model `__str__` method"""
+        self.assertIn(self.instance.subject, str(self.instance))
+        self.assertIn(self.instance.to, str(self.instance))
@@ -0,0 +1,260 @@
+"""
+Test 'conditioner.ratelimit' file
+"""
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from conditioner import ratelimit
+from conditioner.ratelimit import CacheTokenBucket, RateLimiter, TokenBucket
+from conditioner.tests.actions.factories import LoggerActionFactory
+
+
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'ratelimit': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'ratelimit'},
+}
+
+
+class TokenBucketTestCase(TestCase):
+    """
+    Test `conditioner.ratelimit.TokenBucket` class
+    """
+    def test_bucket_allows_limit_runs(self):
+        """Test that bucket allows `limit` runs and then refuses the next one"""
+        bucket = TokenBucket(3, 60)
+
+        self.assertEqual([bucket.acquire() for _ in range(3)], [0, 0, 0])
+        self.assertIsNone(bucket.acquire())
+
+    def test_bucket_reserves_tokens_in_order(self):
+        """Test that reserved tokens return increasing waits"""
+        bucket = TokenBucket(1, 60)
+        bucket.acquire()
+
+        self.assertAlmostEqual(bucket.acquire(reserve=True), 60, delta=1)
+        self.assertAlmostEqual(bucket.acquire(reserve=True), 120, delta=1)
+
+    def test_bucket_is_refilled(self):
+        """Test that tokens are refilled with passing time"""
+        bucket = TokenBucket(2, 60)
+        bucket.acquire()
+        bucket.acquire()
+
+        bucket.updated -= 30
+        self.assertEqual(bucket.acquire(), 0)
+        self.assertIsNone(bucket.acquire())
+
+    def test_bucket_release_method(self):
+        """Test bucket `release()` method gives back a token, up to the capacity"""
+        bucket = TokenBucket(1, 60)
+        bucket.release()
+        bucket.acquire()
+
+        self.assertIsNone(bucket.acquire())
+        bucket.release()
+        self.assertEqual(bucket.acquire(), 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CacheTokenBucketTestCase(TestCase):
+    """
+    Test `conditioner.ratelimit.CacheTokenBucket` class
+    """
+    def setUp(self):
+        super().setUp()
+        self.cache = caches['ratelimit']
+        self.cache.clear()
+
+    def test_bucket_allows_limit_runs(self):
+        """Test that bucket allows `limit` runs per window and then refuses the next one"""
+        bucket = CacheTokenBucket(2, 60, 'test', self.cache)
+
+        with mock.patch('conditioner.ratelimit.time.time', return_value=600):
+            self.assertEqual([bucket.acquire(), bucket.acquire()], [0, 0])
+            self.assertIsNone(bucket.acquire())
+
+    def test_bucket_is_shared(self):
+        """Test that buckets with the same key share tokens"""
+        bucket = CacheTokenBucket(1, 60, 'test', self.cache)
+        other_bucket = CacheTokenBucket(1, 60, 'test', self.cache)
+
+        with mock.patch('conditioner.ratelimit.time.time', return_value=600):
+            self.assertEqual(bucket.acquire(), 0)
+            self.assertIsNone(other_bucket.acquire())
+
+    def test_bucket_reserves_next_window(self):
+        """Test that reservations take the next window with free tokens"""
+        bucket = CacheTokenBucket(1, 60, 'test', self.cache)
+
+        with mock.patch('conditioner.ratelimit.time.time', return_value=610):
+            bucket.acquire()
+            self.assertEqual(bucket.acquire(reserve=True), 50)
+            self.assertEqual(bucket.acquire(reserve=True), 110)
+
+    def test_bucket_release_method(self):
+        """Test bucket `release()` method gives back the last token taken by the thread"""
+        bucket = CacheTokenBucket(1, 60, 'test', self.cache)
+
+        with mock.patch('conditioner.ratelimit.time.time', return_value=600):
+            bucket.acquire()
+            bucket.release()
+            bucket.release()  # Nothing to give back
+
+            self.assertEqual(bucket.acquire(), 0)
+            self.assertIsNone(bucket.acquire())
+
+            # Counter of the window expired
+            self.cache.clear()
+            bucket.release()
+
+
+class RateLimiterTestCase(TestCase):
+    """
+    Test `conditioner.ratelimit.RateLimiter` class
+    """
+    def setUp(self):
+        super().setUp()
+        self.limiter = RateLimiter()
+        self.action = LoggerActionFactory()
+        self.rule = self.action.rule
+
+    def set_rule_limit(self, limit, policy=ratelimit.DROP):
+        self.rule.rate_limit = limit
+        self.rule.rate_limit_policy = policy
+        self.rule.save()
+
+    def test_limiter_runs_actions_without_limits(self):
+        """Test that actions without limits are always run"""
+        with mock.patch.object(self.action, 'run_action') as mocked_run_action:
+            for _ in range(10):
+                self.assertEqual(self.limiter.call(self.action.run_action, 'instance', key='value'), ratelimit.RUN)
+
+        self.assertEqual(mocked_run_action.call_count, 10)
+        self.assertEqual(mocked_run_action.call_args, mock.call('instance', key='value'))
+
+    def test_limiter_drops_excess_runs(self):
+        """Test that runs over rule limit are dropped and counted"""
+        self.set_rule_limit(2)
+
+        run = mock.Mock(__self__=self.action)
+
+        results = [self.limiter.call(run) for _ in range(5)]
+
+        self.assertEqual(results, [ratelimit.RUN] * 2 + [ratelimit.DROPPED] * 3)
+        self.assertEqual(run.call_count, 2)
+        self.assertEqual(self.limiter.get_counters(), {'rule:{}'.format(self.rule.pk): {'dropped': 3}})
+
+    def test_limiter_delays_excess_runs(self):
+        """Test that runs over rule limit with delay policy wait for a token"""
+        self.set_rule_limit(1, ratelimit.DELAY)
+        run = mock.Mock(__self__=self.action)
+
+        with mock.patch('conditioner.ratelimit.time.sleep') as mocked_sleep:
+            self.limiter.call(run)
+            self.assertEqual(self.limiter.call(run), ratelimit.RUN)
+
+        self.assertEqual(run.call_count, 2)
+        self.assertEqual(mocked_sleep.call_count, 1)
+        self.assertAlmostEqual(mocked_sleep.call_args[0][0], 60, delta=1)
+        self.assertEqual(self.limiter.get_counters(), {'rule:{}'.format(self.rule.pk): {'delayed': 1}})
+
+    def test_limiter_queues_excess_runs(self):
+        """Test that runs over rule limit with queue policy are passed to the background queue"""
+        self.set_rule_limit(1, ratelimit.QUEUE)
+        run = mock.Mock(__self__=self.action)
+        self.limiter.queue = mock.Mock()
+
+        self.limiter.call(run, 'instance', key='value')
+        self.assertEqual(self.limiter.call(run, 'instance', key='value'), ratelimit.QUEUED)
+
+        self.assertEqual(run.call_count, 1)
+        self.assertEqual(self.limiter.queue.add.call_count, 1)
+        _, queued_run, kwargs, wait = self.limiter.queue.add.call_args[0]
+        self.assertEqual(kwargs, {'key': 'value'})
+        self.assertAlmostEqual(wait, 60, delta=1)
+
+        queued_run(**kwargs)
+        self.assertEqual(run.call_count, 2)
+        self.assertEqual(run.call_args, mock.call('instance', key='value'))
+        self.assertEqual(self.limiter.get_counters(), {'rule:{}'.format(self.rule.pk): {'queued': 1}})
+
+    def test_limiter_delays_queued_runs_when_queue_is_disabled(self):
+        """Test that runs over rule limit with queue policy are delayed if they can't be queued"""
+        self.set_rule_limit(1, ratelimit.QUEUE)
+        run = mock.Mock(__self__=self.action)
+        self.limiter.queue = mock.Mock()
+
+        with mock.patch('conditioner.ratelimit.time.sleep') as mocked_sleep:
+            self.limiter.throttle(run, ('instance',), {}, queue=False)
+            self.assertEqual(self.limiter.throttle(run, ('instance',), {}, queue=False), ratelimit.RUN)
+
+        self.assertEqual(run.call_count, 2)
+        self.assertEqual(mocked_sleep.call_count, 1)
+        self.assertFalse(self.limiter.queue.add.called)
+        self.assertEqual(self.limiter.get_counters(), {'rule:{}'.format(self.rule.pk): {'delayed': 1}})
+
+    def test_limiter_queue_discards_runs_on_exit(self):
+        """Test that queued runs aren't all run at once when the process exits"""
+        self.assertFalse(self.limiter.get_queue().run_on_exit)
+
+    @override_settings(CONDITIONER_RATE_LIMITS={'conditioner.LoggerAction': {'limit': 1}})
+    def test_limiter_limits_action_classes(self):
+        """Test that per action class limits are shared by all actions of the class"""
+        other_action = LoggerActionFactory()
+        run, other_run = mock.Mock(__self__=self.action), mock.Mock(__self__=other_action)
+
+        self.limiter.call(run)
+        self.limiter.call(other_run)
+
+        self.assertEqual(run.call_count, 1)
+        self.assertFalse(other_run.called)
+        self.assertEqual(self.limiter.get_counters(), {'action:conditioner.LoggerAction': {'dropped': 1}})
+
+    @override_settings(CONDITIONER_RATE_LIMITS={'conditioner.LoggerAction': {'limit': 1}})
+    def test_limiter_dropped_runs_dont_use_up_tokens(self):
+        """Test that runs dropped by one limit don't take tokens of the other ones"""
+        self.set_rule_limit(2)
+        run = mock.Mock(__self__=self.action)
+
+        self.assertEqual(self.limiter.call(run), ratelimit.RUN)
+        # Dropped by the action class limit, after the rule limit token was taken
+        self.assertEqual(self.limiter.call(run), ratelimit.DROPPED)
+
+        # Once the action class limit allows it, the rule limit token is still available
+        self.limiter.get_bucket('action:conditioner.LoggerAction', 1, 60).release()
+        self.assertEqual(self.limiter.call(run), ratelimit.RUN)
+        self.assertEqual(run.call_count, 2)
+
+    @override_settings(CACHES=LOCMEM_CACHES, CONDITIONER_RATE_LIMIT_CACHE='ratelimit')
+    def test_limiter_uses_cache_buckets(self):
+        """Test that `CONDITIONER_RATE_LIMIT_CACHE` setting selects shared buckets"""
+        self.set_rule_limit(1)
+
+        bucket = self.limiter.get_bucket(*self.limiter.get_limits(self.action)[0][:3])
+        self.assertIsInstance(bucket, CacheTokenBucket)
+        self.assertIs(bucket.cache, caches['ratelimit'])
+
+    def test_limiter_guards_against_zero_periods(self):
+        """Test that a zero period (i.e. saved before it was validated) doesn't break the action"""
+        self.set_rule_limit(1)
+        self.rule.rate_limit_period = 0
+        self.rule.save()
+        run = mock.Mock(__self__=self.action)
+
+        self.assertEqual(self.limiter.call(run), ratelimit.RUN)
+        self.assertEqual(self.limiter.call(run), ratelimit.DROPPED)
+
+    def test_limiter_reset(self):
+        """Test that `reset()` removes buckets and counters"""
+        self.set_rule_limit(1)
+        run = mock.Mock(__self__=self.action)
+        self.limiter.call(run)
+        self.limiter.call(run)
+
+        self.limiter.reset()
+        self.limiter.call(run)
+
+        self.assertEqual(run.call_count, 2)
+        self.assertEqual(self.limiter.get_counters(), {})
@@ -0,0 +1,142 @@
+"""
+Test 'conditioner.signals' file
+"""
+from unittest import mock
+
+from django.contrib.auth.models import Group, Permission
+from django.db import connection
+from django.db.models import Value, signals
+from django.db.models.functions import Concat
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from conditioner.dispatch import dispatcher
+from conditioner.signals import (
+    BulkSignalsQuerySet, FetchBatch, post_bulk_create, post_bulk_delete, post_bulk_update,
+)
+
+
+class FetchBatchTestCase(TestCase):
+    """
+    Test `conditioner.signals.FetchBatch` class
+    """
+    def test_batch_collects_instances(self):
+        """Test that batch callbacks are called with collected instances when the batch is finished"""
+        callback = mock.Mock()
+
+        with FetchBatch(Group) as batch:
+            self.assertIs(FetchBatch.get_current(Group), batch)
+            self.assertIsNone(batch.get('key'))
+
+            batch.add('key', callback).append(1)
+            batch.get('key').append(2)
+            self.assertFalse(callback.called)
+
+        callback.assert_called_once_with([1, 2])
+        self.assertIsNone(FetchBatch.get_current(Group))
+
+    def test_batches_can_be_nested(self):
+        """Test that the innermost batch of a given model is current"""
+        with FetchBatch(Group) as outer_batch:
+            with FetchBatch(Permission) as inner_batch:
+                self.assertIs(FetchBatch.get_current(Group), outer_batch)
+                self.assertIs(FetchBatch.get_current(Permission), inner_batch)
+
+    def test_batch_is_discarded_on_exception(self):
+        """Test that batch callbacks aren't called when queryset evaluation fails"""
+        callback = mock.Mock()
+
+        with self.assertRaises(ValueError):
+            with FetchBatch(Group) as batch:
+                batch.add('key', callback)
+                raise ValueError
+
+        self.assertFalse(callback.called)
+
+
+class BulkSignalsQuerySetMixinTestCase(TestCase):
+    """
+    Test `conditioner.signals.BulkSignalsQuerySetMixin` queryset mixin
+    """
+    def setUp(self):
+        super().setUp()
+        self.queryset = BulkSignalsQuerySet(model=Group)
+        self.queryset.bulk_signals_chunk_size = 2
+
+        # Make sure that only receivers connected in tests are called
+        dispatcher.disconnect_lazy_load()
+        self.addCleanup(dispatcher.connect_lazy_load)
+
+    def connect(self, signal):
+        """Helper method for connecting a mocked receiver to passed signal"""
+        receiver = mock.Mock()
+        signal.connect(receiver, sender=Group, weak=False)
+        self.addCleanup(signal.disconnect, receiver, sender=Group)
+        return receiver
+
+    def test_bulk_create_method(self):
+        """Test queryset `bulk_create()` method"""
+        receiver = self.connect(post_bulk_create)
+
+        Group.objects.create(name='existing')
+        groups = self.queryset.bulk_create([Group(name='first'), Group(name='second')])
+
+        pks = [Group.objects.get(name=name).pk for name in ('first', 'second')]
+        self.assertEqual([group.pk for group in groups], pks)
+        receiver.assert_called_once_with(
+            signal=post_bulk_create, sender=Group, instances=groups, pks=pks, using='default',
+        )
+
+    def test_update_method(self):
+        """Test queryset `update()` method"""
+        groups = [Group.objects.create(name=name) for name in ('first', 'second', 'third', 'other')]
+        receiver = self.connect(post_bulk_update)
+
+        # Updated field is used in the filter, so instances are looked up by primary keys
+        rows = self.queryset.filter(name__in=['first', 'second', 'third']).update(name=Concat('name', Value('!')))
+
+        self.assertEqual(rows, 3)
+        self.assertEqual(receiver.call_count, 1)
+        kwargs = receiver.call_args[1]
+        self.assertEqual(sorted(kwargs['pks']), [group.pk for group in groups[:3]])
+        self.assertEqual(sorted(kwargs['instances'], key=lambda group: group.pk), groups[:3])
+        self.assertEqual({group.name for group in kwargs['instances']}, {'first!', 'second!', 'third!'})
+
+    def test_delete_method(self):
+        """Test queryset `delete()` method"""
+        groups = [Group.objects.create(name=name) for name in ('first', 'second')]
+        receiver = self.connect(post_bulk_delete)
+
+        self.queryset.all().delete()
+
+        self.assertFalse(Group.objects.exists())
+        self.assertEqual(receiver.call_count, 1)
+        kwargs = receiver.call_args[1]
+        self.assertEqual(kwargs['pks'], [group.pk for group in groups])
+        self.assertEqual([group.name for group in kwargs['instances']], ['first', 'second'])
+
+    def test_methods_without_receivers(self):
+        """Test that no additional queries are run if there are no receivers"""
+        Group.objects.create(name='first')
+
+        with CaptureQueriesContext(connection) as queries:
+            self.queryset.filter(name='first').update(name='updated')
+        self.assertEqual(len(queries), 1)
+
+    def test_queryset_evaluation_is_batched(self):
+        """Test that instances initialized while a queryset is evaluated are collected in a batch"""
+        Group.objects.create(name='first')
+        Group.objects.create(name='second')
+        batches = list()
+
+        def receiver(instance, **kwargs):
+            batches.append(FetchBatch.get_current(Group))
+
+        signals.post_init.connect(receiver, sender=Group, weak=False)
+        self.addCleanup(signals.post_init.disconnect, receiver, sender=Group)
+
+        list(self.queryset.all())
+
+        self.assertEqual(len(batches), 2)
+        self.assertIsNotNone(batches[0])
+        self.assertIs(batches[0], batches[1])
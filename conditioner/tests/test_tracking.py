@@ -0,0 +1,70 @@
+"""
+Test 'conditioner.tracking' file
+"""
+import uuid
+
+from django.contrib.auth.models import Group, Permission
+from django.db.models import signals
+from django.test import TestCase
+
+from conditioner.tracking import SNAPSHOT_ATTR, ChangeTracker
+
+
+class ChangeTrackerTestCase(TestCase):
+    """
+    Test `conditioner.tracking.ChangeTracker` class
+    """
+    def setUp(self):
+        super().setUp()
+        self.tracker = ChangeTracker()
+        self.addCleanup(self.tracker.clear)
+
+    def is_connected(self, signal, model):
+        """Helper method that checks if tracker receiver is connected to passed signal and model"""
+        dispatch_uid = self.tracker.get_dispatch_uid(model)
+        return any(lookup_key[0] == dispatch_uid for lookup_key, _ in signal.receivers)
+
+    def test_tracker_connects_only_tracked_models(self):
+        """Test that receivers are connected only for models with watched fields"""
+        dispatch_uid = uuid.uuid4()
+        self.tracker.track(dispatch_uid, Group, 'name')
+
+        self.assertTrue(self.is_connected(signals.post_init, Group))
+        self.assertTrue(self.is_connected(signals.pre_save, Group))
+        self.assertFalse(self.is_connected(signals.post_init, Permission))
+
+        self.tracker.untrack(dispatch_uid)
+        self.assertFalse(self.is_connected(signals.post_init, Group))
+        self.assertFalse(self.is_connected(signals.pre_save, Group))
+
+    def test_tracker_ignores_missing_fields(self):
+        """Test that fields that don't exist aren't watched"""
+        self.tracker.track(uuid.uuid4(), Group, 'missing')
+
+        self.assertEqual(self.tracker.fields, {})
+
+    def test_tracker_snapshots_only_watched_fields(self):
+        """Test that only watched fields values are copied"""
+        self.tracker.sync([(uuid.uuid4(), Group, 'name')])
+
+        group = Group(name='first')
+        self.assertEqual(getattr(group, SNAPSHOT_ATTR), {'name': 'first'})
+
+        # Deferred fields aren't tracked
+        Group.objects.create(name='second')
+        group = Group.objects.only('pk').get(name='second')
+        self.assertEqual(getattr(group, SNAPSHOT_ATTR), {})
+
+    def test_tracker_marks_changed_fields(self):
+        """Test that changed fields are marked when the instance is saved"""
+        self.tracker.sync([(uuid.uuid4(), Group, 'name')])
+
+        group = Group.objects.create(name='first')
+        self.assertFalse(self.tracker.has_changed(group, 'name'))
+
+        group.name = 'second'
+        group.save()
+        self.assertTrue(self.tracker.has_changed(group, 'name'))
+
+        group.save()
+        self.assertFalse(self.tracker.has_changed(group, 'name'))
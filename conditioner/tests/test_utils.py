@@ -1,12 +1,18 @@
 """
 Test 'conditioner.utils' file
 """
+import os
+import shutil
+import tempfile
 from unittest import mock
 
 from django.db import models
-from django.test import TestCase
+from django.core.cache import caches
+from django.test import TestCase, override_settings
 
-from conditioner.utils import TimeStampedModelMixin, get_available_templates
+from conditioner.utils import (
+    TemplateCatalogue, TimeStampedModelMixin, find_templates, get_available_templates, template_catalogue,
+)
 
 
 class TimeStampedModelMixinTestCase(TestCase):
@@ -52,6 +58,9 @@ class GetAvailableTemplatesTestCase(TestCase):
     """
     Test 'conditioner.utils.get_available_templates` function
     """
+    def setUp(self):
+        super().setUp()
+        template_catalogue.clear()
 
     @mock.patch('os.path.isfile')
     @mock.patch('glob.glob')
@@ -71,3 +80,69 @@ class GetAvailableTemplatesTestCase(TestCase):
         self.assertEqual(templates, expected_templates)
         self.assertEqual(mocked_is_file.call_count, 2)
         self.assertEqual(mocked_glob.call_count, 1)
+
+
+@mock.patch('conditioner.utils.get_app_template_dirs')
+class TemplateCatalogueTestCase(TestCase):
+    """
+    Test `conditioner.utils.TemplateCatalogue` class
+    """
+    def setUp(self):
+        super().setUp()
+        self.dir = os.path.join(tempfile.mkdtemp(), 'templates')
+        os.mkdir(self.dir)
+        self.addCleanup(shutil.rmtree, os.path.dirname(self.dir))
+
+        self.catalogue = TemplateCatalogue()
+
+    def add_template(self, name, mtime):
+        open(os.path.join(self.dir, name), 'w').close()
+        os.utime(self.dir, (mtime, mtime))
+
+    def test_catalogue_is_built_once(self, mocked_get_app_template_dirs):
+        """Test that templates are looked up only once while directories don't change"""
+        mocked_get_app_template_dirs.return_value = [self.dir]
+        self.add_template('email.txt', 1000)
+
+        with mock.patch('conditioner.utils.find_templates', wraps=find_templates) as mocked_find_templates:
+            self.assertEqual(self.catalogue.get('emails/'), [('email.txt', 'email (txt)')])
+            self.assertEqual(self.catalogue.get('emails/'), [('email.txt', 'email (txt)')])
+
+        self.assertEqual(mocked_find_templates.call_count, 1)
+
+    def test_catalogue_is_refreshed_when_directory_changes(self, mocked_get_app_template_dirs):
+        """Test that templates are looked up again when directory modification time changes"""
+        mocked_get_app_template_dirs.return_value = [self.dir]
+        self.add_template('email.txt', 1000)
+        self.catalogue.get('emails/')
+
+        self.add_template('email.html', 2000)
+        self.assertEqual(self.catalogue.get('emails/'), [('email.txt', 'email (txt + html)')])
+
+    def test_catalogue_clear(self, mocked_get_app_template_dirs):
+        """Test that `clear()` removes catalogued templates"""
+        mocked_get_app_template_dirs.return_value = [self.dir]
+        self.add_template('email.txt', 1000)
+        self.catalogue.get('emails/')
+
+        self.add_template('email.html', 1000)
+        self.assertEqual(self.catalogue.get('emails/'), [('email.txt', 'email (txt)')])
+
+        self.catalogue.clear()
+        self.assertEqual(self.catalogue.get('emails/'), [('email.txt', 'email (txt + html)')])
+
+    @override_settings(
+        CACHES={'templates': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+        CONDITIONER_TEMPLATES_CACHE='templates',
+    )
+    def test_catalogue_uses_shared_cache(self, mocked_get_app_template_dirs):
+        """Test that catalogue stored in the shared cache is used by other processes"""
+        mocked_get_app_template_dirs.return_value = [self.dir]
+        caches['templates'].clear()
+        self.add_template('email.txt', 1000)
+        self.catalogue.get('emails/')
+
+        with mock.patch('conditioner.utils.find_templates') as mocked_find_templates:
+            self.assertEqual(TemplateCatalogue().get('emails/'), [('email.txt', 'email (txt)')])
+
+        self.assertFalse(mocked_find_templates.called)
@@ -0,0 +1,147 @@
+"""
+Conditioner module model fields changes tracking
+"""
+import threading
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import signals
+
+
+SNAPSHOT_ATTR = '_conditioner_snapshot'
+CHANGED_ATTR = '_conditioner_changed'
+
+
+class ChangeTracker(object):
+    """
+    Tracks changes of watched model fields, so field change conditions can tell if a field was changed when the
+    instance is saved
+
+    Only models with watched fields get `post_init` and `pre_save` receivers (other models aren't affected at all) and
+    only watched fields values are copied when an instance is initialized. Fields that weren't loaded (i.e. deferred
+    with `only()`) aren't tracked.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        # model -> watched fields attribute names, replaced (and not modified) on change
+        self.fields = dict()
+        # dispatch ID -> (model, watched field attribute name)
+        self.keys = dict()
+
+    def track(self, dispatch_uid, model, field_name):
+        """
+        Starts watching passed model field (replacing the field previously watched with the same dispatch ID)
+        """
+        with self.lock:
+            keys = dict(self.keys)
+            attname = self.get_attname(model, field_name)
+            if attname:
+                keys[dispatch_uid] = (model, attname)
+            else:
+                keys.pop(dispatch_uid, None)
+            self._update(keys)
+
+    def untrack(self, dispatch_uid):
+        """
+        Stops watching the field with passed dispatch ID
+        """
+        with self.lock:
+            keys = dict(self.keys)
+            if keys.pop(dispatch_uid, None) is not None:
+                self._update(keys)
+
+    def sync(self, registrations):
+        """
+        Replaces watched fields with passed `(dispatch ID, model, field name)` tuples
+        """
+        keys = dict()
+        for dispatch_uid, model, field_name in registrations:
+            attname = self.get_attname(model, field_name)
+            if attname:
+                keys[dispatch_uid] = (model, attname)
+
+        with self.lock:
+            self._update(keys)
+
+    def clear(self):
+        """
+        Stops watching all fields and disconnects all receivers
+        """
+        self.sync([])
+
+    @staticmethod
+    def get_attname(model, field_name):
+        """
+        Returns attribute name of passed model field or `None` if it doesn't exist
+        """
+        if model is None:
+            return None
+
+        try:
+            return model._meta.get_field(field_name).attname
+        except FieldDoesNotExist:
+            return None
+
+    @staticmethod
+    def has_changed(instance, attname):
+        """
+        Returns if passed instance field was changed when it was saved the last time
+        """
+        return attname in getattr(instance, CHANGED_ATTR, ())
+
+    def get_post_init_receiver(self, model):
+        """
+        Returns `post_init` receiver that copies watched fields values
+        """
+        def receiver(instance, **kwargs):
+            values = instance.__dict__
+            values[SNAPSHOT_ATTR] = {
+                attname: values[attname] for attname in self.fields.get(model, ()) if attname in values
+            }
+
+        return receiver
+
+    def get_pre_save_receiver(self, model):
+        """
+        Returns `pre_save` receiver that compares watched fields values with their copies and marks changed fields
+        """
+        def receiver(instance, **kwargs):
+            values = instance.__dict__
+            snapshot = values.get(SNAPSHOT_ATTR, {})
+
+            values[CHANGED_ATTR] = frozenset(
+                attname for attname, value in snapshot.items() if values.get(attname, value) != value
+            )
+            values[SNAPSHOT_ATTR] = {
+                attname: values[attname] for attname in self.fields.get(model, ()) if attname in values
+            }
+
+        return receiver
+
+    def _update(self, keys):
+        fields = dict()
+        for model, attname in keys.values():
+            fields.setdefault(model, set()).add(attname)
+        fields = {model: tuple(sorted(attnames)) for model, attnames in fields.items()}
+
+        for model in set(self.fields) - set(fields):
+            for signal in (signals.post_init, signals.pre_save):
+                signal.disconnect(sender=model, dispatch_uid=self.get_dispatch_uid(model))
+        for model in set(fields) - set(self.fields):
+            signals.post_init.connect(
+                self.get_post_init_receiver(model), sender=model, dispatch_uid=self.get_dispatch_uid(model),
+                weak=False,
+            )
+            signals.pre_save.connect(
+                self.get_pre_save_receiver(model), sender=model, dispatch_uid=self.get_dispatch_uid(model),
+                weak=False,
+            )
+
+        self.fields = fields
+        self.keys = keys
+
+    @staticmethod
+    def get_dispatch_uid(model):
+        return 'conditioner.track.{0.app_label}.{0.model_name}'.format(model._meta)
+
+
+tracker = ChangeTracker()
@@ -3,7 +3,10 @@ Conditioner module related utils
 """
 import glob
 import os
+import threading
 
+from django.conf import settings
+from django.core.cache import caches
 from django.db import models
 from django.template.utils import get_app_template_dirs
 
@@ -33,16 +36,87 @@ class TimeStampedModelMixin(models.Model):
         ordering = ('-modified', '-created')
 
 
-def get_available_templates(template_dir):
+class TemplateCatalogue(object):
+    """
+    Catalogue of available email templates, built once per templates directory and kept in process memory (and
+    optionally in a shared Django cache selected with `CONDITIONER_TEMPLATES_CACHE` setting)
+
+    Templates are looked up again only when modification time of any of the app templates directories changes, which
+    happens when a template is added, removed or renamed.
     """
-    Helper method for returning a list of available email templates. Template needs to be a `*.txt` file and can have
-    a HTML counterpart.
+    cache_key = 'conditioner:templates:{}'
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # templates directory -> (directories modification times, templates)
+        self.entries = dict()
+
+    def get(self, template_dir):
+        """
+        Returns list of available email templates in passed templates directory of all apps
+        """
+        dirs = get_app_template_dirs(template_dir)
+        mtimes = self.get_mtimes(dirs)
+
+        entry = self.entries.get(template_dir)
+        if entry is not None and entry[0] == mtimes:
+            return entry[1]
+
+        cache = self.get_cache()
+        if cache is not None:
+            entry = cache.get(self.cache_key.format(template_dir))
+            if entry is not None and entry[0] == mtimes:
+                with self.lock:
+                    self.entries[template_dir] = entry
+                return entry[1]
+
+        entry = (mtimes, find_templates(dirs))
+        with self.lock:
+            self.entries[template_dir] = entry
+        if cache is not None:
+            cache.set(self.cache_key.format(template_dir), entry, None)
+        return entry[1]
+
+    @staticmethod
+    def get_mtimes(dirs):
+        """
+        Returns modification times of passed directories (`None` for directories that don't exist)
+        """
+        mtimes = list()
+        for path in dirs:
+            try:
+                mtimes.append(os.path.getmtime(path))
+            except OSError:
+                mtimes.append(None)
+        return tuple(mtimes)
+
+    @staticmethod
+    def get_cache():
+        """
+        Returns shared cache selected with `CONDITIONER_TEMPLATES_CACHE` setting or `None` if it isn't set
+        """
+        cache_alias = getattr(settings, 'CONDITIONER_TEMPLATES_CACHE', None)
+        return caches[cache_alias] if cache_alias else None
+
+    def clear(self):
+        """
+        Removes all catalogued templates from process memory
+        """
+        with self.lock:
+            self.entries.clear()
+
+
+template_catalogue = TemplateCatalogue()
+
+
+def find_templates(templates_dir):
+    """
+    Helper method for looking up email templates in passed directories. Template needs to be a `*.txt` file and can
+    have a HTML counterpart.
 
     :return: list of available email templates paths
     :rtype: list of tuples
     """
-    templates_dir = get_app_template_dirs(template_dir)
-
     txt_templates = list()
     for template_dir in templates_dir:
         txt_templates += glob.glob(
@@ -64,3 +138,14 @@ def get_available_templates(template_dir):
         )
 
     return templates
+
+
+def get_available_templates(template_dir):
+    """
+    Helper method for returning a list of available email templates (see `TemplateCatalogue`). Template needs to be a
+    `*.txt` file and can have a HTML counterpart.
+
+    :return: list of available email templates paths
+    :rtype: list of tuples
+    """
+    return list(template_catalogue.get(template_dir))